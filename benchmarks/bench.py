@@ -0,0 +1,228 @@
+"""Benchmark every query type against deterministic synthetic wordlists.
+
+Usage:
+    python benchmarks/bench.py --sizes 10000 100000 --output before.json
+    python benchmarks/bench.py --wordlist pages/broda_wordlist.txt --output broda.json
+    python benchmarks/bench.py --output after.json --baseline before.json
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from wordtools import matcher, qat  # noqa: E402
+from wordtools.ingest import ingest  # noqa: E402
+from wordtools.store import WordlistIndex, content_digest  # noqa: E402
+
+DEFAULT_SIZES = [10_000, 100_000, 250_000, 1_000_000]
+
+CORPUS = [
+    {"name": "prefix", "category": "simple", "engine": "matcher", "query": "ta*"},
+    {"name": "suffix", "category": "simple", "engine": "matcher", "query": "*er"},
+    {"name": "dots", "category": "simple", "engine": "matcher", "query": "b.r.n"},
+    {"name": "vowel_shape", "category": "simple", "engine": "matcher", "query": "#@#@#@"},
+    {"name": "interior_star", "category": "simple", "engine": "matcher", "query": "s*t*n"},
+    {"name": "range_prefix", "category": "length_range", "engine": "matcher", "query": "5-7:ta*"},
+    {"name": "range_any", "category": "length_range", "engine": "matcher", "query": "3-4:*"},
+    {"name": "anagram", "category": "anagram", "engine": "matcher", "query": "/retan"},
+    {"name": "anagram_dots", "category": "dotted_anagram", "engine": "matcher", "query": "/tan.."},
+    {"name": "anagram_star", "category": "dotted_anagram", "engine": "matcher", "query": "/sel*"},
+    {"name": "reverse", "category": "reverse", "engine": "matcher", "query": "A=(4:*);~A"},
+    {"name": "equation_fixed", "category": "composite", "engine": "matcher", "query": "A=(3:*);B=(4:*);AB"},
+    {"name": "equation_ranged", "category": "composite", "engine": "matcher", "query": "A=(2-4:*);B=(3-5:*);AB"},
+    {"name": "composite_pair", "category": "composite", "engine": "matcher", "query": "A=(3:*);B=(3:*);AB;BA"},
+    {"name": "composite_parts", "category": "composite", "engine": "matcher", "query": "A=(2-3:*);B=(3-4:*);A;B;AB"},
+    {"name": "qat_fixed", "category": "qat_ranged", "engine": "qat", "query": "A=(3:*);B=(3:*);AB"},
+    {"name": "qat_ranged", "category": "qat_ranged", "engine": "qat", "query": "A=(2-3:*);B=(3-4:*);A;B;AB"},
+    {"name": "qat_ranged_class", "category": "qat_ranged", "engine": "qat", "query": "A=(2-4:[!aeiou]*);B=(3-5:*);AB"},
+    {"name": "qat_dotted", "category": "qat_dotted", "engine": "qat", "query": "A=(3:*);B=(2:*);AB.."},
+    {"name": "qat_dotted_prefix", "category": "qat_dotted", "engine": "qat", "query": "A=(3:*);B=(3:*);sAB."},
+]
+
+# Onsets, nuclei and codas weighted roughly like English, so that generated words
+# share prefixes, suffixes and sub-words the way a real list does.
+ONSETS = ["", "b", "c", "d", "f", "g", "h", "l", "m", "n", "p", "r", "s", "t", "w",
+          "br", "ch", "cl", "gr", "pl", "sh", "st", "th", "tr"]
+ONSET_WEIGHTS = [6, 3, 4, 4, 2, 2, 2, 4, 3, 4, 3, 4, 6, 6, 2, 1, 1, 1, 1, 1, 2, 2, 2, 1]
+NUCLEI = ["a", "e", "i", "o", "u", "ea", "ou", "ai", "ee", "y"]
+NUCLEUS_WEIGHTS = [8, 10, 6, 6, 3, 1, 1, 1, 1, 1]
+CODAS = ["", "n", "r", "s", "t", "l", "d", "m", "ng", "st", "ck", "nd", "rt"]
+CODA_WEIGHTS = [10, 5, 5, 4, 4, 3, 2, 2, 1, 1, 1, 1, 1]
+
+
+def synthetic_wordlist(size, seed=0):
+    """Sorted list of size distinct pseudo-English words, identical for every run with the same seed."""
+    rng = random.Random(seed)
+    words = set()
+    while len(words) < size:
+        syllables = rng.choices([1, 2, 3, 4], weights=[3, 5, 3, 1])[0]
+        word = "".join(
+            rng.choices(ONSETS, ONSET_WEIGHTS)[0] + rng.choices(NUCLEI, NUCLEUS_WEIGHTS)[0] + rng.choices(CODAS, CODA_WEIGHTS)[0]
+            for _ in range(syllables)
+        )
+        if 2 <= len(word) <= 15:
+            words.add(word)
+    return sorted(words)
+
+
+def build_index(name, data):
+    """Parse raw wordlist bytes the way the app does, plain or gzipped, word or word;score lines, and index them."""
+    return WordlistIndex.from_lists(name, content_digest(data), *ingest(io.BytesIO(data)))
+
+
+def run_case(index, case, timeout):
+    """Run one corpus entry to completion, returning (result count, status)."""
+    if case["engine"] == "qat":
+        try:
+            matches, _ = qat.collect_matches(qat.iter_matches(case["query"], index.wordlist, matrix=index.matrix))
+        except ValueError:
+            return 0, "error"
+        return len(matches), "complete"
+
+    engine = matcher.PatternMatcher.from_index(index, timeout=timeout)
+    results, result_type = engine.execute_query(case["query"])
+    if engine.summary["partial"]:
+        return len(results), "timeout"
+    return len(results), "error" if result_type == "error" else "complete"
+
+
+def estimate_cost(index, case, timeout):
+    """The planner's estimated cost for a corpus entry, recorded next to its measured latency."""
+    try:
+        if case["engine"] == "qat":
+            return qat.explain_query(index, case["query"]).cost
+        return matcher.PatternMatcher.from_index(index, timeout=timeout).explain(case["query"]).cost
+    except ValueError:
+        return None
+
+
+def measure(index, case, repeats, timeout, trace_memory):
+    timings = []
+    count, status = 0, "complete"
+    for _ in range(repeats):
+        start = time.perf_counter()
+        count, status = run_case(index, case, timeout)
+        timings.append(time.perf_counter() - start)
+        if status != "complete":
+            break
+
+    peak = None
+    if trace_memory and status == "complete":
+        tracemalloc.start()
+        run_case(index, case, timeout)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    return {
+        "count": count,
+        "status": status,
+        "repeats": len(timings),
+        "latency_first_s": timings[0],
+        "latency_min_s": min(timings),
+        "latency_median_s": statistics.median(timings),
+        "latency_mean_s": statistics.fmean(timings),
+        "peak_memory_bytes": peak,
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_wordlists(args):
+    for size in args.sizes:
+        yield f"synthetic-{size}", "\n".join(synthetic_wordlist(size, args.seed)).encode()
+    for path in args.wordlist:
+        with open(path, "rb") as f:
+            yield os.path.basename(path), f.read()
+
+
+def run(args):
+    cases = [case for case in CORPUS if not args.only or case["category"] in args.only or case["name"] in args.only]
+    report = {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "started": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "repeats": args.repeats,
+        "wordlists": [],
+        "results": [],
+    }
+
+    for name, data in load_wordlists(args):
+        start = time.perf_counter()
+        index = build_index(name, data)
+        build_seconds = time.perf_counter() - start
+        build_peak = None
+        if not args.no_memory:
+            tracemalloc.start()
+            build_index(name, data)
+            _, build_peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        report["wordlists"].append({"wordlist": name, "words": len(index), "build_s": build_seconds, "build_peak_memory_bytes": build_peak})
+        print(f"{name}: {len(index)} words, index built in {build_seconds:.2f}s", file=sys.stderr)
+
+        for case in cases:
+            row = {"wordlist": name, "words": len(index), **case, "estimated_cost": estimate_cost(index, case, args.timeout)}
+            row.update(measure(index, case, args.repeats, args.timeout, not args.no_memory))
+            report["results"].append(row)
+            print(f"  {case['engine']:8} {case['name']:20} {row['status']:9} n={row['count']:<8} {row['latency_median_s'] * 1000:9.1f} ms", file=sys.stderr)
+
+    return report
+
+
+def compare(report, baseline):
+    """Print median latency ratios against a previous report for every case both contain."""
+    previous = {(row["wordlist"], row["engine"], row["name"]): row for row in baseline["results"]}
+    print(f"{'wordlist':22} {'case':28} {'before ms':>10} {'after ms':>10} {'ratio':>7}  counts")
+    for row in report["results"]:
+        old = previous.get((row["wordlist"], row["engine"], row["name"]))
+        if old is None:
+            continue
+        before, after = old["latency_median_s"], row["latency_median_s"]
+        ratio = after / before if before else float("inf")
+        counts = "same" if old["count"] == row["count"] else f"{old['count']} -> {row['count']}"
+        print(f"{row['wordlist']:22} {row['engine'] + ':' + row['name']:28} {before * 1000:10.1f} {after * 1000:10.1f} {ratio:7.2f}  {counts}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark wordtools query engines.")
+    parser.add_argument("--sizes", type=int, nargs="*", default=DEFAULT_SIZES, help="synthetic wordlist sizes to generate")
+    parser.add_argument("--wordlist", action="append", default=[], help="also benchmark this wordlist file (repeatable)")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the synthetic wordlists")
+    parser.add_argument("--repeats", type=int, default=3, help="timed runs per case")
+    parser.add_argument("--timeout", type=int, default=300, help="matcher timeout per run, in seconds")
+    parser.add_argument("--only", nargs="*", help="restrict to these case names or categories")
+    parser.add_argument("--no-memory", action="store_true", help="skip the traced run that measures peak memory")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--baseline", help="compare against a previous JSON report")
+    args = parser.parse_args(argv)
+
+    report = run(args)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
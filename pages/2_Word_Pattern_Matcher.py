@@ -1,86 +1,126 @@
 import streamlit as st
-import re
-import string
-import time
-import random
-from collections import defaultdict
-import concurrent.futures
-import os
-import itertools
-from typing import Dict, List, Tuple, Set, Optional, Union
 import functools
-import threading
-from dataclasses import dataclass
-from enum import Enum
-from itertools import product
+import os
+
+from wordtools import matcher
+from wordtools.executor import HARD_TIMEOUT_GRACE, QueryCancelled, ResourceLimitExceeded, TimeoutException, get_executor
+from wordtools.export import PAGE_SIZES, ResultLines
+from wordtools.jobs import POLL_INTERVAL, get_job_manager
+from wordtools.planner import DEFAULT_MAX_QUERY_COST, format_plan
+from wordtools.profiling import profile_rows
+from wordtools.results import cached_stream, result_key
+from wordtools.store import get_index, get_index_for_path
+from wordtools.widgets import show_result_pages
+
+def run_search(job, index, query, timeout_seconds, max_results, show_profile, max_cost, best_first, count_total):
+    """Job target: stream a query's results into the job, serving from and refilling the result cache."""
+    events = cached_stream(
+        result_key("pattern", index.digest, matcher.canonical_query(query), best_first, count_total),
+        max_results,
+        lambda: get_executor().stream(
+            matcher.stream_query,
+            index,
+            (query, timeout_seconds, max_results, show_profile, max_cost, best_first, count_total),
+            timeout=timeout_seconds + HARD_TIMEOUT_GRACE,
+            cancel_event=job.cancel_event
+        )
+    )
+    try:
+        for kind, payload in events:
+            if kind == "type":
+                job.result_type = payload
+            elif kind == "results":
+                job.results.extend(payload)
+            elif kind == "progress":
+                job.progress = payload
+            else:
+                job.summary = payload
+    except TimeoutException:
+        # The worker was killed; what it streamed before then still stands.
+        job.summary = {"status": "timeout", "messages": [("warning", f"Search timed out after {timeout_seconds} seconds.")], "partial": True, "progress": None}
+    except QueryCancelled:
+        job.summary = {"status": "cancelled", "messages": [("warning", "Search was cancelled.")], "partial": True, "progress": job.progress}
+    except ResourceLimitExceeded as e:
+        job.summary = {"status": "error", "has_more": False, "total": 0, "messages": [("error", str(e))]}
+
+@st.fragment(run_every=POLL_INTERVAL)
+def watch_search(job_id):
+    """Poll a running search, showing its progress and first results, until it finishes."""
+    job = get_job_manager().get(job_id)
+    if job is None or job.done:
+        st.rerun()
+    scanned = f", about {job.progress:.0%} of the candidates scanned" if job.progress is not None else ""
+    st.progress(job.progress or 0.0, text=f"Searching for {job.elapsed:.0f}s... {len(job.results)} matches so far{scanned}")
+    preview = [matcher.format_result(res_tuple, job.result_type) for res_tuple in job.results[:PAGE_SIZES[0]]]
+    if preview:
+        st.code("\n".join(preview), language=None)
+    if st.button("Cancel search", key="cancel_search"):
+        job.cancel()
+
+def show_search(job, show_profile):
+    """A finished search's messages, summary and paged results."""
+    summary = job.summary
+    results = job.results
+    for level, message in summary["messages"]:
+        getattr(st, level)(message)
+
+    footer = []
+    if summary.get("partial"):
+        # Keep what the search found before it stopped rather than discarding the run.
+        progress = summary.get("progress")
+        scanned = f", after scanning about {progress:.0%} of the candidates" if progress is not None else ""
+        header = [f"Partial results: {len(results)} matches found before the search stopped{scanned}.", "---"]
+        result_prefix = f"Search stopped after {job.elapsed:.2f} seconds."
+    else:
+        num_shown = len(results)
+        total = summary["total"]
+        estimated_total = summary.get("estimated_total")
+        if total is None and not summary["has_more"]:
+            total = num_shown
+        if total is not None:
+            header = [f"Found {total} matches:", "---"]
+        elif estimated_total is not None:
+            header = [f"Found more than {num_shown} matches, about {estimated_total:,} in all (estimated):", "---"]
+        else:
+            header = [f"Found more than {num_shown} matches:", "---"]
+
+        if summary["has_more"]:
+            if total is not None:
+                footer = ["", f"... (displaying {num_shown} of {total} results)"]
+            elif estimated_total is not None:
+                footer = ["", f"... (displaying the first {num_shown} of about {estimated_total:,} results; the total is estimated from the query plan)"]
+            else:
+                footer = ["", f"... (displaying the first {num_shown} results; the full count was not computed)"]
+
+        if summary.get("cached"):
+            result_prefix = f"Served from the result cache in {job.elapsed:.2f} seconds."
+        else:
+            result_prefix = f"Search completed in {job.elapsed:.2f} seconds."
+
+    lines = ResultLines()
+    lines.add_lines(header)
+    lines.add_results(results, lambda res_tuple: matcher.format_result(res_tuple, job.result_type))
+    lines.add_lines(footer)
+    st.caption(result_prefix)
+    show_result_pages(lines, "matcher", "matcher_results.txt", job.id)
+
+    if show_profile:
+        with st.expander("Query profile", expanded=True):
+            if summary.get("cached"):
+                st.caption("Served from the result cache, so no engine stages ran.")
+            elif summary.get("profile") is None:
+                st.caption("No profile was recorded for this run.")
+            else:
+                st.caption("Engine stages ran in a worker process. Nested stages are excluded from their parent; \"other\" is worker start-up, transfer and rendering.")
+                st.table(profile_rows(summary["profile"], total_seconds=job.elapsed))
+                if summary["profile"]["counters"]:
+                    st.table([{"counter": name, "value": value} for name, value in summary["profile"]["counters"].items()])
 
 st.set_page_config(
     page_title="Word Pattern Matcher",
     layout="wide",
     initial_sidebar_state="expanded"
 )
-VOWELS = set("aeiou")
-CONSONANTS = set(string.ascii_lowercase) - VOWELS
-
-class PatternType(Enum):
-    SIMPLE = "simple"
-    EQUATION = "equation"
-    ANAGRAM = "anagram"
-    COMPOSITE = "composite"
-    REVERSE = "reverse"
-
-@dataclass
-class VariableDefinition:
-    name: str
-    min_len: int
-    max_len: int
-    pattern: str
-    is_fixed_length: bool = True
-
-@dataclass
-class PatternStructure:
-    type: PatternType
-    variables: List[Tuple[str, bool]]  # (var_name, is_reversed)
-    literals: List[str]
-    total_length: int
-    original: str
-
-class WordlistCache:
-    def __init__(self):
-        self.wordlist = []
-        self.word_by_length = defaultdict(list)
-        self.words_set = set()
-        self.name = ""
-
-    def load_wordlist(self, file_path):
-        self.name = os.path.basename(file_path)
-        self.wordlist = []
-        self.word_by_length = defaultdict(list)
-        self.words_set = set()
-
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                for line in f:
-                    word = line.strip().lower()
-                    if word and word.isalpha():
-                        self.wordlist.append(word)
-                        self.word_by_length[len(word)].append(word)
-                        self.words_set.add(word)
-        except FileNotFoundError:
-             st.error(f"Error: Wordlist file not found at {file_path}")
-             return 0
-        except Exception as e:
-             st.error(f"Error reading wordlist file {file_path}: {e}")
-             return 0
-
-
-        self.wordlist.sort()
-        for length in self.word_by_length:
-            self.word_by_length[length].sort()
-
-        return len(self.wordlist)
-
-word_cache = WordlistCache()
 
 st.sidebar.title("Word Pattern Matcher")
 st.sidebar.header("Load Wordlist")
@@ -100,18 +140,23 @@ wordlist_option = st.sidebar.radio(
 )
 
 loaded_wordlist_path = None
+word_cache = None
+# Filled only while a list is actually being parsed, so cached lists show no bar.
+load_progress = st.sidebar.empty()
+
+def show_load_progress(done, total):
+    fraction = min(1.0, done / total) if total else 0.0
+    load_progress.progress(fraction, text=f"Reading wordlist... {fraction:.0%}")
+
 if wordlist_option == "Upload custom wordlist":
-    uploaded_file = st.sidebar.file_uploader("Upload your wordlist (.txt)", type=["txt"])
+    uploaded_file = st.sidebar.file_uploader("Upload your wordlist (.txt, or .gz compressed; one word or word;score per line)", type=["txt", "gz"])
     if uploaded_file is not None:
-        temp_path = os.path.join(script_dir, "temp_uploaded_wordlist.txt")
         try:
-            with open(temp_path, "wb") as f:
-                f.write(uploaded_file.getbuffer())
-            loaded_wordlist_path = temp_path
+            word_cache = get_index(uploaded_file, uploaded_file.name, show_load_progress)
         except Exception as e:
-            st.sidebar.error(f"Failed to save uploaded file: {e}")
+            st.sidebar.error(f"Failed to read uploaded file: {e}")
     else:
-        st.sidebar.info("Please upload a wordlist file (.txt)")
+        st.sidebar.info("Please upload a wordlist file (.txt or .gz)")
 
 elif wordlist_option == "Use default wordlist":
     if not os.path.exists(default_wordlist_path):
@@ -131,27 +176,35 @@ elif wordlist_option == "Use Broda wordlist":
     else:
         st.sidebar.error("Broda wordlist selected but not found.")
 
-if loaded_wordlist_path and word_cache.name != os.path.basename(loaded_wordlist_path):
-    st.sidebar.info(f"Loading {os.path.basename(loaded_wordlist_path)}...")
-    word_count = word_cache.load_wordlist(loaded_wordlist_path)
-    if word_count > 0:
-        st.sidebar.success(f"Loaded {word_count} words from {os.path.basename(loaded_wordlist_path)}")
+if loaded_wordlist_path:
+    try:
+        word_cache = get_index_for_path(loaded_wordlist_path, show_load_progress)
+    except FileNotFoundError:
+        st.sidebar.error(f"Error: Wordlist file not found at {loaded_wordlist_path}")
+    except Exception as e:
+        st.sidebar.error(f"Error reading wordlist file {loaded_wordlist_path}: {e}")
+
+load_progress.empty()
+
+if word_cache is not None:
+    get_executor().prepare(word_cache)
+    if len(word_cache) > 0:
+        st.sidebar.success(f"Loaded {len(word_cache)} words from {word_cache.name}")
     else:
         st.sidebar.error("Failed to load wordlist or wordlist is empty.")
-    if wordlist_option == "Upload custom wordlist" and os.path.exists(loaded_wordlist_path):
-          try:
-              os.remove(loaded_wordlist_path)
-          except Exception as e:
-              st.sidebar.warning(f"Could not remove temporary file {loaded_wordlist_path}: {e}")
 
-elif not word_cache.wordlist and 'first_run_done' not in st.session_state:
+elif 'first_run_done' not in st.session_state:
       st.sidebar.warning("No wordlist loaded. Please select or upload one.")
       st.session_state['first_run_done'] = True
 
 with st.sidebar.expander("Advanced Options"):
-    use_threading = False
     max_results = st.number_input("Maximum results to display", min_value=10, max_value=100000, value=1000)
     timeout_seconds = st.number_input("Query timeout (seconds)", min_value=5, max_value=2000, value=120)
+    best_first = st.checkbox("Best first (by score)", value=False, help="Show the highest-scoring matches first, from word;score lines; unscored words count as 50")
+    count_total = st.checkbox("Count all matches", value=False, help="Once the display limit is reached, keep going to count every match instead of showing an estimate; slower for large results")
+    show_profile = st.checkbox("Show query profile", value=False, help="Break the run time down by stage, with candidate and predicate counts")
+    max_cost = st.number_input("Refuse queries above this estimated cost (0 for no limit)", min_value=0, value=DEFAULT_MAX_QUERY_COST, step=10_000_000,
+                               help="Estimated number of word tests, as shown by Explain. Queries above a tenth of it run with a warning.")
 
 st.title("Word Pattern Matcher")
 st.write("""
@@ -160,791 +213,49 @@ Search wordlists using patterns and variable equations.
 
 query_input = st.text_area("Enter your query pattern", height=150, key="single_query")
 
-class PatternMatcher:
-    def __init__(self, wordlist: List[str], words_set: Set[str], word_by_length: Dict[int, List[str]], use_threading: bool = True, timeout: int = 60):
-        self.wordlist = wordlist
-        self.words_set = words_set
-        self.word_by_length = word_by_length
-        self.timeout = timeout
-        self.start_time = time.time()
-        self._regex_cache = {}
-        self._pattern_cache = {}
-        self._lock = threading.Lock()
-        self.use_threading = use_threading
-        self.max_workers = min(32, (os.cpu_count() or 1) + 4)
-
-    def _time_check(self):
-        if time.time() - self.start_time > self.timeout:
-            raise TimeoutError(f"Query exceeded timeout of {self.timeout} seconds.")
-
-    @functools.lru_cache(maxsize=1024)
-    def pattern_to_regex(self, pattern: str) -> str:
-        if pattern in self._regex_cache:
-            return self._regex_cache[pattern]
-
-        pattern = pattern.replace("#", f"[{''.join(CONSONANTS)}]")
-        pattern = pattern.replace("@", f"[{''.join(VOWELS)}]")
-
-        regex = ""
-        i = 0
-        while i < len(pattern):
-            char = pattern[i]
-            if char == '.':
-                regex += '.'
-            elif char == '*':
-                regex += '.*'
-            elif char == '[':
-                j = pattern.find(']', i)
-                if j != -1:
-                    regex += pattern[i:j+1]
-                    i = j
-                else:
-                    regex += re.escape(char)
-            elif char == '\\':
-                if i + 1 < len(pattern):
-                    regex += re.escape(pattern[i+1])
-                    i += 1
-                else:
-                    regex += re.escape(char)
-            else:
-                regex += re.escape(char)
-            i += 1
-
-        final_regex = f"^{regex}$"
-        self._regex_cache[pattern] = final_regex
-        return final_regex
-
-    def matches_pattern(self, word: str, pattern: str, length_constraint: Optional[Tuple[int, int]] = None) -> bool:
-        if length_constraint is not None:
-            min_len, max_len = length_constraint
-            if not (min_len <= len(word) <= max_len):
-                return False
-
-        if pattern == '*': return True
-        if not pattern: return not word
-
-        try:
-            regex = self.pattern_to_regex(pattern)
-            return bool(re.match(regex, word))
-        except re.error as e:
-            st.warning(f"Invalid regex generated from pattern '{pattern}': {e}")
-            return False
-
-    def parse_variable_definition(self, definition: str) -> Optional[VariableDefinition]:
-        match = re.match(r'([A-R])=\((\d+)(?:-(\d+))?:(.*)\)', definition)
-        if not match:
-            match = re.match(r'([A-R])=\((\d+):(.*)\)', definition)
-            if not match:
-                st.warning(f"Invalid variable definition format: {definition}")
-                return None
-            var_name, length, pattern = match.groups()
-            min_len = max_len = int(length)
-        else:
-            var_name, min_len_str, max_len_str, pattern = match.groups()
-            min_len = int(min_len_str)
-            max_len = int(max_len_str) if max_len_str else min_len
-
-        if min_len <= 0 or max_len < min_len:
-            st.warning(f"Invalid length in variable definition: {definition}")
-            return None
-
-        return VariableDefinition(
-            name=var_name,
-            min_len=min_len,
-            max_len=max_len,
-            pattern=pattern if pattern else "*",
-            is_fixed_length=(min_len == max_len)
-        )
-
-    def parse_pattern_structure(self, pattern: str, variables: Dict[str, VariableDefinition]) -> Optional[PatternStructure]:
-        structure = []
-        pos = 0
-        total_length = 0
-        var_refs = []
-        literals = []
-
-        while pos < len(pattern):
-            self._time_check()
-            var_match = re.match(r'(~?)([A-R])', pattern[pos:])
-            if var_match:
-                reverse_flag, var_name = var_match.groups()
-                is_reversed = (reverse_flag == '~')
-                
-                if var_name not in variables:
-                    st.error(f"Variable '{var_name}' used in pattern '{pattern}' but not defined.")
-                    return None
-                    
-                var_info = variables[var_name]
-                if not var_info.is_fixed_length:
-                    st.warning(f"Variable '{var_name}' must have fixed length for pattern matching.")
-                    return None
-                    
-                var_refs.append((var_name, is_reversed))
-                total_length += var_info.min_len
-                pos += len(reverse_flag) + len(var_name)
-            else:
-                literal_char = pattern[pos]
-                literals.append(literal_char)
-                total_length += 1
-                pos += 1
-
-        return PatternStructure(
-            type=self._determine_pattern_type(pattern, var_refs),
-            variables=var_refs,
-            literals=literals,
-            total_length=total_length,
-            original=pattern
-        )
-
-    def _determine_pattern_type(self, pattern: str, var_refs: List[Tuple[str, bool]]) -> PatternType:
-        if pattern.startswith('/'):
-            return PatternType.ANAGRAM
-        elif any(is_reversed for _, is_reversed in var_refs):
-            return PatternType.REVERSE
-        elif len(var_refs) > 1:
-            return PatternType.COMPOSITE
-        else:
-            return PatternType.SIMPLE
-
-    def solve_equation(self, variables: Dict[str, VariableDefinition], patterns: List[str]) -> List[Tuple[str, Optional[str], Dict[str, str]]]:
-        self.start_time = time.time()
-        results = []
-
-        if not patterns or not variables:
-            st.warning("Equation solver requires both variables and patterns.")
-            return []
-
-        pattern_structures = []
-        for pattern in patterns:
-            structure = self.parse_pattern_structure(pattern, variables)
-            if structure:
-                pattern_structures.append(structure)
-            else:
-                return []
-
-        first_structure = pattern_structures[0]
-        first_matches = self._find_matches_for_structure(first_structure, variables)
-
-        for word, decomp in first_matches:
-            self._time_check()
-            all_patterns_match = True
-            other_words = []
-
-            for structure in pattern_structures[1:]:
-                constructed_word = self._construct_word_from_structure(structure, decomp)
-                if not constructed_word or constructed_word not in self.words_set:
-                    all_patterns_match = False
-                    break
-                other_words.append(constructed_word)
-
-            if all_patterns_match:
-                results.append((word, other_words[0] if other_words else None, decomp))
-
-        return results
-
-    def _find_matches_for_structure(self, structure: PatternStructure, variables: Dict[str, VariableDefinition]) -> List[Tuple[str, Dict[str, str]]]:
-        matches = []
-        candidate_words = self.word_by_length.get(structure.total_length, [])
-
-        for word in candidate_words:
-            self._time_check()
-            current_pos = 0
-            decomp = {}
-            possible = True
-
-            for var_name, is_reversed in structure.variables:
-                var_info = variables[var_name]
-                var_len = var_info.min_len
-                part = word[current_pos : current_pos + var_len]
-                part_to_check = part[::-1] if is_reversed else part
-
-                if not self.matches_pattern(part_to_check, var_info.pattern, length_constraint=(var_len, var_len)):
-                    possible = False
-                    break
-
-                decomp[var_name] = part_to_check
-                current_pos += var_len
-
-            for literal in structure.literals:
-                if current_pos >= len(word) or word[current_pos] != literal:
-                    possible = False
-                    break
-                current_pos += 1
-
-            if possible and current_pos == len(word):
-                matches.append((word, decomp))
-
-        return matches
-
-    def _construct_word_from_structure(self, structure: PatternStructure, decomp: Dict[str, str]) -> Optional[str]:
-        try:
-            word = ""
-            for var_name, is_reversed in structure.variables:
-                if var_name not in decomp:
-                    return None
-                val = decomp[var_name]
-                word += val[::-1] if is_reversed else val
-
-            for literal in structure.literals:
-                word += literal
-
-            return word
-        except Exception as e:
-            st.error(f"Error constructing word: {e}")
-            return None
-
-    def execute_query(self, query: str) -> Tuple[Optional[List[Tuple[str, Optional[str], Dict[str, str]]]], str]:
-        self.start_time = time.time()
-        self._regex_cache = {}
-        raw_parts = query.strip().split(';')
-        parts = [p.strip() for p in raw_parts if p.strip()]
-
-        variable_defs_raw = []
-        search_patterns_raw = []
-        variables = {}
-
-        for part in parts:
-            if '=' in part and part[0].isalpha() and part[0].isupper() and part[0] <= 'R':
-                variable_defs_raw.append(part)
-            else:
-                search_patterns_raw.append(part)
-
-        for v_def_str in variable_defs_raw:
-            self._time_check()
-            parsed_var = self.parse_variable_definition(v_def_str)
-            if parsed_var:
-                variables[parsed_var.name] = parsed_var
-            else:
-                st.warning(f"Skipping invalid variable definition: {v_def_str}")
-
-        is_equation_query = bool(variables) and bool(search_patterns_raw)
-        is_anagram_query = any(p.startswith('/') for p in search_patterns_raw)
-
-        try:
-            if is_equation_query:
-                if len(search_patterns_raw) > 1:
-                    results = self._handle_composite_pattern(search_patterns_raw, variables)
-                    return results, "equation"
-                else:
-                    pattern = search_patterns_raw[0]
-                    if any('~' in var for var in re.findall(r'(~?[A-R])', pattern)):
-                        results = self._handle_reverse_pattern(pattern, variables)
-                        return results, "equation"
-                    else:
-                        results = self._handle_complex_pattern(pattern, variables)
-                        return results, "equation"
-
-            elif len(search_patterns_raw) == 1:
-                pattern = search_patterns_raw[0]
-                if pattern.startswith('/'):
-                    matches = self.process_anagram_pattern(pattern)
-                    return [(m, None, {}) for m in matches], "anagram"
-                else:
-                    matches = self.find_matches_simple_pattern(pattern)
-                    return [(m, None, {}) for m in matches], "simple"
-
-            elif len(search_patterns_raw) > 1:
-                st.warning("Handling multiple non-equation patterns via intersection.")
-                common_matches = None
-
-                for pattern in search_patterns_raw:
-                    self._time_check()
-                    current_matches = set()
-                    if pattern.startswith('/'):
-                        matches_list = self.process_anagram_pattern(pattern)
-                        if matches_list is not None:
-                            current_matches = set(matches_list)
-                    else:
-                        matches_list = self.find_matches_simple_pattern(pattern)
-                        current_matches = set(matches_list)
-
-                    if common_matches is None:
-                        common_matches = current_matches
-                    else:
-                        common_matches &= current_matches
-
-                    if not common_matches:
-                        break
-
-                if common_matches is not None:
-                    return [(m, None, {}) for m in sorted(list(common_matches))], "intersection"
-            else:
-                st.info("Query contains only variable definitions. To see matching words, add the variable name(s) as patterns (e.g., A; B;).")
-                return [], "definition_only"
-
-        except TimeoutError:
-            st.error(f"Query timed out after {self.timeout} seconds.")
-            return None, "timeout"
-        except Exception as e:
-            st.error(f"An error occurred during query execution: {e}")
-            import traceback
-            st.error(traceback.format_exc())
-            return [], "error"
-
-    def process_anagram_pattern(self, pattern_str: str) -> Optional[List[str]]:
-        if not pattern_str.startswith('/'):
-            return None
-
-        self._time_check()
-
-        content = pattern_str[1:]
-        dots = content.count('.')
-        stars = content.count('*')
-        base_letters = sorted([c for c in content if c.isalpha()])
-        base_counts = defaultdict(int)
-        for char in base_letters:
-            base_counts[char] += 1
-
-        matches = []
-
-        min_len = len(base_letters) + dots
-        max_len = None if stars > 0 else len(base_letters) + dots
-
-        candidate_words = []
-        if max_len is not None:
-            if min_len == max_len:
-                candidate_words = self.word_by_length.get(min_len, [])
-            else:
-                for length in range(min_len, max_len + 1):
-                    candidate_words.extend(self.word_by_length.get(length, []))
-        else:
-            for length, words in self.word_by_length.items():
-                if length >= min_len:
-                    candidate_words.extend(words)
-
-        for i, word in enumerate(candidate_words):
-            if i % 1000 == 0: self._time_check()
-
-            if max_len is not None and len(word) != max_len:
-                continue
-            if len(word) < min_len:
-                continue
-
-            word_counts = defaultdict(int)
-            possible = True
-            for char in word:
-                word_counts[char] += 1
-
-            for char, count in base_counts.items():
-                if word_counts[char] < count:
-                    possible = False
-                    break
-            if not possible:
-                continue
-
-            if stars == 0:
-                extra_letters = len(word) - len(base_letters)
-                if extra_letters != dots:
-                    possible = False
-
-            if possible:
-                matches.append(word)
-
-        return matches
-
-    def find_matches_simple_pattern(self, pattern_str: str) -> List[str]:
-        self._time_check()
-        length_constraint, clean_pattern = self.length_constraint_from_pattern(pattern_str)
-
-        matches = []
-        candidate_words = []
-
-        if length_constraint:
-            min_len, max_len = length_constraint
-            for length in range(min_len, max_len + 1):
-                candidate_words.extend(self.word_by_length.get(length, []))
-        else:
-            candidate_words = self.wordlist
-
-        if not candidate_words: return []
+button_col1, button_col2 = st.columns([1, 8])
+execute_clicked = button_col1.button("Execute Search", key="execute_button")
+explain_clicked = button_col2.button("Explain", key="explain_button", help="Show how the query would run and its estimated cost, without running it")
 
+if explain_clicked:
+    if word_cache is None or not word_cache.wordlist:
+        st.error("No wordlist is loaded. Please select or upload a wordlist from the sidebar.")
+    elif not query_input:
+        st.warning("Please enter a query pattern.")
+    else:
         try:
-            regex = self.pattern_to_regex(clean_pattern)
-            compiled_regex = re.compile(regex)
-        except re.error as e:
-            st.error(f"Invalid pattern leads to regex error: {clean_pattern} -> {e}")
-            return []
-
-        for i, word in enumerate(candidate_words):
-            if i % 2000 == 0: self._time_check()
-
-            if compiled_regex.match(word):
-                matches.append(word)
-
-        return matches
-
-    def length_constraint_from_pattern(self, pattern_str):
-        match = re.match(r'^(\d+):(.*)', pattern_str)
-        if match:
-            length, rest_pattern = match.groups()
-            length = int(length)
-            if length > 0:
-                 return (length, length), rest_pattern
-            else:
-                 st.warning(f"Invalid exact length constraint: {pattern_str}")
-                 return None, pattern_str
-
-        match = re.match(r'^(\d+)-(\d+):(.*)', pattern_str)
-        if match:
-            min_l, max_l, rest_pattern = match.groups()
-            min_len, max_len = int(min_l), int(max_l)
-            if 0 < min_len <= max_len:
-                 return (min_len, max_len), rest_pattern
-            else:
-                 st.warning(f"Invalid range length constraint: {pattern_str}")
-                 return None, pattern_str
-
-        return None, pattern_str
-
-    def _parallel_process_pattern(self, pattern: str, variables: Dict[str, VariableDefinition]) -> List[Tuple[str, Dict[str, str]]]:
-        structure = self.parse_pattern_structure(pattern, variables)
-        if not structure:
-            return []
-
-        matches = []
-        candidate_words = self.word_by_length.get(structure.total_length, [])
-
-        def process_chunk(chunk: List[str]) -> List[Tuple[str, Dict[str, str]]]:
-            chunk_matches = []
-            for word in chunk:
-                current_pos = 0
-                decomp = {}
-                possible = True
-
-                for var_name, is_reversed in structure.variables:
-                    var_info = variables[var_name]
-                    var_len = var_info.min_len
-                    part = word[current_pos : current_pos + var_len]
-                    part_to_check = part[::-1] if is_reversed else part
-
-                    if not self.matches_pattern(part_to_check, var_info.pattern, length_constraint=(var_len, var_len)):
-                        possible = False
-                        break
-
-                    decomp[var_name] = part_to_check
-                    current_pos += var_len
-
-                for literal in structure.literals:
-                    if current_pos >= len(word) or word[current_pos] != literal:
-                        possible = False
-                        break
-                    current_pos += 1
-
-                if possible and current_pos == len(word):
-                    chunk_matches.append((word, decomp))
-
-            return chunk_matches
-
-        if self.use_threading and len(candidate_words) > 1000:
-            chunk_size = max(1000, len(candidate_words) // self.max_workers)
-            chunks = [candidate_words[i:i + chunk_size] for i in range(0, len(candidate_words), chunk_size)]
-            
-            with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-                futures = [executor.submit(process_chunk, chunk) for chunk in chunks]
-                for future in concurrent.futures.as_completed(futures):
-                    matches.extend(future.result())
-        else:
-            matches = process_chunk(candidate_words)
-
-        return matches
-
-    def _validate_pattern_structure(self, structure: PatternStructure, variables: Dict[str, VariableDefinition]) -> bool:
-        for var_name, _ in structure.variables:
-            if var_name not in variables:
-                st.error(f"Variable '{var_name}' used in pattern '{structure.original}' but not defined.")
-                return False
-
-        for var_name, _ in structure.variables:
-            var_info = variables[var_name]
-            if not var_info.is_fixed_length:
-                st.warning(f"Variable '{var_name}' must have fixed length for pattern matching.")
-                return False
-
-        return True
-
-    def _optimize_pattern_order(self, patterns: List[str], variables: Dict[str, VariableDefinition]) -> List[str]:
-        pattern_structures = []
-        for pattern in patterns:
-            structure = self.parse_pattern_structure(pattern, variables)
-            if structure:
-                pattern_structures.append((pattern, structure))
-
-        pattern_structures.sort(key=lambda x: (
-            len(x[1].variables),
-            x[1].total_length,
-            -len(x[1].literals)
-        ))
-
-        return [p[0] for p in pattern_structures]
-
-    def _format_result(self, result: Tuple[str, Optional[str], Dict[str, str]], pattern_type: str) -> str:
-        word1, word2, decomp = result
-        if pattern_type == "equation":
-            if word2:
-                decomp_str = " - ".join(f"{k}={v}" for k, v in sorted(decomp.items()))
-                return f"{word1} / {word2}    ({decomp_str})"
-            else:
-                decomp_str = " - ".join(f"{k}={v}" for k, v in sorted(decomp.items()))
-                return f"{word1}    ({decomp_str})"
-        else:
-            return word1
-
-    def _optimize_word_candidates(self, pattern: str, variables: Dict[str, VariableDefinition]) -> List[str]:
-        """Optimize the list of candidate words based on pattern constraints."""
-        structure = self.parse_pattern_structure(pattern, variables)
-        if not structure:
-            return []
-
-        var_lengths = {}
-        for var_name, _ in structure.variables:
-            var_info = variables[var_name]
-            var_lengths[var_name] = (var_info.min_len, var_info.max_len)
-
-        min_total_len = sum(min_len for min_len, _ in var_lengths.values()) + len(structure.literals)
-        max_total_len = sum(max_len for _, max_len in var_lengths.values()) + len(structure.literals)
-
-        candidates = []
-        for length in range(min_total_len, max_total_len + 1):
-            candidates.extend(self.word_by_length.get(length, []))
-
-        return candidates
-
-    def _precompute_pattern_matches(self, pattern: str, variables: Dict[str, VariableDefinition]) -> Dict[str, Set[str]]:
-        """Precompute matches for each variable in the pattern."""
-        structure = self.parse_pattern_structure(pattern, variables)
-        if not structure:
-            return {}
-
-        matches = {}
-        for var_name, is_reversed in structure.variables:
-            var_info = variables[var_name]
-            var_matches = set()
-
-            for length in range(var_info.min_len, var_info.max_len + 1):
-                for word in self.word_by_length.get(length, []):
-                    if self.matches_pattern(word, var_info.pattern, length_constraint=(length, length)):
-                        var_matches.add(word)
-
-            matches[var_name] = var_matches
-
-        return matches
-
-    def _validate_variable_constraints(self, variables: Dict[str, VariableDefinition]) -> bool:
-        """Validate that all variable constraints are consistent."""
-        var_names = set(variables.keys())
-        if len(var_names) != len(variables):
-            st.error("Duplicate variable names found.")
-            return False
-
-        for name in var_names:
-            if not (len(name) == 1 and 'A' <= name <= 'R'):
-                st.error(f"Invalid variable name: {name}. Must be a single letter A-R.")
-                return False
-            
-        for var_info in variables.values():
-            try:
-                self.pattern_to_regex(var_info.pattern)
-            except re.error as e:
-                st.error(f"Invalid pattern for variable {var_info.name}: {e}")
-                return False
-
-        return True
-
-    def _optimize_pattern_matching(self, pattern: str, variables: Dict[str, VariableDefinition]) -> List[Tuple[str, Dict[str, str]]]:
-        """Optimize pattern matching by using precomputed matches and early filtering."""
-        structure = self.parse_pattern_structure(pattern, variables)
-        if not structure:
-            return []
-
-        var_matches = self._precompute_pattern_matches(pattern, variables)
-        if not var_matches:
-            return []
-
-        candidates = self._optimize_word_candidates(pattern, variables)
-        if not candidates:
-            return []
-
-        matches = []
-        for word in candidates:
-            self._time_check()
-            current_pos = 0
-            decomp = {}
-            possible = True
-
-            for var_name, is_reversed in structure.variables:
-                var_info = variables[var_name]
-                var_len = var_info.min_len
-                part = word[current_pos : current_pos + var_len]
-                part_to_check = part[::-1] if is_reversed else part
-
-                if part_to_check not in var_matches[var_name]:
-                    possible = False
-                    break
-
-                decomp[var_name] = part_to_check
-                current_pos += var_len
-
-            for literal in structure.literals:
-                if current_pos >= len(word) or word[current_pos] != literal:
-                    possible = False
-                    break
-                current_pos += 1
-
-            if possible and current_pos == len(word):
-                matches.append((word, decomp))
-
-        return matches
-
-    def _handle_complex_pattern(self, pattern: str, variables: Dict[str, VariableDefinition]) -> List[Tuple[str, Optional[str], Dict[str, str]]]:
-        """Handle patterns with multiple variables and literals using optimized matching."""
-        if not self._validate_variable_constraints(variables):
-            return []
-            
-        matches = self._optimize_pattern_matching(pattern, variables)
-        return [(m[0], None, m[1]) for m in matches]
-
-    def _handle_reverse_pattern(self, pattern: str, variables: Dict[str, VariableDefinition]) -> List[Tuple[str, Optional[str], Dict[str, str]]]:
-        """Handle patterns with reversed variables using optimized matching."""
-        if not self._validate_variable_constraints(variables):
-            return []
-
-        matches = self._optimize_pattern_matching(pattern, variables)
-        results = []
-
-        for word, decomp in matches:
-            reversed_word = ""
-            for var_name, is_reversed in self.parse_pattern_structure(pattern, variables).variables:
-                val = decomp[var_name]
-                reversed_word += val[::-1] if is_reversed else val
-            for literal in self.parse_pattern_structure(pattern, variables).literals:
-                reversed_word += literal
-
-            if reversed_word in self.words_set:
-                results.append((word, reversed_word, decomp))
-
-        return results
-
-    def _all_possible_variable_values(self, var: VariableDefinition) -> List[str]:
-        """Generate all possible values for a variable, matching its pattern and length constraints."""
-        results = []
-        for length in range(var.min_len, var.max_len + 1):
-            for word in self.word_by_length.get(length, []):
-                if self.matches_pattern(word, var.pattern, length_constraint=(length, length)):
-                    results.append(word)
-        return list(set(results))
-
-    def _handle_composite_pattern(self, patterns: List[str], variables: Dict[str, VariableDefinition]) -> List[Tuple[str, Optional[str], Dict[str, str]]]:
-        """Process composite patterns with multiple variables."""
-        if not self._validate_variable_constraints(variables):
-            return []
-            
-        # Sort patterns to optimize matching
-        ordered_patterns = self._optimize_pattern_order(patterns, variables)
-        
-        # Find matches for first pattern
-        first_pattern = ordered_patterns[0]
-        first_matches = self._optimize_pattern_matching(first_pattern, variables)
-        if not first_matches:
-            return []
-            
-        results = []
-        # Check combinations with other patterns
-        for word, decomp in first_matches:
-            self._time_check()
-            all_match = True
-            for pattern in ordered_patterns[1:]:
-                if pattern.startswith('/'):
-                    # For anagram patterns, check if all characters can be matched
-                    if not self._check_anagram_pattern(word, decomp, pattern, variables):
-                        all_match = False
-                        break
-                else:
-                    # For regular patterns, reconstruct and match
-                    reconstructed_word = self._construct_word_from_structure(self.parse_pattern_structure(pattern, variables), decomp)
-                    if not reconstructed_word or reconstructed_word not in self.words_set:
-                        all_match = False
-                        break
-
-            if all_match:
-                results.append((word, None, decomp))
-
-        return results
-
-    def _check_anagram_pattern(self, base_word: str, decomp: Dict[str, str], pattern: str, variables: Dict[str, VariableDefinition]) -> bool:
-        """Check if a word can match an anagram pattern based on decomposed variable values."""
-        structure = self.parse_pattern_structure(pattern, variables)
-        if not structure:
-            return False
-
-        # Count all letters in the base word
-        base_letter_counts = defaultdict(int)
-        for char in base_word:
-            base_letter_counts[char] += 1
-
-        # Check if all letters in the anagram pattern can be matched
-        for var_name, is_reversed in structure.variables:
-            var_value = decomp.get(var_name, "")
-            if is_reversed:
-                var_value = var_value[::-1]
-
-            for char in var_value:
-                if base_letter_counts[char] <= 0:
-                    return False
-                base_letter_counts[char] -= 1
-
-        return True
-
-if st.button("Execute Search", key="execute_button"):
-    if not word_cache.wordlist:
+            plan = get_executor().run(matcher.explain_query, word_cache, (query_input, timeout_seconds), timeout=timeout_seconds + HARD_TIMEOUT_GRACE)
+            st.code(format_plan(plan), language=None)
+            if max_cost and plan.cost > max_cost:
+                st.warning(f"This query would be refused: its estimated cost is above the limit of {max_cost:,}.")
+        except (TimeoutException, ResourceLimitExceeded) as e:
+            st.error(f"Could not plan the query: {e}")
+
+if execute_clicked:
+    if word_cache is None or not word_cache.wordlist:
         st.error("No wordlist is loaded. Please select or upload a wordlist from the sidebar.")
+    elif not query_input:
+        st.warning("Please enter a query pattern.")
     else:
-        with st.spinner("Searching... This may take time for complex queries."):
-            start_exec_time = time.time()
-            
-            if not query_input:
-                st.warning("Please enter a query pattern.")
-            else:
-                matcher = PatternMatcher(
-                    word_cache.wordlist,
-                    word_cache.words_set,
-                    word_cache.word_by_length,
-                    timeout=timeout_seconds
-                )
-                results_data, result_type = matcher.execute_query(query_input)
-                end_exec_time = time.time()
-                execution_time = end_exec_time - start_exec_time
-
-                if results_data is not None:
-                    formatted_results = []
-                    num_results = len(results_data)
-                    formatted_results.append(f"Found {num_results} matches:")
-                    formatted_results.append("---")
-                    
-                    displayed_count = 0
-                    if result_type == "equation":
-                        for res_tuple in results_data:
-                            if displayed_count >= max_results: break
-                            word1, word2, decomp = res_tuple
-                            decomp_parts = [f"{k}={v}" for k, v in sorted(decomp.items())]
-                            decomp_str = " - ".join(decomp_parts)
-
-                            if word2 is None:
-                                formatted_results.append(f"{word1}    ({decomp_str})")
-                            else:
-                                formatted_results.append(f"{word1} / {word2}    ({decomp_str})")
-                            displayed_count += 1
-                    else:
-                        for res_tuple in results_data:
-                            if displayed_count >= max_results: break
-                            word, _, _ = res_tuple
-                            formatted_results.append(word)
-                            displayed_count += 1
-
-                    if num_results > max_results:
-                        formatted_results.append(f"\n... (displaying {max_results} of {num_results} results)")
-
-                    result_prefix = f"Search completed in {execution_time:.2f} seconds.\n\n"
-                    st.text_area("Results", result_prefix + "\n".join(formatted_results), height=400)
-                else:
-                    st.text_area("Results", f"Search timed out after {timeout_seconds} seconds.", height=70)
-
+        previous = get_job_manager().get(st.session_state.get("matcher_job", (None, None))[1])
+        if previous is not None and not previous.done:
+            previous.cancel()
+        job_id = get_job_manager().submit(
+            query_input,
+            functools.partial(run_search, index=word_cache, query=query_input, timeout_seconds=timeout_seconds,
+                              max_results=max_results, show_profile=show_profile, max_cost=max_cost, best_first=best_first, count_total=count_total)
+        )
+        st.session_state["matcher_job"] = word_cache.digest, job_id
+        st.session_state["matcher_page"] = 1
+
+if not explain_clicked and word_cache is not None and st.session_state.get("matcher_job", (None, None))[0] == word_cache.digest:
+    # The search runs in the background, so reruns from any widget leave it going and show it again.
+    job = get_job_manager().get(st.session_state["matcher_job"][1])
+    if job is None:
+        st.info("The results of the last search have been evicted. Run it again to see them.")
+    elif not job.done:
+        watch_search(job.id)
+    elif job.error is not None:
+        st.error(f"An error occurred during query execution: {job.error}")
+    else:
+        show_search(job, show_profile)
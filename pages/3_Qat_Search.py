@@ -1,272 +1,134 @@
 import streamlit as st
-import re
-from itertools import product
-import io
+import functools
 import time
-import threading
-from typing import Optional
-from queue import Queue
-
-class TimeoutException(Exception):
-    pass
-
-def run_with_timeout(func, args=(), timeout_duration=None):
-    if timeout_duration is None or timeout_duration <= 0:
-        return func(*args)
-        
-    result_queue = Queue()
-    
-    def wrapper():
-        try:
-            result = func(*args)
-            result_queue.put(("success", result))
-        except Exception as e:
-            result_queue.put(("error", e))
-    
-    thread = threading.Thread(target=wrapper)
-    thread.daemon = True
-    thread.start()
-    thread.join(timeout_duration)
-    
-    if thread.is_alive():
-        raise TimeoutException()
-        
-    if not result_queue.empty():
-        status, result = result_queue.get()
-        if status == "error":
-            raise result
-        return result
-    
-    raise TimeoutException()
-
-def matches_wildcard(seg, wild):
-    vowels = set("aeiou")
-    
-    if wild == "*":
-        return True
-    if wild.endswith("*") and len(wild) == 2:
-        return seg.startswith(wild[0])
-    if len(wild) == len(seg):
-        for c, w in zip(seg, wild):
-            if w == "@" and c not in vowels:
-                return False
-            elif w == "#" and c in vowels:
-                return False
-            elif w not in "@#*" and w != c:
-                return False
-        return True
-    if wild.startswith("[") and wild.endswith("]") and wild.count("[") == 1:
-        negated = wild[1] == '!'
-        char_set = set(wild[2:-1]) if negated else set(wild[1:-1])
-        return all((c not in char_set) if negated else (c in char_set) for c in seg)
-    if wild.endswith("*") and wild.startswith("[") and wild.count("[") == 1:
-        part = re.match(r'(\[!?[a-z]+\])\*', wild)
-        if part and len(seg) == 2:
-            bracket = part.group(1)
-            negated = bracket[1] == '!'
-            chars = set(bracket[2:-1]) if negated else set(bracket[1:-1])
-            return (seg[0] not in chars if negated else seg[0] in chars)
-    if wild.count("[") > 1:
-        parts = re.findall(r'\[.*?\]', wild)
-        if len(parts) != len(seg):
-            return False
-        for c, part in zip(seg, parts):
-            negated = part[1] == '!'
-            char_set = set(part[2:-1]) if negated else set(part[1:-1])
-            if (negated and c in char_set) or (not negated and c not in char_set):
-                return False
-        return True
-    return False
-
-def search_single_query(query, word_set, limit=10):
-    def matches_wildcard(seg, wild):
-        vowels = set("aeiou")
-        if wild == "*":
-            return True
-
-        # [abc]* style: first char must match class
-        if wild.startswith("[") and wild.endswith("*") and wild.count("[") == 1:
-            part = re.match(r'(\[!?[a-z]+\])\*', wild)
-            if part and len(seg) >= 1:
-                bracket = part.group(1)
-                negated = bracket[1] == '!'
-                chars = set(bracket[2:-1]) if negated else set(bracket[1:-1])
-                return (seg[0] not in chars if negated else seg[0] in chars)
-
-        # Direct character-for-character match
-        if len(wild) == len(seg):
-            for c, w in zip(seg, wild):
-                if w == "@" and c not in vowels:
-                    return False
-                elif w == "#" and c in vowels:
-                    return False
-                elif w not in "@#*" and w != c:
-                    return False
-            return True
-
-        # Full segment set [abc] or [!abc]
-        if wild.startswith("[") and wild.endswith("]") and wild.count("[") == 1:
-            negated = wild[1] == '!'
-            char_set = set(wild[2:-1]) if negated else set(wild[1:-1])
-            return all((c not in char_set) if negated else (c in char_set) for c in seg)
-
-        # Compound brackets like [!bern][bern]
-        if wild.count("[") > 1:
-            parts = re.findall(r'\[!?[a-z]+\]', wild)
-            if len(parts) != len(seg):
-                return False
-            for c, part in zip(seg, parts):
-                negated = part[1] == '!'
-                char_set = set(part[2:-1]) if negated else set(part[1:-1])
-                if (negated and c in char_set) or (not negated and c not in char_set):
-                    return False
-            return True
-
-        return False
-
-    results = []
-    var_ranges = {}
-    prefix_map = {}
-    extra_chars_per_var = {}
-    wildcard_type = {}
-    steps = []
-    match_count = 0
-    found = False
-
-    raw_parts = query.strip().split(';')
-    for part in raw_parts:
-        match_def_range = re.match(r'^([A-Z])=\((\d+)-(\d+):(.+)\)$', part.strip())
-        match_def_fixed = re.match(r'^([A-Z])=\((\d+):(.+)\)$', part.strip())
-        match_step = re.match(r'^[a-z.]*[A-Z]+[.]*$', part.strip())
-
-        if match_def_range:
-            var, min_len, max_len, pattern = match_def_range.groups()
-            var_ranges[var] = list(range(int(min_len), int(max_len)+1))
-            wildcard_type[var] = pattern.strip() if pattern.strip() else '*'
-        elif match_def_fixed:
-            var, length, pattern = match_def_fixed.groups()
-            var_ranges[var] = [int(length)]
-            wildcard_type[var] = pattern.strip() if pattern.strip() else '*'
-        elif match_step:
-            steps.append(part.strip())
-
-    if not steps:
-        return ["[!] No valid steps found."]
-
-    declared_vars = list(var_ranges.keys())
-    combo_step = steps[-1]
-    combo_match = re.match(r'^([a-z.]*)?([A-Z]+)(\.*)$', combo_step)
-    if not combo_match:
-        return ["[!] Invalid final combination step."]
-
-    combo_prefix = combo_match.group(1) or ""
-    combo_final_order = list(combo_match.group(2))
-    combo_extra_chars = len(combo_match.group(3))
-
-    for step in steps[:-1]:
-        match = re.match(r'^([a-z]*)([A-Z])([.]*)$', step)
-        if match:
-            pre, var, dots = match.groups()
-            prefix_map[var] = pre
-            extra_chars_per_var[var] = len(dots or "")
-
-    var_tail_map = {}
-    for var in declared_vars:
-        lengths = var_ranges[var]
-        prefix = prefix_map.get(var, "")
-        extra = extra_chars_per_var.get(var, 0)
-        wild = wildcard_type.get(var, '*')
-        match_dict = {}
-        for word in word_set:
-            if not word.startswith(prefix):
-                continue
-            tail = word[len(prefix):]
-            for length in lengths:
-                if len(tail) == length + extra:
-                    seg = tail[:length]
-                    if matches_wildcard(seg, wild):
-                        match_dict[seg] = word
-        var_tail_map[var] = match_dict
-
-    if combo_extra_chars > 0:
-        total_core_len = sum(min(var_ranges[v]) for v in combo_final_order)
-        full_len = len(combo_prefix) + total_core_len + combo_extra_chars
-
-        for word in word_set:
-            if len(word) != full_len or not word.startswith(combo_prefix):
-                continue
-
-            core = word[len(combo_prefix):-combo_extra_chars]
-            pos = 0
-            tail_lookup = {}
-            valid = True
-
-            for var in combo_final_order:
-                base = min(var_ranges[var])
-                seg = core[pos:pos+base]
-                pos += base
-                if var not in var_tail_map or seg not in var_tail_map[var]:
-                    valid = False
-                    break
-                tail_lookup[var] = seg
-
-            if not valid:
-                continue
-
-            final_words = []
-            for var in declared_vars:
-                seg = tail_lookup.get(var)
-                if not seg or seg not in var_tail_map[var]:
-                    valid = False
-                    break
-                full_candidate = prefix_map.get(var, "") + seg
-                full_word = var_tail_map[var][seg]
-                if not full_word.startswith(full_candidate):
-                    valid = False
-                    break
-                final_words.append(full_word)
-
-            if valid:
-                results.append(" | ".join(final_words) + f" || {word}")
-                match_count += 1
-                found = True
-                if limit and match_count >= limit:
-                    results.append(f"\n[RESULT LIMIT OF {limit} REACHED]")
-                    break
-
-    else:
-        var_segments = [list(var_tail_map[v].items()) for v in combo_final_order]
-        for combo in product(*var_segments):
-            if limit and match_count >= limit:
-                results.append(f"\n[RESULT LIMIT OF {limit} REACHED]")
-                break
-
-            tail_parts = [seg for seg, _ in combo]
-            full_combo_core = combo_prefix + ''.join(tail_parts)
-            if full_combo_core in word_set:
-                tail_lookup = {v: seg for v, (seg, _) in zip(combo_final_order, combo)}
-                final_words = []
-                valid = True
-                for var in declared_vars:
-                    seg = tail_lookup.get(var)
-                    if not seg or seg not in var_tail_map[var]:
-                        valid = False
-                        break
-                    full_candidate = prefix_map.get(var, "") + seg
-                    full_word = var_tail_map[var][seg]
-                    if not full_word.startswith(full_candidate):
-                        valid = False
-                        break
-                    final_words.append(full_word)
-                if valid:
-                    results.append(" | ".join(final_words) + f" || {full_combo_core}")
-                    match_count += 1
-                    found = True
-
-    if not found:
-        results.append("[NO MATCHES]")
-
-    return results
+from concurrent.futures import FIRST_COMPLETED, wait
+
+from wordtools import qat
+from wordtools.executor import HARD_TIMEOUT_GRACE, QueryCancelled, ResourceLimitExceeded, TimeoutException, get_executor
+from wordtools.export import ResultLines
+from wordtools.jobs import POLL_INTERVAL, get_job_manager
+from wordtools.planner import DEFAULT_MAX_QUERY_COST, format_plan
+from wordtools.profiling import profile_rows
+from wordtools.results import CachedResult, get_result_cache, result_key
+from wordtools.store import get_index
+from wordtools.widgets import show_result_pages
+
+def describe_outcome(future, i, limit, key, profiles, best_first):
+    """A finished query's matches and the lines that follow them; failures have no matches and an error line.
+
+    Its profile, if any, is kept in profiles under its position i in the batch, as the same query may appear more than once.
+    """
+    try:
+        matches, exhausted, profile, partial = future.result()
+        # Partial matches are still the leading run of the full list, so they answer smaller limits;
+        # partial best-first matches are only the best found so far, so they are not kept.
+        if not (partial and best_first):
+            get_result_cache().put(key, CachedResult(items=matches, complete=exhausted))
+        if profile is not None:
+            profiles[i] = profile_rows(profile), profile["counters"]
+        return matches, qat.matches_footer(len(matches), limit, partial)
+    except ValueError as e:
+        return [], [f"[!] {e}"]
+    except TimeoutException:
+        return [], ["[!] Query timed out"]
+    except QueryCancelled:
+        return [], ["[!] Batch stopped: time budget exceeded or run cancelled"]
+    except ResourceLimitExceeded as e:
+        return [], [f"[!] {e}"]
+    except Exception as e:
+        return [], [f"[!] Error: {str(e)}"]
+
+def format_status(queries, outputs):
+    lines = []
+    for i, (single_query, output) in enumerate(zip(queries, outputs)):
+        status = "⏳ Running..." if output is None else f"{len(output[0])} match(es)" if output[0] else output[1][-1]
+        lines.append(f"Query {i+1}: {single_query}  -  {status}")
+    return "\n".join(lines)
+
+def batch_lines(queries, outputs):
+    """The batch output as lines over the stored matches, formatted only as they are shown."""
+    lines = ResultLines()
+    for i, (single_query, (matches, footer)) in enumerate(zip(queries, outputs)):
+        if i > 0:
+            lines.add_lines(["", "="*70, ""])
+        lines.add_lines([f"Query {i+1}: {single_query}", "="*50, ""])
+        lines.add_results(matches, functools.partial(qat.format_match, qat.declared_variables(single_query)))
+        lines.add_lines(footer)
+    return lines
+
+def run_batch(job, index, queries, limit, timeout_seconds, batch_budget_seconds, show_profile, max_cost, best_first):
+    """Job target: run a batch of queries, filling job.results with each query's outcome as it finishes."""
+    per_query_timeout = timeout_seconds if timeout_seconds > 0 else None
+    # Queries stop themselves at the earlier of their own timeout and the end of the batch
+    # budget, which is fixed before any is dispatched so that queries waiting for a worker
+    # do not get it afresh, and return what they have found; the hard limits only catch a
+    # query that fails to stop.
+    batch_deadline = time.time() + batch_budget_seconds if batch_budget_seconds > 0 else None
+    deadline = time.monotonic() + batch_budget_seconds + HARD_TIMEOUT_GRACE if batch_budget_seconds > 0 else None
+    hard_timeout = per_query_timeout + HARD_TIMEOUT_GRACE if per_query_timeout else None
+
+    # Answer what the result cache covers, then fan the rest out across the
+    # worker pool, each run from the start. Cancelling the job stops the whole batch.
+    cancel_batch = job.cancel_event
+    cache = get_result_cache()
+    outputs = job.results = [None] * len(queries)
+    profiles = {}
+    position = {}
+    for i, single_query in enumerate(queries):
+        key = result_key("qat", index.digest, qat.canonical_query(single_query), best_first)
+        entry = cache.get(key)
+        if entry is not None and entry.covers(limit):
+            cached_matches, _ = entry.head(limit)
+            outputs[i] = cached_matches, qat.matches_footer(len(cached_matches), limit)
+            continue
+        future = get_executor().submit(qat.fetch_matches, index, (single_query, limit, show_profile, max_cost, per_query_timeout, best_first, batch_deadline), hard_timeout, cancel_batch)
+        position[future] = (i, key)
+
+    pending = set(position)
+    while pending:
+        remaining = None
+        if deadline is not None and not cancel_batch.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                cancel_batch.set()
+                remaining = None
+        done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+        for future in done:
+            i, key = position[future]
+            outputs[i] = describe_outcome(future, i, limit, key, profiles, best_first)
+        job.progress = (len(queries) - len(pending)) / len(queries)
+    job.summary = {"queries": queries, "profiles": profiles}
+
+@st.fragment(run_every=POLL_INTERVAL)
+def watch_batch(job_id):
+    """Poll a running batch, showing each query's status, until it finishes."""
+    job = get_job_manager().get(job_id)
+    if job is None or job.done:
+        st.rerun()
+    queries = [q.strip() for q in job.description.split(' - ') if q.strip()]
+    outputs = job.results or [None] * len(queries)
+    finished = sum(output is not None for output in outputs)
+    st.progress(finished / len(queries), text=f"🔄 {finished} of {len(queries)} query(s) finished after {job.elapsed:.0f}s")
+    st.code(format_status(queries, outputs), language=None)
+    if st.button("Cancel run", key="cancel_batch"):
+        job.cancel()
+
+def show_batch(job, show_profile):
+    """A finished batch's paged output and, if asked, each query's profile."""
+    queries, profiles = job.summary["queries"], job.summary["profiles"]
+    show_result_pages(batch_lines(queries, job.results), "qat", "qat_results.txt", job.id, label="Output:", height=500)
+
+    if show_profile:
+        with st.expander("Query profile", expanded=True):
+            st.caption("Engine stages ran in a worker process; nested stages are excluded from their parent. Queries answered from the result cache, or that failed, have no profile.")
+            for i, single_query in enumerate(queries):
+                if i not in profiles:
+                    continue
+                stage_rows, counters = profiles[i]
+                st.markdown(f"**Query {i+1}:** `{single_query}`")
+                st.table(stage_rows)
+                if counters:
+                    st.table([{"counter": name, "value": value} for name, value in counters.items()])
 
 st.set_page_config(page_title="QAT Search", layout="wide")
 
@@ -276,11 +138,24 @@ col1, col2 = st.columns([1, 2])
 
 with col1:
     st.subheader("Input")
-    uploaded_file = st.file_uploader("Upload wordlist file", type=['txt'])
-    
+    uploaded_file = st.file_uploader("Upload wordlist file", type=['txt', 'gz'], help="One word, or Broda-style word;score, per line; gzip-compressed lists are accepted")
+    word_index = None
+
     if uploaded_file is not None:
-        content = uploaded_file.read().decode('utf-8')
-        word_set = {line.strip() for line in content.split('\n') if line.strip()}
+        # Filled only while a list is actually being parsed, so cached lists show no bar.
+        load_progress = st.empty()
+        def show_load_progress(done, total):
+            fraction = min(1.0, done / total) if total else 0.0
+            load_progress.progress(fraction, text=f"Reading wordlist... {fraction:.0%}")
+        try:
+            word_index = get_index(uploaded_file, uploaded_file.name, show_load_progress)
+        except Exception as e:
+            st.error(f"Failed to read uploaded file: {e}")
+        load_progress.empty()
+
+    if word_index is not None:
+        get_executor().prepare(word_index)
+        word_set = word_index.words_set
         st.success(f"✅ Loaded {len(word_set)} words")
         
         with st.expander("Search Settings", expanded=True):
@@ -293,45 +168,73 @@ with col1:
                                             value=5, 
                                             step=0,
                                             help="Maximum time allowed per query")
+            batch_budget_seconds = st.number_input("Batch time budget (seconds) (0 for no budget)",
+                                                 min_value=0,
+                                                 value=0,
+                                                 help="Maximum total time for all queries in one run; queries still running when it expires are stopped")
+            best_first = st.checkbox("Best first (by score)", value=False, help="Return each query's highest-scoring matches, from word;score lines; unscored words count as 50")
+            show_profile = st.checkbox("Show query profile", value=False, help="Break each query's run time down by stage, with candidate and predicate counts")
+            max_cost = st.number_input("Refuse queries above this estimated cost (0 for no limit)",
+                                       min_value=0,
+                                       value=DEFAULT_MAX_QUERY_COST,
+                                       step=10_000_000,
+                                       help="Estimated number of word tests, as shown by Explain")
         
         query = st.text_area("Enter your query(s):", height=150, 
                             placeholder="Single query: A=(1-3:*);B=(1-3:*);A;B;AB\nMultiple queries: A=(1-3:*);B=(1-3:*);A;B;AB - A=(2:*);B=(3:*);ABC")
         
         run_button = st.button("🚀 Run Query", type="primary", use_container_width=True)
+        explain_button = st.button("Explain", use_container_width=True, help="Show how each query would run and its estimated cost, without running it")
     else:
-        st.info("📁 Please upload a wordlist file to begin")
+        if uploaded_file is None:
+            st.info("📁 Please upload a wordlist file to begin")
         run_button = False
+        explain_button = False
         query = ""
 
 with col2:
     st.subheader("Results")
     
-    if uploaded_file is not None and run_button and query.strip():
-        with st.spinner("🔄 Processing query..."):
-            queries = [q.strip() for q in query.split(' - ') if q.strip()]
-            
-            output_text = ""
-            for i, single_query in enumerate(queries):
-                if i > 0:
-                    output_text += "\n\n" + "="*70 + "\n\n"
-                
-                output_text += f"Query {i+1}: {single_query}\n" + "="*50 + "\n\n"
-                try:
-                    results = run_with_timeout(
-                        search_single_query, 
-                        (single_query, word_set, match_limit if match_limit > 0 else None), 
-                        timeout_seconds if timeout_seconds > 0 else None
-                    )
-                    output_text += "\n".join(results)
-                except TimeoutException:
-                    output_text += "[!] Query timed out"
-                except Exception as e:
-                    output_text += f"[!] Error: {str(e)}"
-            
-            st.text_area("Output:", value=output_text, height=500)
-    
-    elif uploaded_file is not None and run_button and not query.strip():
+    if word_index is not None and run_button and query.strip():
+        queries = [q.strip() for q in query.split(' - ') if q.strip()]
+        previous = get_job_manager().get(st.session_state.get("qat_job", (None, None))[1])
+        if previous is not None and not previous.done:
+            previous.cancel()
+        job_id = get_job_manager().submit(
+            query,
+            functools.partial(run_batch, index=word_index, queries=queries, limit=match_limit or None, timeout_seconds=timeout_seconds,
+                              batch_budget_seconds=batch_budget_seconds, show_profile=show_profile, max_cost=max_cost, best_first=best_first)
+        )
+        st.session_state["qat_job"] = word_index.digest, job_id
+        st.session_state["qat_page"] = 1
+
+    elif word_index is not None and explain_button and query.strip():
+        plans = []
+        for i, single_query in enumerate(q.strip() for q in query.split(' - ') if q.strip()):
+            try:
+                plan = get_executor().run(qat.explain_query, word_index, (single_query,), timeout=timeout_seconds or None)
+                text = format_plan(plan)
+                if max_cost and plan.cost > max_cost:
+                    text += f"\n\nThis query would be refused: its estimated cost is above the limit of {max_cost:,}."
+            except (ValueError, TimeoutException, ResourceLimitExceeded) as e:
+                text = f"Query {i+1}: {single_query}\n[!] {e}"
+            plans.append(text)
+        st.code(("\n\n" + "="*70 + "\n\n").join(plans), language=None)
+
+    elif word_index is not None and (run_button or explain_button) and not query.strip():
         st.warning("⚠️ Please enter a query")
     
-    elif uploaded_file is not None:
+    if word_index is not None and not explain_button and st.session_state.get("qat_job", (None, None))[0] == word_index.digest:
+        # The batch runs in the background, so reruns from any widget leave it going and show it again.
+        job = get_job_manager().get(st.session_state["qat_job"][1])
+        if job is None:
+            st.info("The results of the last run have been evicted. Run it again to see them.")
+        elif not job.done:
+            watch_batch(job.id)
+        elif job.error is not None:
+            st.error(f"[!] Error: {job.error}")
+        else:
+            show_batch(job, show_profile)
+
+    elif word_index is not None and not (run_button or explain_button):
         st.info("💡 Enter a query and click 'Run Query' to see results")
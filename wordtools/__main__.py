@@ -0,0 +1,5 @@
+import sys
+
+from wordtools.cli import main
+
+sys.exit(main())
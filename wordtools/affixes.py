@@ -0,0 +1,76 @@
+import threading
+from array import array
+from bisect import bisect_left
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+# Sorts after every letter, so prefix + _HIGH bounds the range of words starting with prefix.
+_HIGH = "\U0010ffff"
+
+
+def _prefix_range(words: Sequence, prefix: str, key: Optional[Callable] = None) -> Tuple[int, int]:
+    return bisect_left(words, prefix, key=key), bisect_left(words, prefix + _HIGH, key=key)
+
+
+class AffixIndex:
+    """Range lookups of the words of one length that start or end with given letters.
+
+    Length buckets are alphabetical, so words sharing a prefix are one range
+    of them; a lazily built order of each bucket's positions by reversed word
+    does the same for suffixes without keeping reversed copies of the words.
+    """
+
+    def __init__(self, word_by_length: Dict[int, Sequence[str]]):
+        self.word_by_length = word_by_length
+        self._reversed: Dict[int, array] = {}
+        self._lock = threading.Lock()
+
+    def _reversed_order(self, length: int) -> array:
+        order = self._reversed.get(length)
+        if order is None:
+            with self._lock:
+                order = self._reversed.get(length)
+                if order is None:
+                    words = self.word_by_length.get(length, [])
+                    order = array("I", sorted(range(len(words)), key=[word[::-1] for word in words].__getitem__))
+                    self._reversed[length] = order
+        return order
+
+    def build_all(self) -> None:
+        """Build every length's reversed order now rather than on first use."""
+        for length in self.word_by_length:
+            self._reversed_order(length)
+
+    def _suffix_range(self, length: int, suffix: str) -> Tuple[array, int, int]:
+        """The reversed order of the bucket and the range of it holding the words ending with suffix."""
+        words = self.word_by_length.get(length, [])
+        order = self._reversed_order(length)
+        start, stop = _prefix_range(order, suffix[::-1], key=lambda i: words[i][::-1])
+        return order, start, stop
+
+    def count(self, length: int, prefix: str = "", suffix: str = "") -> int:
+        """Words of this length with the prefix, or with the suffix, whichever are fewer; a bound when both are given."""
+        words = self.word_by_length.get(length, [])
+        if not words:
+            return 0
+        counts = [len(words)]
+        if prefix:
+            start, stop = _prefix_range(words, prefix)
+            counts.append(stop - start)
+        if suffix:
+            _, start, stop = self._suffix_range(length, suffix)
+            counts.append(stop - start)
+        return min(counts)
+
+    def words(self, length: int, prefix: str = "", suffix: str = "") -> Sequence[str]:
+        """Words of this length starting with prefix and ending with suffix, alphabetically."""
+        words = self.word_by_length.get(length, [])
+        if not words or (not prefix and not suffix):
+            return words
+        if prefix:
+            start, stop = _prefix_range(words, prefix)
+            by_prefix = stop - start
+        if suffix:
+            order, rev_start, rev_stop = self._suffix_range(length, suffix)
+            if not prefix or rev_stop - rev_start < by_prefix:
+                return [words[i] for i in sorted(order[rev_start:rev_stop]) if words[i].startswith(prefix)]
+        return [word for word in words[start:stop] if word.endswith(suffix)]
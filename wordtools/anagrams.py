@@ -0,0 +1,94 @@
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from wordtools.packed import PackedWordlist, signature
+
+ALPHABET = "abcdefghijklmnopqrstuvwxyz"
+
+
+class _LetterCounts:
+    """Dense (words x 26) uint8 letter-count matrix for one length bucket."""
+
+    def __init__(self, words: Sequence[str]):
+        self.words = words
+        length = len(words[0])
+        codes = np.frombuffer("".join(words).encode("utf-32-le"), dtype=np.uint32).reshape(len(words), length)
+        letters = codes.astype(np.int64) - ord("a")
+        valid = (letters >= 0) & (letters < 26)
+        rows = np.broadcast_to(np.arange(len(words))[:, None], letters.shape)
+        flat = np.bincount((rows * 26 + letters)[valid], minlength=len(words) * 26)
+        self.counts = np.minimum(flat, 255).astype(np.uint8).reshape(len(words), 26)
+
+
+class AnagramIndex:
+    """Sorted-letter signature lookups for exact anagrams and count matrices for dotted/starred ones.
+
+    Packed words answer signature lookups from their own signature section;
+    plain word lists get a signature map built on first use.
+    """
+
+    def __init__(self, word_by_length: Dict[int, Sequence[str]], packed: Optional[PackedWordlist] = None):
+        self.word_by_length = word_by_length
+        self.packed = packed
+        self._signatures: Optional[Dict[str, List[str]]] = None
+        self._counts: Dict[int, _LetterCounts] = {}
+        self._lock = threading.Lock()
+
+    def exact(self, letters: str) -> List[str]:
+        if self.packed is not None:
+            return self.packed.anagrams(letters)
+        if self._signatures is None:
+            with self._lock:
+                if self._signatures is None:
+                    signatures = defaultdict(list)
+                    for words in self.word_by_length.values():
+                        for word in words:
+                            signatures[signature(word)].append(word)
+                    self._signatures = dict(signatures)
+        return list(self._signatures.get(signature(letters), []))
+
+    def build_all(self) -> None:
+        """Build every length's count matrix, and the signature map of unpacked words, now rather than on first use."""
+        if self.packed is None:
+            self.exact("")
+        for length in self.word_by_length:
+            self._bucket(length)
+
+    def _bucket(self, length: int) -> Optional[_LetterCounts]:
+        bucket = self._counts.get(length)
+        if bucket is None:
+            words = self.word_by_length.get(length)
+            if not words:
+                return None
+            with self._lock:
+                bucket = self._counts.get(length)
+                if bucket is None:
+                    bucket = _LetterCounts(words)
+                    self._counts[length] = bucket
+        return bucket
+
+    def _hits(self, letters: str, length: int) -> Optional[np.ndarray]:
+        bucket = self._bucket(length)
+        if bucket is None:
+            return None
+        required = Counter(letters)
+        if not required:
+            return np.arange(len(bucket.words))
+        columns = [ALPHABET.index(c) for c in required]
+        needed = np.array([required[c] for c in required], dtype=np.uint8)
+        return np.flatnonzero(np.all(bucket.counts[:, columns] >= needed, axis=1))
+
+    def containing(self, letters: str, length: int) -> List[str]:
+        """Words of the given length that contain at least the given multiset of a-z letters."""
+        hits = self._hits(letters, length)
+        if hits is None:
+            return []
+        words = self._counts[length].words
+        return [words[i] for i in hits]
+
+    def count_containing(self, letters: str, length: int) -> int:
+        hits = self._hits(letters, length)
+        return 0 if hits is None else len(hits)
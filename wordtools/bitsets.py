@@ -0,0 +1,191 @@
+import re
+import threading
+from array import array
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from wordtools.patterns import CONSONANTS, VOWELS, literal_fragments
+
+# Length of the substrings indexed for unanchored fragments.
+GRAM = 3
+
+
+def bit_positions(mask: int) -> List[int]:
+    bits = bin(mask)[:1:-1]  # least significant bit first
+    positions = []
+    i = bits.find("1")
+    while i != -1:
+        positions.append(i)
+        i = bits.find("1", i + 1)
+    return positions
+
+
+def mask_of(positions: Iterable[int], size: int) -> int:
+    """Bitset with the given bit positions set, out of size bits."""
+    bits = bytearray((size + 7) // 8)
+    for i in positions:
+        bits[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(bits, "little")
+
+
+class _LengthBits:
+    """(position, letter) bitsets over one length bucket; bit i stands for words[i]."""
+
+    def __init__(self, words: Sequence[str]):
+        self.words = words
+        self.full = (1 << len(words)) - 1
+        self.letters: List[Dict[str, int]] = []
+        self.vowels: List[int] = []
+        self.consonants: List[int] = []
+        self._containing: Optional[Dict[str, int]] = None
+        self._grams: Optional[Dict[str, array]] = None
+        self._lock = threading.Lock()
+
+        for column in zip(*words):
+            column = "".join(column)
+            chars = set(column)
+            zeros = {ord(c): "0" for c in chars}
+            by_letter = {}
+            for c in chars:
+                table = dict(zeros)
+                table[ord(c)] = "1"
+                by_letter[c] = int(column.translate(table)[::-1], 2)
+            self.letters.append(by_letter)
+            self.vowels.append(self._union(by_letter, VOWELS))
+            self.consonants.append(self._union(by_letter, CONSONANTS))
+
+    @staticmethod
+    def _union(by_letter: Dict[str, int], chars) -> int:
+        mask = 0
+        for c, bits in by_letter.items():
+            if c in chars:
+                mask |= bits
+        return mask
+
+    def token_mask(self, token: str, position: int) -> int:
+        if token == '.':
+            return self.full
+        if token == '@':
+            return self.vowels[position]
+        if token == '#':
+            return self.consonants[position]
+        by_letter = self.letters[position]
+        if token.startswith('['):
+            char_class = re.compile(token)
+            return self._union(by_letter, {c for c in by_letter if char_class.fullmatch(c)})
+        return by_letter.get(token, 0)
+
+    def _letter_masks(self) -> Dict[str, int]:
+        """Bitset of the words containing each letter anywhere."""
+        if self._containing is None:
+            with self._lock:
+                if self._containing is None:
+                    containing: Dict[str, int] = defaultdict(int)
+                    for by_letter in self.letters:
+                        for c, bits in by_letter.items():
+                            containing[c] |= bits
+                    self._containing = dict(containing)
+        return self._containing
+
+    def _gram_postings(self) -> Dict[str, array]:
+        """Positions of the words containing each GRAM-letter substring, ascending."""
+        if self._grams is None:
+            with self._lock:
+                if self._grams is None:
+                    postings = defaultdict(list)
+                    for i, word in enumerate(self.words):
+                        for gram in {word[j:j + GRAM] for j in range(len(word) - GRAM + 1)}:
+                            postings[gram].append(i)
+                    self._grams = {gram: array("I", positions) for gram, positions in postings.items()}
+        return self._grams
+
+    def fragment_mask(self, fragment: str) -> int:
+        """Bitset of words that may contain fragment: exact up to GRAM letters, a superset past it."""
+        if len(fragment) < GRAM:
+            containing = self._letter_masks()
+            mask = self.full
+            for c in set(fragment):
+                mask &= containing.get(c, 0)
+            return mask
+        postings = self._gram_postings()
+        lists = sorted((postings.get(fragment[j:j + GRAM], ()) for j in range(len(fragment) - GRAM + 1)), key=len)
+        if not lists[0]:
+            return 0
+        return mask_of(set(lists[0]).intersection(*lists[1:]), len(self.words))
+
+
+class PositionalIndex:
+    """Lazily built per-length bitset index answering fixed-position patterns with AND/popcount."""
+
+    def __init__(self, word_by_length: Dict[int, Sequence[str]]):
+        self.word_by_length = word_by_length
+        self._buckets: Dict[int, _LengthBits] = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, length: int) -> Optional[_LengthBits]:
+        bucket = self._buckets.get(length)
+        if bucket is None:
+            words = self.word_by_length.get(length)
+            if not words:
+                return None
+            with self._lock:
+                bucket = self._buckets.get(length)
+                if bucket is None:
+                    bucket = _LengthBits(words)
+                    self._buckets[length] = bucket
+        return bucket
+
+    def build_all(self) -> None:
+        """Build every length's bitsets, letter masks and postings now rather than on first use."""
+        for length in self.word_by_length:
+            bucket = self._bucket(length)
+            if bucket is not None:
+                bucket._letter_masks()
+                bucket._gram_postings()
+
+    def candidates(self, tokens: List[str], length: int) -> Tuple[int, bool]:
+        """Bitset of words of this length whose anchored positions match, and whether it is exact.
+
+        Tokens before the first '*' are checked from the start of the word and
+        tokens after the last '*' from its end. Tokens between two stars only
+        narrow the result to words containing each of their literal fragments,
+        through substring postings, so it is then a superset (exact=False).
+        """
+        bucket = self._bucket(length)
+        if bucket is None:
+            return 0, True
+
+        if '*' in tokens:
+            first = tokens.index('*')
+            last = len(tokens) - 1 - tokens[::-1].index('*')
+            head, tail = tokens[:first], tokens[last + 1:]
+            middle = [t for t in tokens[first:last] if t != '*']
+            if len(head) + len(middle) + len(tail) > length:
+                return 0, True
+            anchored = list(enumerate(head)) + [(length - len(tail) + j, t) for j, t in enumerate(tail)]
+            exact = not middle
+        else:
+            if len(tokens) != length:
+                return 0, True
+            anchored = list(enumerate(tokens))
+            exact = True
+
+        mask = bucket.full
+        for position, token in anchored:
+            mask &= bucket.token_mask(token, position)
+            if not mask:
+                return 0, True
+        if not exact:
+            # Longest fragments first: they are the most selective.
+            for fragment in sorted(literal_fragments(tokens[first:last]), key=len, reverse=True):
+                mask &= bucket.fragment_mask(fragment)
+                if not mask:
+                    return 0, True
+        return mask, exact
+
+    def words(self, length: int, mask: int) -> List[str]:
+        bucket = self._bucket(length)
+        if bucket is None or not mask:
+            return []
+        words = bucket.words
+        return [words[i] for i in bit_positions(mask)]
@@ -0,0 +1,64 @@
+import threading
+import time
+from typing import Dict, Optional
+
+
+class QueryStopped(Exception):
+    """Raised at an engine checkpoint once its cancellation token fires."""
+
+    def __init__(self, reason: str, message: str, progress: Optional[float] = None):
+        super().__init__(reason, message, progress)
+        self.reason = reason
+        self.message = message
+        self.progress = progress
+
+    def __str__(self) -> str:
+        return self.message
+
+
+class CancellationToken:
+    """Cooperative stop signal shared by an engine and its caller, plus how far the engine has got.
+
+    The token fires once its timeout passes or cancel() is called. Engines
+    poll check() at their loop checkpoints and raise QueryStopped, so whatever
+    they have already produced is kept. They report progress as the fraction
+    of their candidate space scanned so far.
+    """
+
+    def __init__(self, timeout: Optional[float] = None, event: Optional[threading.Event] = None):
+        self.timeout = timeout
+        self.deadline = time.monotonic() + timeout if timeout else None
+        self.event = event or threading.Event()
+        self.reason: Optional[str] = None
+        self.progress: Optional[float] = None
+
+    def cancel(self) -> None:
+        self.event.set()
+
+    @property
+    def stopped(self) -> bool:
+        if self.reason is None:
+            if self.event.is_set():
+                self.reason = "cancelled"
+            elif self.deadline is not None and time.monotonic() > self.deadline:
+                self.reason = "timeout"
+        return self.reason is not None
+
+    def check(self) -> None:
+        if self.stopped:
+            raise QueryStopped(self.reason, self.describe(), self.progress)
+
+    def report(self, done: int, total: int) -> None:
+        if total:
+            self.progress = min(1.0, done / total)
+
+    def describe(self) -> str:
+        if self.reason == "timeout":
+            return f"Query timed out after {self.timeout:g} seconds."
+        if self.reason == "cancelled":
+            return "Query was cancelled."
+        return "Query is running."
+
+    def as_dict(self) -> Dict[str, object]:
+        """Stop reason and progress for a result marked partial."""
+        return {"reason": self.reason, "progress": self.progress}
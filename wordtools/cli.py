@@ -0,0 +1,200 @@
+"""Run batches of matcher or QAT queries from the command line, streaming results to a file.
+
+Usage:
+    python -m wordtools --wordlist words.txt --queries queries.txt --output results.jsonl
+    cat queries.txt | python -m wordtools --wordlist words.txt --engine qat --format tsv --workers 8
+    python -m wordtools --wordlist words.txt --queries queries.txt --explain
+    python -m wordtools --wordlist broda.txt --queries queries.txt --limit 20 --best-first
+"""
+import argparse
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, TextIO
+
+from wordtools import matcher, qat
+from wordtools.cancellation import QueryStopped
+from wordtools.executor import DEFAULT_CPU_SECONDS, DEFAULT_MEMORY_MB, HARD_TIMEOUT_GRACE, ProcessExecutor, QueryCancelled, ResourceLimitExceeded, TimeoutException
+from wordtools.planner import DEFAULT_MAX_QUERY_COST, format_plan
+from wordtools.store import WordlistIndex, get_index_for_path
+
+PATTERN_MATCHER_TIMEOUT = 120
+TSV_COLUMNS = ["query_id", "query", "word", "word2", "bindings"]
+
+
+def read_queries(lines: Iterable[str]) -> List[str]:
+    """Non-blank lines that are not '#' comments, stripped."""
+    queries = []
+    for line in lines:
+        line = line.strip()
+        if line and not line.startswith("#"):
+            queries.append(line)
+    return queries
+
+
+class ResultWriter:
+    """Serializes result and summary records from many query threads onto one stream."""
+
+    def __init__(self, out: TextIO, fmt: str, header: bool = True):
+        self.out = out
+        self.fmt = fmt
+        self._lock = threading.Lock()
+        if fmt == "tsv" and header:
+            out.write("\t".join(TSV_COLUMNS) + "\n")
+
+    def results(self, query_id: int, query: str, rows: List[Dict[str, object]]) -> None:
+        if self.fmt == "jsonl":
+            text = "".join(json.dumps({"kind": "result", "query_id": query_id, "query": query, **row}) + "\n" for row in rows)
+        else:
+            text = "".join(
+                "\t".join([str(query_id), query, row["word"], row.get("word2") or "",
+                           ",".join(f"{name}={value}" for name, value in sorted(row["bindings"].items()))]) + "\n"
+                for row in rows
+            )
+        with self._lock:
+            self.out.write(text)
+
+    def plan(self, query_id: int, plan: Dict[str, object], text: str) -> None:
+        with self._lock:
+            if self.fmt == "jsonl":
+                self.out.write(json.dumps({"kind": "plan", "query_id": query_id, **plan}) + "\n")
+            else:
+                # A plan is not a table row, so TSV output gets the EXPLAIN text.
+                self.out.write(text + "\n\n")
+
+    def summary(self, query_id: int, query: str, summary: Dict[str, object]) -> None:
+        # TSV output holds result rows only; summaries go to stderr through the progress log.
+        if self.fmt == "jsonl":
+            with self._lock:
+                self.out.write(json.dumps({"kind": "summary", "query_id": query_id, "query": query, **summary}) + "\n")
+
+
+def run_matcher_query(executor: ProcessExecutor, index: WordlistIndex, query_id: int, query: str, writer: ResultWriter, limit: Optional[int], timeout: int, max_cost: Optional[int], best_first: bool = False, count_total: bool = False) -> Dict[str, object]:
+    summary = {"engine": "matcher", "status": "error", "count": 0, "has_more": False, "total": None, "messages": [], "partial": False}
+    result_type = None
+    events = executor.stream(matcher.stream_query, index, (query, timeout, limit, False, max_cost, best_first, count_total), timeout=timeout + HARD_TIMEOUT_GRACE)
+    for kind, payload in events:
+        if kind == "type":
+            result_type = payload
+        elif kind == "results":
+            writer.results(query_id, query, [
+                {"type": result_type, "word": word, "word2": word2, "bindings": bindings}
+                for word, word2, bindings in payload
+            ])
+            summary["count"] += len(payload)
+        elif kind == "done":
+            errors = [message for level, message in payload["messages"] if level == "error"]
+            if errors and payload["status"] == "complete":
+                # The matcher reports a malformed query, such as one using an undeclared
+                # variable, as a message and matches nothing; here it is an error, as in QAT.
+                raise ValueError(" ".join(errors))
+            summary.update(status=payload["status"], has_more=payload["has_more"], total=payload["total"], estimated_total=payload.get("estimated_total"),
+                           messages=[message for level, message in payload["messages"] if level in ("warning", "error")],
+                           partial=payload["partial"], progress=payload["progress"])
+    summary["type"] = result_type
+    return summary
+
+
+def run_qat_query(executor: ProcessExecutor, index: WordlistIndex, query_id: int, query: str, writer: ResultWriter, limit: Optional[int], timeout: Optional[int], max_cost: Optional[int], best_first: bool = False) -> Dict[str, object]:
+    summary = {"engine": "qat", "status": "complete", "count": 0, "has_more": False, "partial": False, "progress": 1.0}
+    batch = []
+    hard_timeout = timeout + HARD_TIMEOUT_GRACE if timeout else None
+    try:
+        for word, full_words in executor.stream(qat.stream_matches, index, (query, limit, max_cost, timeout, best_first), timeout=hard_timeout):
+            batch.append({"word": word, "bindings": full_words})
+            if len(batch) >= matcher.STREAM_BATCH_SIZE:
+                writer.results(query_id, query, batch)
+                summary["count"] += len(batch)
+                batch = []
+    except QueryStopped as e:
+        # The matches streamed before the stop are kept and written below.
+        summary.update(status=e.reason, partial=True, progress=e.progress, messages=[str(e)])
+    if batch:
+        writer.results(query_id, query, batch)
+        summary["count"] += len(batch)
+    summary["has_more"] = summary["partial"] or bool(limit) and summary["count"] >= limit
+    return summary
+
+
+def explain_query(executor: ProcessExecutor, index: WordlistIndex, engine: str, query_id: int, query: str, writer: ResultWriter, timeout: Optional[int]) -> Dict[str, object]:
+    if engine == "qat":
+        plan = executor.run(qat.explain_query, index, (query,), timeout=timeout)
+    else:
+        plan = executor.run(matcher.explain_query, index, (query, timeout or PATTERN_MATCHER_TIMEOUT), timeout=(timeout or PATTERN_MATCHER_TIMEOUT) + HARD_TIMEOUT_GRACE)
+    writer.plan(query_id, plan.as_dict(), format_plan(plan))
+    return {"engine": engine, "status": "complete", "count": 0, "cost": plan.cost}
+
+
+def run_query(executor: ProcessExecutor, index: WordlistIndex, engine: str, query_id: int, query: str, writer: ResultWriter, limit: Optional[int], timeout: Optional[int], max_cost: Optional[int] = None, explain: bool = False, best_first: bool = False, count_total: bool = False) -> Dict[str, object]:
+    """Run one query, streaming its results to writer, or only write its plan when explaining; returns its summary, never raises for query failures."""
+    start = time.monotonic()
+    try:
+        if explain:
+            summary = explain_query(executor, index, engine, query_id, query, writer, timeout)
+        elif engine == "qat":
+            summary = run_qat_query(executor, index, query_id, query, writer, limit, timeout, max_cost, best_first)
+        else:
+            summary = run_matcher_query(executor, index, query_id, query, writer, limit, timeout or PATTERN_MATCHER_TIMEOUT, max_cost, best_first, count_total)
+    except TimeoutException:
+        summary = {"engine": engine, "status": "timeout"}
+    except (ResourceLimitExceeded, QueryCancelled, ValueError) as e:
+        summary = {"engine": engine, "status": "error", "messages": [str(e)]}
+    except Exception as e:
+        # Any other failure is this query's alone; the rest of the batch still runs.
+        summary = {"engine": engine, "status": "error", "messages": [f"{type(e).__name__}: {e}"]}
+    summary["seconds"] = round(time.monotonic() - start, 4)
+    if not explain:
+        writer.summary(query_id, query, summary)
+    return summary
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m wordtools", description="Run matcher or QAT queries against a wordlist, streaming results as JSON lines or TSV.")
+    parser.add_argument("--wordlist", required=True, help="wordlist file, one word per line")
+    parser.add_argument("--queries", default="-", help="file with one query per line ('#' starts a comment); '-' reads stdin")
+    parser.add_argument("--engine", choices=["matcher", "qat"], default="matcher", help="query language of every query")
+    parser.add_argument("--format", choices=["jsonl", "tsv"], default="jsonl", help="output format")
+    parser.add_argument("--output", default="-", help="output file; '-' writes stdout")
+    parser.add_argument("--limit", type=int, default=0, help="maximum results per query (0 for no limit)")
+    parser.add_argument("--timeout", type=int, default=0, help=f"seconds per query (0 for the default: {PATTERN_MATCHER_TIMEOUT}s for the matcher, none for QAT)")
+    parser.add_argument("--workers", type=int, default=None, help="queries to run at once (default: CPU count)")
+    parser.add_argument("--memory-mb", type=int, default=DEFAULT_MEMORY_MB, help="address-space cap per worker process (0 for none)")
+    parser.add_argument("--cpu-seconds", type=int, default=DEFAULT_CPU_SECONDS or 0, help="CPU-time cap per query (0 for none)")
+    parser.add_argument("--max-cost", type=int, default=DEFAULT_MAX_QUERY_COST, help="refuse queries whose estimated cost, in word tests, is above this (0 for no limit)")
+    parser.add_argument("--explain", action="store_true", help="write each query's plan and estimated cost instead of running it")
+    parser.add_argument("--best-first", action="store_true", help="return the highest-scoring matches first (scores come from word;score lines)")
+    parser.add_argument("--count-total", action="store_true", help="after a matcher query reaches --limit, count the rest of its matches for the summary's total")
+    args = parser.parse_args(argv)
+
+    if args.queries == "-":
+        queries = read_queries(sys.stdin)
+    else:
+        with open(args.queries, "r", encoding="utf-8") as f:
+            queries = read_queries(f)
+
+    load_start = time.monotonic()
+    index = get_index_for_path(args.wordlist)
+    print(f"Loaded {len(index)} words from {index.name} in {time.monotonic() - load_start:.2f}s; running {len(queries)} queries", file=sys.stderr)
+
+    executor = ProcessExecutor(max_workers=args.workers, memory_mb=args.memory_mb or None, cpu_seconds=args.cpu_seconds or None)
+    out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    failures = 0
+    try:
+        writer = ResultWriter(out, args.format, header=not args.explain)
+        with ThreadPoolExecutor(max_workers=executor.max_workers) as pool:
+            futures = [
+                pool.submit(run_query, executor, index, args.engine, query_id, query, writer, args.limit or None, args.timeout or None, args.max_cost or None, args.explain, args.best_first, args.count_total)
+                for query_id, query in enumerate(queries, 1)
+            ]
+            for done, (future, query) in enumerate(zip(futures, queries), 1):
+                summary = future.result()
+                if summary["status"] != "complete":
+                    failures += 1
+                outcome = f"{summary['cost']:>14,} cost" if "cost" in summary else f"{summary.get('count', 0):>8} results"
+                print(f"[{done}/{len(queries)}] {summary['status']:8} {outcome} {summary['seconds']:8.2f}s  {query}", file=sys.stderr)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return 1 if failures else 0
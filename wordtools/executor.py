@@ -0,0 +1,447 @@
+import inspect
+import math
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from multiprocessing.connection import Connection
+from multiprocessing.reduction import recv_handle, send_handle
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+try:
+    import resource
+except ImportError:  # not available on Windows; limits are then skipped
+    resource = None
+
+from wordtools import snapshot, store
+from wordtools.store import WordlistIndex
+
+DEFAULT_MEMORY_MB = int(os.environ.get("WORDTOOLS_WORKER_MEMORY_MB", "2048"))
+DEFAULT_CPU_SECONDS = int(os.environ.get("WORDTOOLS_WORKER_CPU_SECONDS", "0")) or None
+CANCEL_POLL_INTERVAL = 0.1
+# Grace period past a query's own cooperative timeout before its worker is killed.
+HARD_TIMEOUT_GRACE = 5
+
+
+class TimeoutException(Exception):
+    pass
+
+
+class ResourceLimitExceeded(Exception):
+    pass
+
+
+class QueryCancelled(Exception):
+    pass
+
+
+def _limit_memory(memory_bytes: Optional[int]) -> None:
+    if resource is None or not memory_bytes:
+        return
+    try:
+        with open("/proc/self/statm") as f:
+            current = int(f.read().split()[0]) * resource.getpagesize()
+    except (OSError, ValueError):
+        current = 0
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    soft = current + memory_bytes
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (soft, hard))
+
+
+def _limit_cpu(cpu_seconds: Optional[float]) -> None:
+    """Cap this worker's CPU time at what it has used so far plus cpu_seconds (None lifts the cap)."""
+    if resource is None:
+        return
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    if cpu_seconds:
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        soft = math.ceil(usage.ru_utime + usage.ru_stime + cpu_seconds)
+        if hard != resource.RLIM_INFINITY:
+            soft = min(soft, hard)
+    else:
+        soft = hard
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+def _resolve_index(digest: str) -> WordlistIndex:
+    """Find a wordlist index inherited from the fork server or load it from its snapshot."""
+    index = store.get_cached(digest)
+    if index is None:
+        index = WordlistIndex.from_snapshot(digest[:12], digest)
+        if index is None:
+            raise RuntimeError("Wordlist index is not available to worker processes.")
+        store.remember(index)
+    return index
+
+
+def _worker_main(conn, memory_bytes: Optional[int]) -> None:
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _limit_memory(memory_bytes)
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            return
+        except Exception as e:
+            conn.send(("error", RuntimeError(f"Could not load query task: {e!r}")))
+            continue
+        if task is None:
+            return
+
+        func, digest, args, cpu_seconds = task
+        try:
+            _limit_cpu(cpu_seconds)
+            result = func(_resolve_index(digest), *args)
+            if inspect.isgenerator(result):
+                # Generator tasks stream each item back as soon as it is produced.
+                for item in result:
+                    conn.send(("item", item))
+                result = None
+            reply = ("ok", result)
+        except MemoryError:
+            reply = ("memory", None)
+        except Exception as e:
+            reply = ("error", e)
+        finally:
+            _limit_cpu(None)
+
+        try:
+            conn.send(reply)
+        except Exception as e:
+            conn.send(("error", RuntimeError(f"Could not return query result: {e!r}")))
+
+
+def _load_index(digest: str, buffer: Optional[bytes]) -> None:
+    """Load an index into the fork server's store, from its snapshot or the buffer sent with it, and build all of it."""
+    index = store.get_cached(digest)
+    if index is None:
+        words = snapshot.load(digest) if buffer is None else snapshot.decode(buffer, digest)
+        if words is None:
+            raise RuntimeError("Wordlist index is not available to worker processes.")
+        index = WordlistIndex(digest[:12], digest, words)
+        store.remember(index)
+    # Cheap once done, so an index the server already holds is built in full too.
+    index.build_all()
+
+
+def _reap(exited: Dict[int, int]) -> None:
+    """Collect the exit codes of workers that have exited, in the form Process.exitcode reports them."""
+    while True:
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            return
+        if not pid:
+            return
+        exited[pid] = os.waitstatus_to_exitcode(status)
+
+
+def _fork_server_main(conn, memory_bytes: Optional[int]) -> None:
+    """Serve requests to fork workers, kill them and report how they exited.
+
+    The server runs no other threads, so no lock is ever held while it forks,
+    and it builds each index in full before forking the workers that use it,
+    which then share it copy-on-write instead of each building their own.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    exited: Dict[int, int] = {}
+    while True:
+        try:
+            request = conn.recv()
+        except EOFError:
+            return
+        if request is None:
+            return
+        _reap(exited)
+        command, arg = request[0], request[1]
+        try:
+            if command == "fork":
+                worker_conn = Connection(recv_handle(conn))
+                try:
+                    _load_index(arg, request[2])
+                    pid = os.fork()
+                    if pid == 0:
+                        conn.close()
+                        try:
+                            _worker_main(worker_conn, memory_bytes)
+                        finally:
+                            os._exit(0)
+                finally:
+                    worker_conn.close()
+                reply = (pid, store.cached_digests())
+            elif command == "kill":
+                if arg not in exited:
+                    os.kill(arg, signal.SIGKILL)
+                    _, status = os.waitpid(arg, 0)
+                    exited[arg] = os.waitstatus_to_exitcode(status)
+                reply = exited.pop(arg)
+            else:  # "wait": the worker's pipe is closed, so it has exited or is exiting
+                if arg not in exited:
+                    _, status = os.waitpid(arg, 0)
+                    exited[arg] = os.waitstatus_to_exitcode(status)
+                reply = exited.pop(arg)
+            conn.send(("ok", reply))
+        except Exception as e:
+            conn.send(("error", e))
+
+
+class _ForkServer:
+    """A spawned process that workers are forked from; requests to it are made one at a time."""
+
+    def __init__(self, context, memory_bytes: Optional[int]):
+        self._context = context
+        self._memory_bytes = memory_bytes
+        self._lock = threading.Lock()
+        self._conn = None
+        self._process = None
+        self.digests: Set[str] = set()
+
+    def _request(self, *request, handle: Optional[int] = None) -> Any:
+        with self._lock:
+            if self._process is None or not self._process.is_alive():
+                self._start()
+            try:
+                self._conn.send(request)
+                if handle is not None:
+                    send_handle(self._conn, handle, self._process.pid)
+                status, payload = self._conn.recv()
+            except (EOFError, OSError):
+                self._process.kill()
+                self._process = None
+                raise ResourceLimitExceeded("The worker fork server exited unexpectedly.")
+        if status == "error":
+            raise payload
+        return payload
+
+    def _start(self) -> None:
+        self._conn, server_conn = self._context.Pipe()
+        self._process = self._context.Process(target=_fork_server_main, args=(server_conn, self._memory_bytes), daemon=True)
+        self._process.start()
+        server_conn.close()
+        self.digests = set()
+
+    def fork(self, index: WordlistIndex) -> "_Worker":
+        conn, child_conn = self._context.Pipe()
+        try:
+            # Only an index the server can neither find nor load from a snapshot is sent over.
+            buffer = None
+            if index.digest not in self.digests and not os.path.exists(snapshot.snapshot_path(index.digest)):
+                buffer = bytes(index.words.buffer)
+            pid, digests = self._request("fork", index.digest, buffer, handle=child_conn.fileno())
+        except BaseException:
+            conn.close()
+            raise
+        finally:
+            child_conn.close()
+        self.digests = set(digests)
+        return _Worker(conn, digests, pid=pid, server=self)
+
+    def kill(self, pid: int) -> Optional[int]:
+        return self._request("kill", pid)
+
+    def wait(self, pid: int) -> Optional[int]:
+        return self._request("wait", pid)
+
+
+class _Worker:
+    """A worker process: forked from the fork server with the indexes it held, or spawned on platforms without fork."""
+
+    def __init__(self, conn, digests: Iterable[str], pid: Optional[int] = None, server: Optional[_ForkServer] = None, process=None):
+        self.conn = conn
+        self.digests = set(digests)
+        self.pid = pid
+        self.server = server
+        self.process = process
+
+    @classmethod
+    def spawn(cls, context, memory_bytes: Optional[int]) -> "_Worker":
+        conn, child_conn = context.Pipe()
+        process = context.Process(target=_worker_main, args=(child_conn, memory_bytes), daemon=True)
+        process.start()
+        child_conn.close()
+        return cls(conn, (), process=process)
+
+    def can_serve(self, digest: str) -> bool:
+        if self.server is not None:
+            # A forked worker only serves indexes it inherited, already built in full.
+            return digest in self.digests
+        return os.path.exists(snapshot.snapshot_path(digest))
+
+    def exitcode(self) -> Optional[int]:
+        """Exit code of a worker whose pipe has closed."""
+        if self.server is not None:
+            pid, self.pid = self.pid, None
+            try:
+                return self.server.wait(pid)
+            except Exception:
+                return None
+        self.process.join()
+        return self.process.exitcode
+
+    def kill(self) -> None:
+        if self.server is not None:
+            # A worker already waited for has been reaped, and its pid may belong to another process by now.
+            if self.pid is not None:
+                try:
+                    self.server.kill(self.pid)
+                except Exception:
+                    pass
+        else:
+            if self.process.is_alive():
+                self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+class ProcessExecutor:
+    """Pool of worker processes that run queries against shared wordlist indexes.
+
+    Unlike a thread, a worker that runs past its timeout is killed outright and
+    replaced, so abandoned queries stop consuming CPU. Each worker's address
+    space is capped at memory_mb above its starting size, and each task's CPU
+    time at cpu_seconds.
+
+    Workers are forked from a fork server rather than from this process,
+    whose other threads may hold locks at the moment of a fork; where fork is
+    not available they are spawned and load indexes from their snapshots.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, memory_mb: Optional[int] = DEFAULT_MEMORY_MB, cpu_seconds: Optional[float] = DEFAULT_CPU_SECONDS):
+        self._context = multiprocessing.get_context("spawn")
+        self.memory_bytes = memory_mb * 1024 * 1024 if memory_mb else None
+        self._server = _ForkServer(self._context, self.memory_bytes) if hasattr(os, "fork") else None
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.cpu_seconds = cpu_seconds
+        self._idle: List[_Worker] = []
+        self._busy = 0
+        self._cond = threading.Condition()
+        self._dispatch = ThreadPoolExecutor(max_workers=4 * self.max_workers, thread_name_prefix="wordtools-dispatch")
+
+    def _acquire(self, index: WordlistIndex) -> _Worker:
+        stale = None
+        with self._cond:
+            while not self._idle and self._busy >= self.max_workers:
+                self._cond.wait()
+            self._busy += 1
+            worker = None
+            for candidate in self._idle:
+                if candidate.can_serve(index.digest):
+                    worker = candidate
+                    break
+            if worker is None and self._idle:
+                # Recycle an idle worker so the replacement inherits the new index.
+                stale = self._idle.pop()
+            elif worker is not None:
+                self._idle.remove(worker)
+        if stale is not None:
+            stale.kill()
+        if worker is None:
+            try:
+                worker = self._server.fork(index) if self._server is not None else _Worker.spawn(self._context, self.memory_bytes)
+            except BaseException:
+                self._release(None)
+                raise
+        return worker
+
+    def _release(self, worker: Optional[_Worker]) -> None:
+        with self._cond:
+            self._busy -= 1
+            if worker is not None:
+                self._idle.append(worker)
+            self._cond.notify()
+
+    def run(self, func: Callable[..., Any], index: WordlistIndex, args: Sequence[Any] = (), timeout: Optional[float] = None, cpu_seconds: Optional[float] = None, cancel_event: Optional[threading.Event] = None) -> Any:
+        """Run func(index, *args) in a worker and return its result.
+
+        Raises TimeoutException once timeout seconds pass, QueryCancelled once
+        cancel_event is set (the worker is killed in both cases), and
+        ResourceLimitExceeded if the worker hits its CPU or memory cap.
+        """
+        result = None
+        for kind, payload in self._execute(func, index, args, timeout, cpu_seconds, cancel_event):
+            if kind == "ok":
+                result = payload
+        return result
+
+    def stream(self, func: Callable[..., Any], index: WordlistIndex, args: Sequence[Any] = (), timeout: Optional[float] = None, cpu_seconds: Optional[float] = None, cancel_event: Optional[threading.Event] = None) -> Iterator[Any]:
+        """Like run, for tasks that return a generator: yields its items as the worker produces them.
+
+        The timeout covers the whole stream. Closing the iterator early kills the worker.
+        """
+        for kind, payload in self._execute(func, index, args, timeout, cpu_seconds, cancel_event):
+            if kind == "item":
+                yield payload
+
+    def _execute(self, func, index, args, timeout, cpu_seconds, cancel_event) -> Iterator[Tuple[str, Any]]:
+        if cancel_event is not None and cancel_event.is_set():
+            raise QueryCancelled()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        worker = self._acquire(index)
+        healthy = False
+        try:
+            worker.conn.send((func, index.digest, tuple(args), cpu_seconds or self.cpu_seconds))
+            while True:
+                self._wait(worker, deadline, cancel_event)
+                try:
+                    status, payload = worker.conn.recv()
+                except EOFError:
+                    exitcode = worker.exitcode()
+                    if exitcode == -getattr(signal, "SIGXCPU", -1):
+                        raise ResourceLimitExceeded("Query exceeded its CPU time limit.")
+                    raise ResourceLimitExceeded(f"Worker process exited unexpectedly (code {exitcode}).")
+                if status != "item":
+                    break
+                yield status, payload
+            healthy = True
+        finally:
+            if not healthy:
+                worker.kill()
+            self._release(worker if healthy else None)
+
+        if status == "memory":
+            raise ResourceLimitExceeded("Query exceeded its memory limit.")
+        if status == "error":
+            raise payload
+        yield status, payload
+
+    @staticmethod
+    def _wait(worker: _Worker, deadline: Optional[float], cancel_event: Optional[threading.Event]) -> None:
+        while True:
+            wait = CANCEL_POLL_INTERVAL if cancel_event is not None else None
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutException()
+                wait = remaining if wait is None else min(wait, remaining)
+            if worker.conn.poll(wait):
+                return
+            if cancel_event is not None and cancel_event.is_set():
+                raise QueryCancelled()
+
+    def prepare(self, index: WordlistIndex) -> None:
+        """Have the fork server load and build index in the background, with an idle worker forked from it, so the first query on it does not wait for that."""
+        if self._server is not None and index.digest not in self._server.digests:
+            self._dispatch.submit(self._prepare, index)
+
+    def _prepare(self, index: WordlistIndex) -> None:
+        self._release(self._acquire(index))
+
+    def submit(self, func: Callable[..., Any], index: WordlistIndex, args: Sequence[Any] = (), timeout: Optional[float] = None, cancel_event: Optional[threading.Event] = None) -> Future:
+        return self._dispatch.submit(self.run, func, index, args, timeout, None, cancel_event)
+
+
+_executor: Optional[ProcessExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ProcessExecutor:
+    """Process-wide executor shared by every session and page."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessExecutor()
+        return _executor
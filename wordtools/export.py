@@ -0,0 +1,123 @@
+import os
+import uuid
+import zlib
+from bisect import bisect_right
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+PAGE_SIZES = (100, 500, 1000, 5000)
+# Lines encoded per chunk of an export.
+EXPORT_CHUNK_LINES = 5000
+# Exports are written under the app's static folder, which Streamlit serves from app/static/ when
+# server.enableStaticServing is on, so the server streams them from disk rather than from memory.
+EXPORT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "static", "exports")
+EXPORT_URL = "app/static/exports"
+MAX_EXPORTS = 32
+
+
+class ResultLines:
+    """Output lines over stored result sequences, formatting only the lines that are read.
+
+    Segments are plain lines or result items with the function that formats
+    one item as a line; the items are referenced, not copied.
+    """
+
+    def __init__(self):
+        self._segments: List[Tuple[Sequence[Any], Optional[Callable[[Any], str]]]] = []
+        self._starts: List[int] = []
+        self._length = 0
+
+    def add_lines(self, lines: Iterable[str]) -> None:
+        self._add(list(lines), None)
+
+    def add_results(self, items: Sequence[Any], format_item: Callable[[Any], str]) -> None:
+        self._add(items, format_item)
+
+    def _add(self, items: Sequence[Any], format_item: Optional[Callable[[Any], str]]) -> None:
+        if items:
+            self._starts.append(self._length)
+            self._segments.append((items, format_item))
+            self._length += len(items)
+
+    def __len__(self) -> int:
+        return self._length
+
+    def lines(self, start: int, stop: int) -> List[str]:
+        """Formatted lines from position start up to stop."""
+        lines = []
+        segment = max(0, bisect_right(self._starts, start) - 1)
+        while segment < len(self._segments) and start < stop:
+            items, format_item = self._segments[segment]
+            offset = self._starts[segment]
+            chunk = items[start - offset:min(stop - offset, len(items))]
+            lines.extend(chunk if format_item is None else map(format_item, chunk))
+            start = offset + len(items)
+            segment += 1
+        return lines
+
+    def page(self, number: int, size: int) -> List[str]:
+        """Lines on page number (from 1) of the given size."""
+        return self.lines((number - 1) * size, number * size)
+
+    def __iter__(self) -> Iterator[str]:
+        for items, format_item in self._segments:
+            if format_item is None:
+                yield from items
+            else:
+                for item in items:
+                    yield format_item(item)
+
+
+def page_count(length: int, size: int) -> int:
+    return max(1, -(-length // size))
+
+
+def export_chunks(lines: Iterable[str], compress: bool = False) -> Iterator[bytes]:
+    """UTF-8 text of lines, one per line, in chunks of EXPORT_CHUNK_LINES; gzip-compressed if asked."""
+    compressor = zlib.compressobj(wbits=31) if compress else None
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= EXPORT_CHUNK_LINES:
+            data = ("\n".join(batch) + "\n").encode("utf-8")
+            batch = []
+            yield compressor.compress(data) if compressor else data
+    data = ("\n".join(batch) + "\n").encode("utf-8") if batch else b""
+    if compressor:
+        yield compressor.compress(data) + compressor.flush()
+    elif data:
+        yield data
+
+
+def save_export(lines: Iterable[str], suffix: str, directory: Optional[str] = None) -> str:
+    """Write an export chunk by chunk to a new file under directory, atomically, pruning the oldest; returns its name.
+
+    suffix ends the file name: ".txt", or ".txt.gz" to compress it.
+    """
+    directory = directory or EXPORT_DIR
+    os.makedirs(directory, exist_ok=True)
+    name = uuid.uuid4().hex + suffix
+    path = os.path.join(directory, name)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            for chunk in export_chunks(lines, suffix.endswith(".gz")):
+                f.write(chunk)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    _prune(directory)
+    return name
+
+
+def _prune(directory: str) -> None:
+    exports = [os.path.join(directory, name) for name in os.listdir(directory) if not name.endswith(".tmp")]
+    exports.sort(key=os.path.getmtime, reverse=True)
+    for stale in exports[MAX_EXPORTS:]:
+        try:
+            os.remove(stale)
+        except OSError:
+            pass
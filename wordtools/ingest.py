@@ -0,0 +1,95 @@
+import gzip
+import hashlib
+import io
+from array import array
+from collections import defaultdict
+from typing import BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple
+
+from wordtools.scores import DEFAULT_SCORE
+
+GZIP_MAGIC = b"\x1f\x8b"
+CHUNK_SIZE = 1 << 20
+# Lines read between progress reports.
+PROGRESS_INTERVAL = 20000
+
+Progress = Callable[[int, Optional[int]], None]
+
+
+def stream_digest(source: BinaryIO) -> str:
+    """SHA-256 of a seekable binary stream's raw bytes, read in chunks; leaves it rewound."""
+    source.seek(0)
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: source.read(CHUNK_SIZE), b""):
+        digest.update(chunk)
+    source.seek(0)
+    return digest.hexdigest()
+
+
+def stream_size(source: BinaryIO) -> int:
+    position = source.tell()
+    size = source.seek(0, io.SEEK_END)
+    source.seek(position)
+    return size
+
+
+def is_gzip(source: BinaryIO) -> bool:
+    position = source.tell()
+    magic = source.read(len(GZIP_MAGIC))
+    source.seek(position)
+    return magic == GZIP_MAGIC
+
+
+def iter_lines(source: BinaryIO) -> Iterator[str]:
+    """Decoded lines of a plain or gzip-compressed UTF-8 stream, read incrementally."""
+    raw = gzip.GzipFile(fileobj=source, mode="rb") if is_gzip(source) else source
+    # Closing the wrapper would close the caller's stream, so detach it instead.
+    text = io.TextIOWrapper(raw, encoding="utf-8", errors="ignore")
+    try:
+        yield from text
+    finally:
+        text.detach()
+
+
+def parse_entry(line: str) -> Optional[Tuple[str, int]]:
+    """The lowercased word and score on a wordlist line, or None when the word is not purely alphabetic.
+
+    Lines are a bare word or Broda-style "word;score"; a missing or
+    non-numeric score counts as DEFAULT_SCORE.
+    """
+    word, _, score = line.partition(";")
+    word = word.strip().lower()
+    if not word or not word.isalpha():
+        return None
+    try:
+        return word, int(score)
+    except ValueError:
+        return word, DEFAULT_SCORE
+
+
+def ingest(source: BinaryIO, progress: Optional[Progress] = None) -> Tuple[List[str], Dict[int, List[str]], Dict[int, array]]:
+    """Read a wordlist stream in one pass, normalizing, deduplicating and bucketing words by length.
+
+    Returns the sorted wordlist, its sorted length buckets and, per length,
+    an int array of scores parallel to the bucket; a word listed more than
+    once keeps its highest score. progress, if given, is called with the
+    raw bytes consumed so far and the stream size.
+    """
+    total = stream_size(source)
+    source.seek(0)
+    buckets: Dict[int, Dict[str, int]] = defaultdict(dict)
+    for count, line in enumerate(iter_lines(source), 1):
+        entry = parse_entry(line)
+        if entry is not None:
+            word, score = entry
+            bucket = buckets[len(word)]
+            if bucket.get(word, score) <= score:
+                bucket[word] = score
+        if progress is not None and count % PROGRESS_INTERVAL == 0:
+            progress(source.tell(), total)
+    if progress is not None:
+        progress(total, total)
+
+    word_by_length = {length: sorted(words) for length, words in sorted(buckets.items())}
+    score_by_length = {length: array("i", map(buckets[length].__getitem__, words)) for length, words in word_by_length.items()}
+    wordlist = sorted(word for words in word_by_length.values() for word in words)
+    return wordlist, word_by_length, score_by_length
@@ -0,0 +1,112 @@
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+MAX_FINISHED_JOBS = int(os.environ.get("WORDTOOLS_MAX_FINISHED_JOBS", "64"))
+# Seconds between a page's polls of a running job.
+POLL_INTERVAL = 0.5
+
+
+class Job:
+    """One background run: results so far, progress and final summary, written by its thread and read by pages.
+
+    results grows as the run produces output; progress is the fraction of
+    the work done, when known. summary is set once the run finishes, and
+    error holds the message of an unexpected failure.
+    """
+
+    def __init__(self, job_id: str, description: str):
+        self.id = job_id
+        self.description = description
+        self.status = "queued"
+        self.results: List[Any] = []
+        self.result_type: Optional[str] = None
+        self.progress: Optional[float] = None
+        self.summary: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.cancel_event = threading.Event()
+        self.submitted = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("done", "failed")
+
+    @property
+    def elapsed(self) -> float:
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.time()) - self.started
+
+    def cancel(self) -> None:
+        self.cancel_event.set()
+
+
+class JobManager:
+    """Runs jobs on a shared thread pool and keeps them by id until enough newer ones have finished.
+
+    A job's target is called with the Job and reports through it; the pool
+    threads mostly wait on worker processes, so there are more of them than CPUs.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, max_finished: int = MAX_FINISHED_JOBS):
+        self.max_finished = max_finished
+        self._pool = ThreadPoolExecutor(max_workers=max_workers or 2 * (os.cpu_count() or 1), thread_name_prefix="wordtools-job")
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, description: str, target: Callable[[Job], None]) -> str:
+        job = Job(uuid.uuid4().hex, description)
+        with self._lock:
+            self._jobs[job.id] = job
+        self._pool.submit(self._run, job, target)
+        return job.id
+
+    def _run(self, job: Job, target: Callable[[Job], None]) -> None:
+        job.started = time.time()
+        job.status = "running"
+        try:
+            target(job)
+            job.status = "done"
+        except Exception as e:
+            job.error = str(e) or type(e).__name__
+            job.status = "failed"
+        finally:
+            job.finished = time.time()
+            self._evict()
+
+    def _evict(self) -> None:
+        with self._lock:
+            finished = [job_id for job_id, job in self._jobs.items() if job.done]
+            for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+                del self._jobs[job_id]
+
+    def get(self, job_id: Optional[str]) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id) if job_id else None
+
+    def cancel(self, job_id: str) -> None:
+        job = self.get(job_id)
+        if job is not None:
+            job.cancel()
+
+    def __len__(self) -> int:
+        return len(self._jobs)
+
+
+_manager: Optional[JobManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_job_manager() -> JobManager:
+    """Process-wide job manager shared by every session and page."""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = JobManager()
+        return _manager
@@ -0,0 +1,1414 @@
+import heapq
+import itertools
+import re
+import threading
+import traceback
+from collections import defaultdict
+from dataclasses import dataclass
+from enum import Enum
+from typing import Callable, Container, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+from wordtools.affixes import AffixIndex
+from wordtools.anagrams import ALPHABET, AnagramIndex
+from wordtools.bitsets import PositionalIndex, bit_positions
+from wordtools.cancellation import CancellationToken, QueryStopped
+from wordtools.patterns import CompiledPattern, compile_pattern, is_literal, pattern_to_regex, tokenize
+from wordtools.planner import QueryPlan, QueryTooExpensive, check_cost, count_splits
+from wordtools.profiling import QueryProfile, stage
+from wordtools.scores import ScoreIndex
+from wordtools.store import WordlistIndex
+
+STREAM_BATCH_SIZE = 200
+# Past this many length assignments for one word length, equation splitting walks each word instead.
+MAX_SPLIT_LAYOUTS = 64
+# Best-first buckets with fewer candidates than 1/SPARSE_RANK_RATIO of their words sort the candidates instead of walking the ranked bucket.
+SPARSE_RANK_RATIO = 8
+# Candidate words per length that a split plan tries, to estimate how many matches the split finds.
+SPLIT_SAMPLE_SIZE = 200
+# A simple pattern's length constraint, compiled pattern and, when the positional index can serve it, its (length, mask, exact) buckets.
+SimplePatternPlan = Tuple[Optional[Tuple[int, int]], CompiledPattern, Optional[List[Tuple[int, int, bool]]]]
+
+
+class PatternType(Enum):
+    SIMPLE = "simple"
+    EQUATION = "equation"
+    ANAGRAM = "anagram"
+    COMPOSITE = "composite"
+    REVERSE = "reverse"
+
+
+@dataclass
+class VariableDefinition:
+    name: str
+    min_len: int
+    max_len: int
+    pattern: str
+    is_fixed_length: bool = True
+
+
+@dataclass
+class PatternStructure:
+    type: PatternType
+    variables: List[Tuple[str, bool]]  # (var_name, is_reversed)
+    literals: List[str]
+    total_length: int
+    original: str
+    items: List[Tuple[str, str, bool]] = None  # ("var" | "literal", value, is_reversed) in pattern order
+    max_length: int = 0
+
+
+class EquationConstraint:
+    """A pattern's satisfying variable values, indexed by each variable for forward checking."""
+
+    def __init__(self, structure: PatternStructure, names: Tuple[str, ...], rows: Set[Tuple[str, ...]]):
+        self.structure = structure
+        self.names = names
+        self.set_rows(rows)
+
+    def set_rows(self, rows: Set[Tuple[str, ...]]) -> None:
+        self.rows = rows
+        self._indexes = {}
+
+    def rows_with(self, bound: Dict[str, str]) -> List[Tuple[str, ...]]:
+        """Rows agreeing with every bound variable of this constraint, through an index on exactly those variables."""
+        positions = tuple(position for position, name in enumerate(self.names) if name in bound)
+        index = self._indexes.get(positions)
+        if index is None:
+            index = defaultdict(list)
+            for row in self.rows:
+                index[tuple(row[position] for position in positions)].append(row)
+            self._indexes[positions] = index
+        return index.get(tuple(bound[self.names[position]] for position in positions), [])
+
+
+class PatternMatcher:
+    def __init__(self, wordlist: Sequence[str], words_set: Container[str], word_by_length: Dict[int, Sequence[str]], use_threading: bool = True, timeout: int = 60, positional_index: Optional[PositionalIndex] = None, anagram_index: Optional[AnagramIndex] = None, profile: Optional[QueryProfile] = None, cancel_token: Optional[CancellationToken] = None, scores: Optional[ScoreIndex] = None, affix_index: Optional[AffixIndex] = None):
+        self.wordlist = wordlist
+        self.words_set = words_set
+        self.word_by_length = word_by_length
+        self.positional_index = positional_index or PositionalIndex(word_by_length)
+        self.anagram_index = anagram_index or AnagramIndex(word_by_length)
+        self.scores = scores or ScoreIndex(word_by_length)
+        self.affix_index = affix_index or AffixIndex(word_by_length)
+        self.timeout = timeout
+        self._pattern_cache = {}
+        self._lock = threading.Lock()
+        self.use_threading = use_threading
+        self.messages: List[Tuple[str, str]] = []
+        self.profile = profile
+        self._own_token = cancel_token is None
+        self.cancel_token = cancel_token or CancellationToken(timeout)
+        self.summary: Optional[Dict[str, object]] = None
+
+    @classmethod
+    def from_index(cls, index: WordlistIndex, **kwargs) -> "PatternMatcher":
+        return cls(
+            index.wordlist,
+            index.words_set,
+            index.word_by_length,
+            positional_index=index.positional,
+            anagram_index=index.anagrams,
+            scores=index.scores,
+            affix_index=index.affixes,
+            **kwargs
+        )
+
+    def _notify(self, level: str, message: str) -> None:
+        """Record a message ("info", "warning" or "error") for the caller to display."""
+        if (level, message) not in self.messages:
+            self.messages.append((level, message))
+
+    def _count(self, name: str, amount: int = 1) -> None:
+        if self.profile is not None:
+            self.profile.count(name, amount)
+
+    def _counted(self, name: str, func: Callable) -> Callable:
+        """func, counting its calls under name when profiling."""
+        if self.profile is None:
+            return func
+        profile = self.profile
+
+        def counted(*args):
+            profile.count(name)
+            return func(*args)
+        return counted
+
+    def _restart_clock(self) -> None:
+        """Start the timeout afresh for a new query, unless the caller shares its own cancellation token."""
+        if self._own_token:
+            self.cancel_token = CancellationToken(self.timeout)
+
+    def _time_check(self):
+        self.cancel_token.check()
+
+    def _progress(self, done: int, total: int) -> None:
+        self.cancel_token.report(done, total)
+
+    def pattern_to_regex(self, pattern: str) -> str:
+        return pattern_to_regex(pattern)
+
+    def matches_pattern(self, word: str, pattern: str, length_constraint: Optional[Tuple[int, int]] = None) -> bool:
+        if length_constraint is not None:
+            min_len, max_len = length_constraint
+            if not (min_len <= len(word) <= max_len):
+                return False
+
+        try:
+            return compile_pattern(pattern).match(word)
+        except re.error as e:
+            self._notify("warning", f"Invalid regex generated from pattern '{pattern}': {e}")
+            return False
+
+    def _variable_predicates(self, variables: Dict[str, VariableDefinition]) -> Dict[str, Callable[[str], bool]]:
+        """Compile each variable's pattern once for the whole query."""
+        predicates = {}
+        for name, var_info in variables.items():
+            try:
+                predicates[name] = compile_pattern(var_info.pattern).match
+            except re.error as e:
+                self._notify("warning", f"Invalid regex generated from pattern '{var_info.pattern}': {e}")
+                predicates[name] = lambda word: False
+        return predicates
+
+    def parse_variable_definition(self, definition: str) -> Optional[VariableDefinition]:
+        match = re.match(r'([A-R])=\((\d+)(?:-(\d+))?:(.*)\)', definition)
+        if not match:
+            match = re.match(r'([A-R])=\((\d+):(.*)\)', definition)
+            if not match:
+                self._notify("warning", f"Invalid variable definition format: {definition}")
+                return None
+            var_name, length, pattern = match.groups()
+            min_len = max_len = int(length)
+        else:
+            var_name, min_len_str, max_len_str, pattern = match.groups()
+            min_len = int(min_len_str)
+            max_len = int(max_len_str) if max_len_str else min_len
+
+        if min_len <= 0 or max_len < min_len:
+            self._notify("warning", f"Invalid length in variable definition: {definition}")
+            return None
+
+        return VariableDefinition(
+            name=var_name,
+            min_len=min_len,
+            max_len=max_len,
+            pattern=pattern if pattern else "*",
+            is_fixed_length=(min_len == max_len)
+        )
+
+    def parse_pattern_structure(self, pattern: str, variables: Dict[str, VariableDefinition]) -> Optional[PatternStructure]:
+        structure = []
+        pos = 0
+        total_length = 0
+        max_length = 0
+        var_refs = []
+        literals = []
+        items = []
+
+        while pos < len(pattern):
+            self._time_check()
+            var_match = re.match(r'(~?)([A-R])', pattern[pos:])
+            if var_match:
+                reverse_flag, var_name = var_match.groups()
+                is_reversed = (reverse_flag == '~')
+                
+                if var_name not in variables:
+                    self._notify("error", f"Variable '{var_name}' used in pattern '{pattern}' but not defined.")
+                    return None
+                    
+                var_info = variables[var_name]
+                var_refs.append((var_name, is_reversed))
+                items.append(("var", var_name, is_reversed))
+                total_length += var_info.min_len
+                max_length += var_info.max_len
+                pos += len(reverse_flag) + len(var_name)
+            else:
+                literal_char = pattern[pos]
+                literals.append(literal_char)
+                items.append(("literal", literal_char, False))
+                total_length += 1
+                max_length += 1
+                pos += 1
+
+        return PatternStructure(
+            type=self._determine_pattern_type(pattern, var_refs),
+            variables=var_refs,
+            literals=literals,
+            total_length=total_length,
+            original=pattern,
+            items=items,
+            max_length=max_length
+        )
+
+    def _determine_pattern_type(self, pattern: str, var_refs: List[Tuple[str, bool]]) -> PatternType:
+        if pattern.startswith('/'):
+            return PatternType.ANAGRAM
+        elif any(is_reversed for _, is_reversed in var_refs):
+            return PatternType.REVERSE
+        elif len(var_refs) > 1:
+            return PatternType.COMPOSITE
+        else:
+            return PatternType.SIMPLE
+
+    def _decomposer(self, structure: PatternStructure, variables: Dict[str, VariableDefinition], accept: Callable[[str, str], bool]) -> Callable[[str], List[Dict[str, str]]]:
+        """Build a function listing every split of a word into the structure's items, one binding per variable."""
+        items = structure.items
+        count = len(items)
+        bounds = []
+        for kind, value, _ in items:
+            if kind == "var":
+                bounds.append((variables[value].min_len, variables[value].max_len))
+            else:
+                bounds.append((1, 1))
+
+        suffix_min = [0] * (count + 1)
+        suffix_max = [0] * (count + 1)
+        for i in range(count - 1, -1, -1):
+            suffix_min[i] = suffix_min[i + 1] + bounds[i][0]
+            suffix_max[i] = suffix_max[i + 1] + bounds[i][1]
+
+        by_length = {}
+
+        def decompose(word: str) -> List[Dict[str, str]]:
+            n = len(word)
+            split = by_length.get(n)
+            if split is None:
+                if not structure.total_length <= n <= structure.max_length:
+                    split = lambda word: []
+                else:
+                    layouts = self._split_layouts(bounds, suffix_min, suffix_max, n, MAX_SPLIT_LAYOUTS)
+                    if layouts is None:
+                        split = self._walk_decomposer(items, bounds, suffix_min, suffix_max, accept)
+                    else:
+                        split = self._layout_decomposer([self._compile_layout(items, lengths) for lengths in layouts], accept)
+                by_length[n] = split
+            return split(word)
+
+        return decompose
+
+    def _walk_decomposer(self, items: List[Tuple[str, str, bool]], bounds: List[Tuple[int, int]], suffix_min: List[int], suffix_max: List[int], accept: Callable[[str, str], bool]) -> Callable[[str], List[Dict[str, str]]]:
+        """Split words by a memoised walk over split points, for lengths with too many layouts to list."""
+        count = len(items)
+
+        # A failed (item, position) state can only be memoised when nothing after it
+        # depends on a variable bound before it.
+        seen = set()
+        memo_ok = [True] * (count + 1)
+        for i, (kind, value, _) in enumerate(items):
+            if kind == "var":
+                if value in seen:
+                    for j in range(i + 1):
+                        memo_ok[j] = False
+                seen.add(value)
+
+        def decompose(word: str) -> List[Dict[str, str]]:
+            n = len(word)
+            results = []
+            bindings = {}
+            dead = set()
+
+            def walk(i: int, pos: int) -> bool:
+                if i == count:
+                    results.append(dict(bindings))
+                    return True
+                if (i, pos) in dead:
+                    return False
+
+                found = False
+                kind, value, is_reversed = items[i]
+                if kind == "literal":
+                    found = word[pos] == value and walk(i + 1, pos + 1)
+                else:
+                    rest = n - pos
+                    lo = max(bounds[i][0], rest - suffix_max[i + 1])
+                    hi = min(bounds[i][1], rest - suffix_min[i + 1])
+                    bound = bindings.get(value)
+                    for length in range(lo, hi + 1):
+                        part = word[pos:pos + length]
+                        if is_reversed:
+                            part = part[::-1]
+                        if bound is not None:
+                            if part == bound and walk(i + 1, pos + length):
+                                found = True
+                        elif accept(value, part):
+                            bindings[value] = part
+                            if walk(i + 1, pos + length):
+                                found = True
+                            del bindings[value]
+
+                if not found and memo_ok[i]:
+                    dead.add((i, pos))
+                return found
+
+            walk(0, 0)
+            return results
+
+        return decompose
+
+    def _compile_layout(self, items: List[Tuple[str, str, bool]], lengths: List[int]) -> Tuple[List[Tuple[int, str]], List[Tuple[str, int, int, bool]]]:
+        """Turn one length per item into literal positions and variable slices."""
+        literal_checks = []
+        var_slices = []
+        pos = 0
+        for (kind, value, is_reversed), item_len in zip(items, lengths):
+            if kind == "literal":
+                literal_checks.append((pos, value))
+            else:
+                var_slices.append((value, pos, pos + item_len, is_reversed))
+            pos += item_len
+        return literal_checks, var_slices
+
+    def _split_layouts(self, bounds: List[Tuple[int, int]], suffix_min: List[int], suffix_max: List[int], length: int, limit: int) -> Optional[List[List[int]]]:
+        """List every assignment of item lengths summing to length, or None past limit."""
+        layouts = []
+        lengths = []
+
+        def extend(i: int, rest: int) -> bool:
+            if i == len(bounds):
+                layouts.append(list(lengths))
+                return len(layouts) <= limit
+            lo = max(bounds[i][0], rest - suffix_max[i + 1])
+            hi = min(bounds[i][1], rest - suffix_min[i + 1])
+            for item_len in range(lo, hi + 1):
+                lengths.append(item_len)
+                ok = extend(i + 1, rest - item_len)
+                lengths.pop()
+                if not ok:
+                    return False
+            return True
+
+        return layouts if extend(0, length) else None
+
+    def _layout_decomposer(self, layouts: List[Tuple[List[Tuple[int, str]], List[Tuple[str, int, int, bool]]]], accept: Callable[[str, str], bool]) -> Callable[[str], List[Dict[str, str]]]:
+        """Split words of one length against a fixed set of layouts, checking literals first."""
+        def decompose(word: str) -> List[Dict[str, str]]:
+            results = []
+            for literal_checks, var_slices in layouts:
+                for pos, char in literal_checks:
+                    if word[pos] != char:
+                        break
+                else:
+                    decomp = {}
+                    for var_name, start, stop, is_reversed in var_slices:
+                        part = word[start:stop]
+                        if is_reversed:
+                            part = part[::-1]
+                        bound = decomp.get(var_name)
+                        if bound is not None:
+                            if part != bound:
+                                break
+                        elif not accept(var_name, part):
+                            break
+                        else:
+                            decomp[var_name] = part
+                    else:
+                        results.append(decomp)
+            return results
+
+        return decompose
+
+    def _construct_word_from_structure(self, structure: PatternStructure, decomp: Dict[str, str]) -> Optional[str]:
+        try:
+            word = ""
+            for kind, value, is_reversed in structure.items:
+                if kind == "literal":
+                    word += value
+                    continue
+                if value not in decomp:
+                    return None
+                val = decomp[value]
+                word += val[::-1] if is_reversed else val
+
+            return word
+        except Exception as e:
+            self._notify("error", f"Error constructing word: {e}")
+            return None
+
+    def execute_query(self, query: str, limit: Optional[int] = None) -> Tuple[Optional[List[Tuple[str, Optional[str], Dict[str, str]]]], str]:
+        """Run a query, materializing at most limit results (all of them when limit is None).
+
+        A query that times out or is cancelled returns the results found so
+        far; self.summary["partial"] tells them apart from a complete run.
+        """
+        results = []
+        result_type = "error"
+        for kind, payload in self.stream_results(query, limit):
+            if kind == "type":
+                result_type = payload
+            elif kind == "results":
+                results.extend(payload)
+            elif kind == "done" and payload["status"] == "error":
+                return [], "error"
+        return results, result_type
+
+    def stream_results(self, query: str, limit: Optional[int] = None, batch_size: int = STREAM_BATCH_SIZE, best_first: bool = False,
+                       plan: Optional[QueryPlan] = None, count_total: bool = False) -> Iterator[Tuple[str, object]]:
+        """Run a query lazily, stopping as soon as limit results have been produced.
+
+        Yields ("type", result_type), then ("results", batch) lists of result
+        tuples, each followed by ("progress",
+        fraction) once the engine has reported how much of its candidate space
+        it has scanned, then ("done", summary). The summary holds the status
+        ("complete", "timeout", "cancelled" or "error"), whether more results
+        exist past the limit, the total match count when it is known without
+        enumerating every match (or once everything was enumerated), the plan's
+        estimated_results as estimated_total when the total is not known, any
+        messages, and whether the results are partial because the cancellation
+        token stopped the query, with its progress at that point.
+
+        plan is the query's plan, if the caller has made one. With count_total,
+        a query stopped at its limit goes on, after its last results have been
+        delivered, to count the rest of its matches within its timeout.
+
+        With best_first, results come highest word score first. Simple
+        patterns walk score-ranked length buckets and stop at the limit; other
+        queries keep their best limit results in a bounded heap, so their
+        partial results are the best found so far rather than a leading run of
+        the full order, and the summary marks them as not cacheable. The heap
+        sees every match, so their total is always known.
+        """
+        self._restart_clock()
+        produced = 0
+        has_more = False
+        total = None
+        matched = None
+        status = "complete"
+        result_type = None
+        batch = []
+        try:
+            results_iter, result_type, total = self.iter_query(query, best_first)
+            if best_first and result_type != "simple":
+                matched = [0]
+                # One more than the limit, so that has_more is still detected.
+                results_iter = self.scores.top(self._tally(results_iter, matched), None if limit is None else limit + 1)
+            if self.profile is not None:
+                results_iter = self.profile.timed("match", results_iter)
+            yield "type", result_type
+
+            for result in results_iter:
+                if limit is not None and produced >= limit:
+                    has_more = True
+                    break
+                produced += 1
+                batch.append(result)
+                if len(batch) >= batch_size:
+                    yield "results", batch
+                    batch = []
+                    if self.cancel_token.progress is not None:
+                        yield "progress", self.cancel_token.progress
+            if not has_more:
+                total = produced
+            elif matched is not None:
+                total = matched[0]
+        except QueryStopped as e:
+            self._notify("warning", f"{e} Showing the results found before it stopped.")
+            status = e.reason
+        except Exception as e:
+            self._notify("error", f"An error occurred during query execution: {e}")
+            self._notify("error", traceback.format_exc())
+            status = "error"
+        # Results found before a stop are still delivered.
+        if batch:
+            yield "results", batch
+
+        if has_more and total is None and count_total and status == "complete":
+            try:
+                total = produced + 1 + sum(1 for _ in results_iter)
+            except QueryStopped as e:
+                self._notify("warning", f"{e} The total was not counted.")
+        estimated_total = None
+        if has_more and total is None and plan is not None and plan.estimated_results is not None:
+            # There is at least one match past the limit, whatever the estimate says.
+            estimated_total = max(plan.estimated_results, produced + 1)
+
+        partial = status in ("timeout", "cancelled")
+        summary = {
+            "status": status,
+            "has_more": has_more or partial,
+            "total": total,
+            "estimated_total": estimated_total,
+            "messages": list(self.messages),
+            "partial": partial,
+            "progress": self.cancel_token.progress if partial else 1.0,
+            "cacheable": not (partial and best_first and result_type != "simple"),
+        }
+        if self.profile is not None:
+            summary["profile"] = self.profile.as_dict()
+        self.summary = summary
+        yield "done", summary
+
+    @staticmethod
+    def _tally(results: Iterable, counter: List[int]) -> Iterator:
+        """Pass results through, counting them in counter[0]."""
+        for result in results:
+            counter[0] += 1
+            yield result
+
+    def _split_query(self, query: str) -> Tuple[Dict[str, VariableDefinition], List[str]]:
+        """Parse a query's variable definitions and return them with its remaining search patterns."""
+        raw_parts = query.strip().split(';')
+        parts = [p.strip() for p in raw_parts if p.strip()]
+
+        variable_defs_raw = []
+        search_patterns_raw = []
+        variables = {}
+
+        for part in parts:
+            if is_variable_definition(part):
+                variable_defs_raw.append(part)
+            else:
+                search_patterns_raw.append(part)
+
+        for v_def_str in variable_defs_raw:
+            self._time_check()
+            parsed_var = self.parse_variable_definition(v_def_str)
+            if parsed_var:
+                variables[parsed_var.name] = parsed_var
+            else:
+                self._notify("warning", f"Skipping invalid variable definition: {v_def_str}")
+        return variables, search_patterns_raw
+
+    def iter_query(self, query: str, best_first: bool = False) -> Tuple[Iterator[Tuple[str, Optional[str], Dict[str, str]]], str, Optional[int]]:
+        """Parse a query into a lazy result iterator, its result type and, when cheap to get, its match count.
+
+        best_first orders simple pattern results by score; other results keep their usual order.
+        """
+        with stage(self.profile, "parse"):
+            variables, search_patterns_raw = self._split_query(query)
+
+        is_equation_query = bool(variables) and bool(search_patterns_raw)
+
+        if is_equation_query:
+            if len(search_patterns_raw) > 1:
+                return self._handle_composite_pattern(search_patterns_raw, variables), "equation", None
+            pattern = search_patterns_raw[0]
+            if any('~' in var for var in re.findall(r'(~?[A-R])', pattern)):
+                return self._handle_reverse_pattern(pattern, variables), "equation", None
+            return self._handle_complex_pattern(pattern, variables), "equation", None
+
+        elif len(search_patterns_raw) == 1:
+            pattern = search_patterns_raw[0]
+            if pattern.startswith('/'):
+                matches = self.iter_anagram_pattern(pattern)
+                with stage(self.profile, "count"):
+                    total = self.count_anagram_pattern(pattern)
+                return ((m, None, {}) for m in matches), "anagram", total
+            # Planned once, for both the matches and their count.
+            simple_plan = self._simple_pattern_plan(pattern)
+            matches = self._iter_planned_simple_pattern(simple_plan, best_first)
+            with stage(self.profile, "count"):
+                total = self._count_planned_simple_pattern(simple_plan)
+            return ((m, None, {}) for m in matches), "simple", total
+
+        elif len(search_patterns_raw) > 1:
+            self._notify("warning", "Handling multiple non-equation patterns via intersection.")
+            return ((m, None, {}) for m in self._iter_intersection(search_patterns_raw)), "intersection", None
+
+        self._notify("info", "Query contains only variable definitions. To see matching words, add the variable name(s) as patterns (e.g., A; B;).")
+        return iter(()), "definition_only", 0
+
+    def explain(self, query: str) -> QueryPlan:
+        """Plan a query without running it: the strategy iter_query would pick, with row and cost estimates from the index."""
+        self._restart_clock()
+        plan = QueryPlan(engine="matcher", query=query)
+        variables, patterns = self._split_query(query)
+
+        if variables and patterns:
+            structures = []
+            for pattern in patterns:
+                structure = self.parse_pattern_structure(pattern, variables)
+                if structure is None:
+                    plan.strategy = "invalid query"
+                    break
+                structures.append(structure)
+            else:
+                if len(patterns) > 1:
+                    self._explain_composite(plan, patterns, structures, variables)
+                else:
+                    self._explain_split(plan, structures[0], variables)
+        elif len(patterns) == 1:
+            self._explain_word_pattern(plan, patterns[0])
+        elif len(patterns) > 1:
+            plan.strategy = "match each pattern, then keep the first pattern's matches found by every other"
+            for pattern in patterns:
+                self._explain_word_pattern(plan, pattern)
+            plan.estimated_results = None
+        else:
+            plan.strategy = "variable definitions only; nothing to search"
+            plan.estimated_results = 0
+
+        plan.messages = list(self.messages)
+        return plan
+
+    def _explain_word_pattern(self, plan: QueryPlan, pattern: str) -> None:
+        if pattern.startswith('/'):
+            base_letters, dots, stars = self._parse_anagram_pattern(pattern)
+            lengths = self._anagram_lengths(base_letters, dots, stars)
+            scanned = sum(len(self.word_by_length.get(length, [])) for length in lengths)
+            total = self.count_anagram_pattern(pattern)
+            if total is None:
+                plan.strategy = plan.strategy or "scan words for the anagram's letter counts"
+                plan.add("letter scan", f"{pattern}: count letters of {scanned:,} words", None, scanned)
+            elif stars == 0 and dots == 0:
+                plan.strategy = plan.strategy or "look up the sorted-letter signature"
+                plan.add("signature lookup", pattern, total, total, exact=True)
+            else:
+                plan.strategy = plan.strategy or "compare letter-count matrices of the candidate lengths"
+                plan.add("letter counts", f"{pattern}: {len(lengths)} length bucket(s), {scanned:,} words", total, scanned, exact=True)
+            plan.estimated_results = total
+            return
+
+        simple_plan = self._plan_simple_pattern(pattern)
+        if simple_plan is None:
+            plan.strategy = plan.strategy or "invalid pattern"
+            plan.estimated_results = 0
+            return
+        length_constraint, _, buckets = simple_plan
+        if buckets is None:
+            if length_constraint:
+                scanned = self._words_of_lengths(range(length_constraint[0], length_constraint[1] + 1))
+            else:
+                scanned = len(self.wordlist)
+            plan.strategy = plan.strategy or "scan words with the compiled pattern"
+            plan.add("scan", f"{pattern}: test {scanned:,} words", None, scanned)
+            plan.estimated_results = None
+            return
+
+        candidates = sum(mask.bit_count() for _, mask, _ in buckets)
+        undecided = sum(mask.bit_count() for _, mask, exact in buckets if not exact)
+        plan.strategy = plan.strategy or "intersect positional bitsets"
+        plan.add("bitset lookup", f"{pattern}: {len(buckets)} length bucket(s)", candidates, candidates, exact=True)
+        if undecided:
+            plan.add("verify", f"{pattern}: test the interior of {undecided:,} candidates", None, undecided)
+        plan.estimated_results = None if undecided else candidates
+
+    def _words_of_lengths(self, lengths: Iterable[int]) -> int:
+        return sum(len(self.word_by_length.get(length, [])) for length in lengths)
+
+    def _estimate_domain(self, var_info: VariableDefinition) -> Tuple[int, bool]:
+        """Upper bound on a variable's candidate values from positional bitsets, and whether it is exact."""
+        lengths = range(var_info.min_len, var_info.max_len + 1)
+        tokens = tokenize(var_info.pattern) if var_info.pattern != '*' else None
+        if tokens is None:
+            return self._words_of_lengths(lengths), var_info.pattern == '*'
+        total = 0
+        exact = True
+        for length in lengths:
+            try:
+                mask, bucket_exact = self.positional_index.candidates(tokens, length)
+            except re.error:
+                return self._words_of_lengths(lengths), False
+            total += mask.bit_count()
+            exact = exact and bucket_exact
+        return total, exact
+
+    def _explain_domains(self, plan: QueryPlan, names: Iterable[str], variables: Dict[str, VariableDefinition]) -> Dict[str, int]:
+        sizes = {}
+        for name in names:
+            var_info = variables[name]
+            size, exact = self._estimate_domain(var_info)
+            scanned = self._words_of_lengths(range(var_info.min_len, var_info.max_len + 1))
+            lengths = str(var_info.min_len) if var_info.is_fixed_length else f"{var_info.min_len}-{var_info.max_len}"
+            plan.add(f"domain {name}", f"{lengths}-letter words matching '{var_info.pattern}'", size, scanned, exact)
+            sizes[name] = size
+        return sizes
+
+    def _split_estimate(self, structure: PatternStructure, variables: Dict[str, VariableDefinition]) -> Tuple[int, int, int]:
+        """(candidate words, split checks, most splits of one word) for splitting words into a structure's items."""
+        choices = []
+        for kind, value, _ in structure.items:
+            if kind == "var":
+                choices.append(range(variables[value].min_len, variables[value].max_len + 1))
+            else:
+                choices.append((1,))
+        prefix, suffix = self._structure_affixes(structure, variables)
+        candidates = checks = widest = 0
+        for length in range(structure.total_length, structure.max_length + 1):
+            words = self.affix_index.count(length, prefix, suffix)
+            if not words:
+                continue
+            splits = count_splits(choices, length)
+            candidates += words
+            checks += words * splits
+            widest = max(widest, splits)
+        return candidates, checks, widest
+
+    def _explain_split(self, plan: QueryPlan, structure: PatternStructure, variables: Dict[str, VariableDefinition]) -> None:
+        plan.strategy = "find each variable's values, then split candidate words at every allowed boundary"
+        if structure.type == PatternType.REVERSE:
+            plan.strategy += " and look up the reversed reading"
+        names = list(dict.fromkeys(name for name, _ in structure.variables))
+        self._explain_domains(plan, names, variables)
+        candidates, checks, widest = self._split_estimate(structure, variables)
+        prefix, suffix = self._structure_affixes(structure, variables)
+        scope = "".join(f" {end} '{letters}'" for end, letters in (("starting", prefix), ("ending", suffix)) if letters)
+        plan.add("split", f"{structure.original}: {candidates:,} candidate words{scope}, up to {widest} split(s) each", candidates, checks, exact=not (prefix and suffix))
+        plan.estimated_results = self._sample_splits(structure, variables)
+
+    def _sample_splits(self, structure: PatternStructure, variables: Dict[str, VariableDefinition]) -> int:
+        """Estimate the matches of a split by splitting up to SPLIT_SAMPLE_SIZE evenly spaced candidates of each length."""
+        predicates = self._variable_predicates(variables)
+        words_set = self.words_set
+        decompose = self._decomposer(structure, variables, lambda var_name, part: part in words_set and predicates[var_name](part))
+        if structure.type == PatternType.REVERSE:
+            # Mirrors _handle_reverse_pattern, which keeps only splits whose reversed reading is a word too.
+            literals = "".join(structure.literals)
+            split = decompose
+            decompose = lambda word: [decomp for decomp in split(word) if "".join(
+                decomp[var_name][::-1] if is_reversed else decomp[var_name] for var_name, is_reversed in structure.variables) + literals in words_set]
+        prefix, suffix = self._structure_affixes(structure, variables)
+        estimate = 0.0
+        for length in range(structure.total_length, structure.max_length + 1):
+            words = self.affix_index.words(length, prefix, suffix)
+            if not words:
+                continue
+            sample = words[::-(-len(words) // SPLIT_SAMPLE_SIZE)]
+            estimate += sum(len(decompose(word)) for word in sample) * len(words) / len(sample)
+        return round(estimate)
+
+    def _explain_composite(self, plan: QueryPlan, patterns: List[str], structures: List[PatternStructure], variables: Dict[str, VariableDefinition]) -> None:
+        plan.strategy = "tabulate each pattern as a constraint on the variables, propagate, then backtrack smallest domain first"
+        word_patterns = [structure for pattern, structure in zip(patterns, structures) if not pattern.startswith('/') and structure.variables]
+        names = list(dict.fromkeys(name for structure in word_patterns for name, _ in structure.variables))
+        sizes = self._explain_domains(plan, names, variables)
+
+        costs = []
+        for structure in sorted(word_patterns, key=lambda st: self._scan_size(st, variables)):
+            constraint_names = list(dict.fromkeys(name for name, _ in structure.variables))
+            product_size = 1
+            for name in constraint_names:
+                product_size *= sizes[name]
+            # Mirrors _build_constraint's choice between enumerating and scanning.
+            if product_size <= self._scan_size(structure, variables):
+                plan.add("enumerate", f"{structure.original}: every combination of {', '.join(constraint_names)}", None, product_size)
+                costs.append(product_size)
+            else:
+                candidates, checks, widest = self._split_estimate(structure, variables)
+                plan.add("split", f"{structure.original}: {candidates:,} candidate words, up to {widest} split(s) each", None, checks)
+                costs.append(checks)
+
+        if names:
+            smallest = min(sizes.values())
+            plan.add("search", f"backtrack over {len(names)} variable(s), starting from {smallest:,} values", None, smallest * max(1, len(costs)))
+
+    def _iter_intersection(self, patterns: List[str]) -> Iterator[str]:
+        """Stream the first pattern's matches that every other pattern also matches."""
+        others = []
+        for pattern in patterns[1:]:
+            self._time_check()
+            if pattern.startswith('/'):
+                matches = set(self.iter_anagram_pattern(pattern))
+            else:
+                matches = set(self.iter_simple_pattern(pattern))
+            if not matches:
+                return
+            others.append(matches)
+
+        first = patterns[0]
+        first_matches = self.iter_anagram_pattern(first) if first.startswith('/') else self.iter_simple_pattern(first)
+        for word in first_matches:
+            if all(word in matches for matches in others):
+                yield word
+
+    def process_anagram_pattern(self, pattern_str: str) -> Optional[List[str]]:
+        if not pattern_str.startswith('/'):
+            return None
+        return list(self.iter_anagram_pattern(pattern_str))
+
+    def _parse_anagram_pattern(self, pattern_str: str) -> Tuple[List[str], int, int]:
+        content = pattern_str[1:]
+        base_letters = sorted([c for c in content if c.isalpha()])
+        return base_letters, content.count('.'), content.count('*')
+
+    def _anagram_lengths(self, base_letters: List[str], dots: int, stars: int) -> List[int]:
+        min_len = len(base_letters) + dots
+        if stars == 0:
+            return [min_len]
+        return [length for length in sorted(self.word_by_length) if length >= min_len]
+
+    def iter_anagram_pattern(self, pattern_str: str) -> Iterator[str]:
+        self._time_check()
+        base_letters, dots, stars = self._parse_anagram_pattern(pattern_str)
+
+        if any(c not in ALPHABET for c in base_letters):
+            yield from self._scan_anagram_pattern(base_letters, dots, stars)
+            return
+
+        letters = "".join(base_letters)
+        if stars == 0 and dots == 0:
+            self._count("candidates", len(self.word_by_length.get(len(letters), [])))
+            yield from self.anagram_index.exact(letters)
+            return
+
+        lengths = self._anagram_lengths(base_letters, dots, stars)
+        for done, length in enumerate(lengths):
+            self._progress(done, len(lengths))
+            self._time_check()
+            self._count("candidates", len(self.word_by_length.get(length, [])))
+            yield from self.anagram_index.containing(letters, length)
+
+    def count_anagram_pattern(self, pattern_str: str) -> Optional[int]:
+        """Number of matches, counted on the index without listing them; None if not countable."""
+        base_letters, dots, stars = self._parse_anagram_pattern(pattern_str)
+        if any(c not in ALPHABET for c in base_letters):
+            return None
+        letters = "".join(base_letters)
+        if stars == 0 and dots == 0:
+            return len(self.anagram_index.exact(letters))
+        return sum(self.anagram_index.count_containing(letters, length)
+                   for length in self._anagram_lengths(base_letters, dots, stars))
+
+    def _scan_anagram_pattern(self, base_letters: List[str], dots: int, stars: int) -> Iterator[str]:
+        base_counts = defaultdict(int)
+        for char in base_letters:
+            base_counts[char] += 1
+
+        min_len = len(base_letters) + dots
+        max_len = None if stars > 0 else len(base_letters) + dots
+
+        candidate_words = []
+        if max_len is not None:
+            if min_len == max_len:
+                candidate_words = self.word_by_length.get(min_len, [])
+            else:
+                for length in range(min_len, max_len + 1):
+                    candidate_words.extend(self.word_by_length.get(length, []))
+        else:
+            for length, words in self.word_by_length.items():
+                if length >= min_len:
+                    candidate_words.extend(words)
+
+        self._count("candidates", len(candidate_words))
+        for i, word in enumerate(candidate_words):
+            if i % 1000 == 0:
+                self._progress(i, len(candidate_words))
+                self._time_check()
+
+            if max_len is not None and len(word) != max_len:
+                continue
+            if len(word) < min_len:
+                continue
+
+            word_counts = defaultdict(int)
+            possible = True
+            for char in word:
+                word_counts[char] += 1
+
+            for char, count in base_counts.items():
+                if word_counts[char] < count:
+                    possible = False
+                    break
+            if not possible:
+                continue
+
+            if stars == 0:
+                extra_letters = len(word) - len(base_letters)
+                if extra_letters != dots:
+                    possible = False
+
+            if possible:
+                yield word
+
+    def find_matches_simple_pattern(self, pattern_str: str) -> List[str]:
+        return list(self.iter_simple_pattern(pattern_str))
+
+    def _simple_pattern_plan(self, pattern_str: str) -> Optional[SimplePatternPlan]:
+        """Compile a simple pattern and, when the positional index can serve it, its (length, mask, exact) buckets."""
+        with stage(self.profile, "plan"):
+            return self._plan_simple_pattern(pattern_str)
+
+    def _plan_simple_pattern(self, pattern_str: str) -> Optional[SimplePatternPlan]:
+        length_constraint, clean_pattern = self.length_constraint_from_pattern(pattern_str)
+
+        try:
+            compiled = compile_pattern(clean_pattern)
+        except re.error as e:
+            self._notify("error", f"Invalid pattern leads to regex error: {clean_pattern} -> {e}")
+            return None
+
+        tokens = tokenize(clean_pattern)
+        if tokens is None:
+            return length_constraint, compiled, None
+
+        if length_constraint:
+            min_len, max_len = length_constraint
+            lengths = range(min_len, max_len + 1)
+        else:
+            lengths = sorted(self.word_by_length)
+
+        buckets = []
+        for length in lengths:
+            self._time_check()
+            mask, exact = self.positional_index.candidates(tokens, length)
+            if mask:
+                buckets.append((length, mask, exact))
+        return length_constraint, compiled, buckets
+
+    def iter_simple_pattern(self, pattern_str: str, best_first: bool = False) -> Iterator[str]:
+        self._time_check()
+        yield from self._iter_planned_simple_pattern(self._simple_pattern_plan(pattern_str), best_first)
+
+    def _iter_planned_simple_pattern(self, plan: Optional[SimplePatternPlan], best_first: bool = False) -> Iterator[str]:
+        """Matches of a simple pattern already planned by _simple_pattern_plan."""
+        if plan is None:
+            return
+        length_constraint, compiled, buckets = plan
+        if best_first:
+            yield from self._iter_ranked_simple_pattern(compiled, length_constraint, buckets)
+            return
+        if buckets is None:
+            yield from self._scan_simple_pattern(compiled, length_constraint)
+            return
+
+        self._count("candidates", sum(mask.bit_count() for _, mask, _ in buckets))
+        streams = [self._iter_bucket_matches(length, mask, exact, compiled) for length, mask, exact in buckets]
+        if length_constraint:
+            for stream in streams:
+                yield from stream
+        else:
+            # Without a length constraint results come out alphabetically, as a full scan would.
+            yield from heapq.merge(*streams)
+
+    def _iter_bucket_matches(self, length: int, mask: int, exact: bool, compiled: CompiledPattern) -> Iterator[str]:
+        self._time_check()
+        # Interior '*' segments aren't anchored, so verify the survivors.
+        match = compiled.match if not exact else None
+        if match is not None:
+            match = self._counted("predicate_evaluations", match)
+        for word in self.positional_index.words(length, mask):
+            if match is None or match(word):
+                yield word
+
+    def _iter_ranked_simple_pattern(self, compiled: CompiledPattern, length_constraint: Optional[Tuple[int, int]], buckets: Optional[List[Tuple[int, int, bool]]]) -> Iterator[str]:
+        """Matches best first, merged lazily across lengths so that a limited query stops after its first hits."""
+        if buckets is None:
+            lengths = range(length_constraint[0], length_constraint[1] + 1) if length_constraint else sorted(self.word_by_length)
+            buckets = [(length, None, False) for length in lengths if self.word_by_length.get(length)]
+            self._count("candidates", sum(len(self.word_by_length[length]) for length, _, _ in buckets))
+        else:
+            self._count("candidates", sum(mask.bit_count() for _, mask, _ in buckets))
+        streams = [self._iter_ranked_bucket_matches(length, mask, exact, compiled) for length, mask, exact in buckets]
+        for _, word in heapq.merge(*streams):
+            yield word
+
+    def _iter_ranked_bucket_matches(self, length: int, mask: Optional[int], exact: bool, compiled: CompiledPattern) -> Iterator[Tuple[int, str]]:
+        """(negated score, word) for one length bucket's matches, best first; a mask of None means every word is a candidate."""
+        self._time_check()
+        words = self.word_by_length.get(length, [])
+        scores = self.scores.scores(length)
+        match = compiled.match if not exact else None
+        if match is not None:
+            match = self._counted("predicate_evaluations", match)
+
+        bits = None
+        if mask is not None and mask.bit_count() * SPARSE_RANK_RATIO < len(words):
+            positions = sorted(bit_positions(mask), key=lambda i: (-scores[i], i))
+        else:
+            positions = self.scores.ranked(length)
+            if mask is not None:
+                bits = bin(mask)[:1:-1]  # least significant bit first
+        for done, i in enumerate(positions):
+            if done % 2000 == 0:
+                self._time_check()
+            if bits is not None and (i >= len(bits) or bits[i] != "1"):
+                continue
+            word = words[i]
+            if match is None or match(word):
+                yield -scores[i], word
+
+    def _count_planned_simple_pattern(self, plan: Optional[SimplePatternPlan]) -> Optional[int]:
+        """Number of matches from bitset popcounts; None when some bucket still needs verifying."""
+        if plan is None:
+            return 0
+        _, _, buckets = plan
+        if buckets is None or not all(exact for _, _, exact in buckets):
+            return None
+        return sum(mask.bit_count() for _, mask, _ in buckets)
+
+    def _scan_simple_pattern(self, compiled: CompiledPattern, length_constraint: Optional[Tuple[int, int]]) -> Iterator[str]:
+        candidate_words = []
+
+        if length_constraint:
+            min_len, max_len = length_constraint
+            for length in range(min_len, max_len + 1):
+                candidate_words.extend(self.word_by_length.get(length, []))
+        else:
+            candidate_words = self.wordlist
+
+        self._count("candidates", len(candidate_words))
+        match = self._counted("predicate_evaluations", compiled.match)
+        for i, word in enumerate(candidate_words):
+            if i % 2000 == 0:
+                self._progress(i, len(candidate_words))
+                self._time_check()
+
+            if match(word):
+                yield word
+
+    def length_constraint_from_pattern(self, pattern_str):
+        match = re.match(r'^(\d+):(.*)', pattern_str)
+        if match:
+            length, rest_pattern = match.groups()
+            length = int(length)
+            if length > 0:
+                 return (length, length), rest_pattern
+            else:
+                 self._notify("warning", f"Invalid exact length constraint: {pattern_str}")
+                 return None, pattern_str
+
+        match = re.match(r'^(\d+)-(\d+):(.*)', pattern_str)
+        if match:
+            min_l, max_l, rest_pattern = match.groups()
+            min_len, max_len = int(min_l), int(max_l)
+            if 0 < min_len <= max_len:
+                 return (min_len, max_len), rest_pattern
+            else:
+                 self._notify("warning", f"Invalid range length constraint: {pattern_str}")
+                 return None, pattern_str
+
+        return None, pattern_str
+
+    def _format_result(self, result: Tuple[str, Optional[str], Dict[str, str]], pattern_type: str) -> str:
+        return format_result(result, pattern_type)
+
+    def _optimize_word_candidates(self, structure: PatternStructure, variables: Dict[str, VariableDefinition]) -> List[str]:
+        """Words of the structure's lengths that start and end with the letters it fixes, found by range lookups."""
+        prefix, suffix = self._structure_affixes(structure, variables)
+        candidates = []
+        with stage(self.profile, "candidates"):
+            for length in range(structure.total_length, structure.max_length + 1):
+                candidates.extend(self.affix_index.words(length, prefix, suffix))
+        self._count("candidates", len(candidates))
+
+        return candidates
+
+    def _structure_affixes(self, structure: PatternStructure, variables: Dict[str, VariableDefinition]) -> Tuple[str, str]:
+        """Letters every word spelled by the structure starts and ends with, from its outer literals and outer variables' patterns."""
+        return self._outer_letters(structure.items, variables, False), self._outer_letters(structure.items[::-1], variables, True)[::-1]
+
+    def _outer_letters(self, items: List[Tuple[str, str, bool]], variables: Dict[str, VariableDefinition], from_end: bool) -> str:
+        """Fixed letters met walking items inwards from one end of the word, nearest first."""
+        letters = []
+        for kind, value, is_reversed in items:
+            if kind == "literal":
+                letters.append(value)
+                continue
+            tokens = tokenize(variables[value].pattern)
+            if tokens is not None:
+                # A reversed variable is spelled backwards in the word, so its other end faces outwards.
+                if is_reversed != from_end:
+                    tokens = tokens[::-1]
+                for token in tokens:
+                    if not is_literal(token):
+                        break
+                    letters.append(token)
+            break
+        return "".join(letters)
+
+    def _precompute_pattern_matches(self, structure: PatternStructure, variables: Dict[str, VariableDefinition]) -> Dict[str, Set[str]]:
+        """Precompute matches for each variable in the pattern."""
+        matches = {}
+        with stage(self.profile, "precompute"):
+            predicates = self._variable_predicates(variables)
+            for var_name, is_reversed in structure.variables:
+                var_info = variables[var_name]
+                predicate = predicates[var_name]
+                var_matches = set()
+
+                for length in range(var_info.min_len, var_info.max_len + 1):
+                    bucket = self.word_by_length.get(length, [])
+                    self._count("predicate_evaluations", len(bucket))
+                    for word in bucket:
+                        if predicate(word):
+                            var_matches.add(word)
+
+                matches[var_name] = var_matches
+
+        return matches
+
+    def _validate_variable_constraints(self, variables: Dict[str, VariableDefinition]) -> bool:
+        """Validate that all variable constraints are consistent."""
+        var_names = set(variables.keys())
+        if len(var_names) != len(variables):
+            self._notify("error", "Duplicate variable names found.")
+            return False
+
+        for name in var_names:
+            if not (len(name) == 1 and 'A' <= name <= 'R'):
+                self._notify("error", f"Invalid variable name: {name}. Must be a single letter A-R.")
+                return False
+            
+        for var_info in variables.values():
+            try:
+                compile_pattern(var_info.pattern)
+            except re.error as e:
+                self._notify("error", f"Invalid pattern for variable {var_info.name}: {e}")
+                return False
+
+        return True
+
+    def _optimize_pattern_matching(self, structure: PatternStructure, variables: Dict[str, VariableDefinition]) -> Iterator[Tuple[str, Dict[str, str]]]:
+        """Optimize pattern matching by using precomputed matches and early filtering."""
+        var_matches = self._precompute_pattern_matches(structure, variables)
+        if not var_matches:
+            return
+
+        decompose = self._decomposer(structure, variables, self._counted("split_checks", lambda var_name, part: part in var_matches[var_name]))
+        candidates = self._optimize_word_candidates(structure, variables)
+        for i, word in enumerate(candidates):
+            self._progress(i, len(candidates))
+            self._time_check()
+            for decomp in decompose(word):
+                yield word, decomp
+
+    def _handle_complex_pattern(self, pattern: str, variables: Dict[str, VariableDefinition]) -> Iterator[Tuple[str, Optional[str], Dict[str, str]]]:
+        """Handle patterns with multiple variables and literals using optimized matching."""
+        if not self._validate_variable_constraints(variables):
+            return
+        structure = self.parse_pattern_structure(pattern, variables)
+        if not structure:
+            return
+
+        for word, decomp in self._optimize_pattern_matching(structure, variables):
+            yield word, None, decomp
+
+    def _handle_reverse_pattern(self, pattern: str, variables: Dict[str, VariableDefinition]) -> Iterator[Tuple[str, Optional[str], Dict[str, str]]]:
+        """Handle patterns with reversed variables using optimized matching."""
+        if not self._validate_variable_constraints(variables):
+            return
+        structure = self.parse_pattern_structure(pattern, variables)
+        if not structure:
+            return
+
+        # The reversed reading is the variables as spelled in the word, followed by the literals.
+        literals = "".join(structure.literals)
+        for word, decomp in self._optimize_pattern_matching(structure, variables):
+            reversed_word = "".join(decomp[var_name][::-1] if is_reversed else decomp[var_name] for var_name, is_reversed in structure.variables) + literals
+            if reversed_word in self.words_set:
+                yield word, reversed_word, decomp
+
+    def _all_possible_variable_values(self, var: VariableDefinition) -> List[str]:
+        """Generate all possible values for a variable, matching its pattern and length constraints."""
+        results = []
+        predicate = self._variable_predicates({var.name: var})[var.name]
+        for length in range(var.min_len, var.max_len + 1):
+            bucket = self.word_by_length.get(length, [])
+            self._count("predicate_evaluations", len(bucket))
+            for word in bucket:
+                if predicate(word):
+                    results.append(word)
+        return list(set(results))
+
+    def _handle_composite_pattern(self, patterns: List[str], variables: Dict[str, VariableDefinition]) -> Iterator[Tuple[str, Optional[str], Dict[str, str]]]:
+        """Solve a multi-pattern equation as a constraint problem over the variables' candidate sets."""
+        if not self._validate_variable_constraints(variables):
+            return
+
+        word_patterns = []
+        anagram_patterns = []
+        for pattern in patterns:
+            structure = self.parse_pattern_structure(pattern, variables)
+            if not structure:
+                return
+            if pattern.startswith('/'):
+                anagram_patterns.append(pattern)
+            elif structure.variables:
+                word_patterns.append(structure)
+        if not word_patterns:
+            return
+
+        domains = {}
+        with stage(self.profile, "domains"):
+            for structure in word_patterns:
+                for var_name, _ in structure.variables:
+                    if var_name not in domains:
+                        domains[var_name] = set(self._all_possible_variable_values(variables[var_name]))
+
+        constraints = []
+        for structure in sorted(word_patterns, key=lambda st: self._scan_size(st, variables)):
+            with stage(self.profile, "constraints"):
+                constraint = self._build_constraint(structure, variables, domains)
+            constraints.append(constraint)
+            self._count("constraint_rows", len(constraint.rows))
+            with stage(self.profile, "propagate"):
+                consistent = self._propagate(constraints, domains)
+            if not consistent:
+                return
+
+        # Single-variable constraints are fully captured by the propagated domains.
+        joins = [constraint for constraint in constraints if len(constraint.names) > 1]
+        primary = max(word_patterns, key=lambda st: (len({name for name, _ in st.variables}), st.max_length))
+        for decomp in self._search_assignments(joins, domains, {}):
+            word = self._construct_word_from_structure(primary, decomp)
+            if all(self._check_anagram_pattern(word, decomp, pattern, variables) for pattern in anagram_patterns):
+                yield word, None, decomp
+
+    def _scan_size(self, structure: PatternStructure, variables: Dict[str, VariableDefinition]) -> int:
+        prefix, suffix = self._structure_affixes(structure, variables)
+        return sum(self.affix_index.count(length, prefix, suffix) for length in range(structure.total_length, structure.max_length + 1))
+
+    def _build_constraint(self, structure: PatternStructure, variables: Dict[str, VariableDefinition], domains: Dict[str, Set[str]]) -> EquationConstraint:
+        """Tabulate the variable values for which a pattern spells a word, by whichever of scanning or enumeration is cheaper."""
+        names = []
+        for var_name, _ in structure.variables:
+            if var_name not in names:
+                names.append(var_name)
+        names = tuple(names)
+
+        rows = set()
+        product_size = 1
+        for name in names:
+            product_size *= len(domains[name])
+
+        if product_size <= self._scan_size(structure, variables):
+            self._count("candidates", product_size)
+            for values in itertools.product(*(sorted(domains[name]) for name in names)):
+                self._time_check()
+                decomp = dict(zip(names, values))
+                if self._construct_word_from_structure(structure, decomp) in self.words_set:
+                    rows.add(values)
+        else:
+            decompose = self._decomposer(structure, variables, self._counted("split_checks", lambda var_name, part: part in domains[var_name]))
+            prefix, suffix = self._structure_affixes(structure, variables)
+            for length in range(structure.total_length, structure.max_length + 1):
+                candidates = self.affix_index.words(length, prefix, suffix)
+                self._count("candidates", len(candidates))
+                for word in candidates:
+                    self._time_check()
+                    for decomp in decompose(word):
+                        rows.add(tuple(decomp[name] for name in names))
+
+        return EquationConstraint(structure=structure, names=names, rows=rows)
+
+    def _propagate(self, constraints: List[EquationConstraint], domains: Dict[str, Set[str]]) -> bool:
+        """Shrink domains and constraint rows against each other until neither changes; False once anything empties."""
+        changed = True
+        while changed:
+            self._time_check()
+            changed = False
+            for constraint in constraints:
+                names = constraint.names
+                rows = {row for row in constraint.rows if all(value in domains[name] for name, value in zip(names, row))}
+                if not rows:
+                    return False
+                if len(rows) != len(constraint.rows):
+                    constraint.set_rows(rows)
+                for position, name in enumerate(names):
+                    supported = {row[position] for row in rows}
+                    if len(supported) < len(domains[name]):
+                        domains[name] &= supported
+                        changed = True
+        return True
+
+    def _search_assignments(self, constraints: List[EquationConstraint], domains: Dict[str, Set[str]], assignment: Dict[str, str]) -> Iterator[Dict[str, str]]:
+        """Backtrack over variables, smallest domain first, forward-checking every constraint the assigned variable touches."""
+        unassigned = [name for name in domains if name not in assignment]
+        if not unassigned:
+            yield dict(assignment)
+            return
+
+        var_name = min(unassigned, key=lambda name: (len(domains[name]), -sum(name in c.names for c in constraints)))
+        values = sorted(domains[var_name])
+        for i, value in enumerate(values):
+            if not assignment:
+                # The first variable's values split the search space evenly enough to measure progress by.
+                self._progress(i, len(values))
+            self._time_check()
+            assignment[var_name] = value
+            narrowed = self._forward_check(constraints, domains, assignment, var_name)
+            if narrowed is not None:
+                yield from self._search_assignments(constraints, narrowed, assignment)
+            del assignment[var_name]
+
+    def _forward_check(self, constraints: List[EquationConstraint], domains: Dict[str, Set[str]], assignment: Dict[str, str], var_name: str) -> Optional[Dict[str, Set[str]]]:
+        narrowed = dict(domains)
+        narrowed[var_name] = {assignment[var_name]}
+        for constraint in constraints:
+            if var_name not in constraint.names:
+                continue
+            rows = constraint.rows_with(assignment)
+            if not rows:
+                return None
+            for position, name in enumerate(constraint.names):
+                if name in assignment:
+                    continue
+                supported = narrowed[name] & {row[position] for row in rows}
+                if not supported:
+                    return None
+                narrowed[name] = supported
+        return narrowed
+
+    def _check_anagram_pattern(self, base_word: str, decomp: Dict[str, str], pattern: str, variables: Dict[str, VariableDefinition]) -> bool:
+        """Check if a word can match an anagram pattern based on decomposed variable values."""
+        structure = self.parse_pattern_structure(pattern, variables)
+        if not structure:
+            return False
+
+        # Count all letters in the base word
+        base_letter_counts = defaultdict(int)
+        for char in base_word:
+            base_letter_counts[char] += 1
+
+        # Check if all letters in the anagram pattern can be matched
+        for var_name, is_reversed in structure.variables:
+            var_value = decomp.get(var_name, "")
+            if is_reversed:
+                var_value = var_value[::-1]
+
+            for char in var_value:
+                if base_letter_counts[char] <= 0:
+                    return False
+                base_letter_counts[char] -= 1
+
+        return True
+
+
+def is_variable_definition(part: str) -> bool:
+    return '=' in part and part[0].isalpha() and part[0].isupper() and part[0] <= 'R'
+
+
+def canonical_query(query: str) -> str:
+    """Query text with surrounding whitespace and empty parts dropped and variable definitions sorted by name."""
+    parts = [p.strip() for p in query.strip().split(';') if p.strip()]
+    definitions = sorted((p for p in parts if is_variable_definition(p)), key=lambda p: p[0])
+    patterns = [p for p in parts if not is_variable_definition(p)]
+    return ";".join(definitions + patterns)
+
+
+def format_result(result: Tuple[str, Optional[str], Dict[str, str]], pattern_type: str) -> str:
+    word1, word2, decomp = result
+    if pattern_type == "equation":
+        decomp_str = " - ".join(f"{k}={v}" for k, v in sorted(decomp.items()))
+        if word2:
+            return f"{word1} / {word2}    ({decomp_str})"
+        return f"{word1}    ({decomp_str})"
+    return word1
+
+
+def explain_query(index: WordlistIndex, query: str, timeout: int) -> QueryPlan:
+    """Executor task: the plan PatternMatcher would follow for a query, without running it."""
+    return PatternMatcher.from_index(index, timeout=timeout).explain(query)
+
+
+def stream_query(index: WordlistIndex, query: str, timeout: int, limit: Optional[int] = None, profile: bool = False, max_cost: Optional[int] = None,
+                 best_first: bool = False, count_total: bool = False) -> Iterator[Tuple[str, object]]:
+    """Executor task: stream PatternMatcher.stream_results events for one query, with a stage profile if asked.
+
+    With max_cost, the query is planned first and refused, before any
+    matching, when its estimated cost is above it; the plan then also gives
+    a capped result its estimated total. count_total is passed to stream_results.
+    """
+    matcher = PatternMatcher.from_index(index, timeout=timeout, profile=QueryProfile() if profile else None)
+    plan = None
+    if max_cost:
+        with stage(matcher.profile, "estimate"):
+            plan = matcher.explain(query)
+        try:
+            warning = check_cost(plan, max_cost)
+        except QueryTooExpensive as e:
+            yield "type", "error"
+            yield "done", {"status": "error", "has_more": False, "total": 0, "messages": [("error", str(e))], "partial": False, "progress": None}
+            return
+        if warning:
+            matcher._notify("warning", warning)
+    yield from matcher.stream_results(query, limit, best_first=best_first, plan=plan, count_total=count_total)
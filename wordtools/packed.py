@@ -0,0 +1,176 @@
+from bisect import bisect_left, bisect_right
+from collections.abc import Sequence as SequenceABC
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+from zlib import crc32
+
+import numpy as np
+
+# Words decoded per chunk when iterating.
+ITER_CHUNK = 4096
+
+
+def word_hash(data: bytes) -> int:
+    """Hash of a word's UTF-8 bytes for the membership and signature tables; the same in every process."""
+    return crc32(data)
+
+
+def signature(word: str) -> str:
+    """A word's letters in sorted order, shared by all of its anagrams."""
+    return "".join(sorted(word))
+
+
+class PackedWordlist:
+    """Every word of a list stored once, in one UTF-8 blob, as laid out by a snapshot (see snapshot.py).
+
+    The blob holds the words in length-major, alphabetical order, each
+    followed by "\\n"; offsets locate them, order lists them alphabetically
+    table is an open-addressing hash table of positions for membership
+    tests, and signature_hashes, sorted, with signature_positions alongside,
+    finds the words sharing a signature for exact anagrams. The sections may be slices of an mmapped snapshot, in which case
+    every process using the list shares one copy of it.
+    """
+
+    def __init__(self, buffer, blob, offsets, order, scores, table, signature_hashes, signature_positions, buckets: List[Tuple[int, int, int]]):
+        self.buffer = buffer
+        self.blob = blob
+        self.offsets = offsets
+        self.order = order
+        self.table = table
+        self._mask = len(table) - 1
+        self.signature_hashes = signature_hashes
+        self.signature_positions = signature_positions
+        self.buckets: Dict[int, PackedWords] = {length: PackedWords(self, length, first, count) for length, first, count in buckets}
+        self.score_by_length: Dict[int, Sequence[int]] = {length: scores[first:first + count] for length, first, count in buckets}
+        self.alphabetical = AlphabeticalWords(self)
+        self._np_blob = np.frombuffer(blob, dtype=np.uint8)
+        self._np_offsets = np.frombuffer(offsets, dtype=np.uint32)
+        self._np_order = np.frombuffer(order, dtype=np.uint32)
+
+    def word(self, position: int) -> str:
+        offsets = self.offsets
+        return str(self.blob[offsets[position]:offsets[position + 1] - 1], "utf-8")
+
+    def words(self, start: int, stop: int) -> List[str]:
+        """Words at positions start to stop, decoded in one go."""
+        if start >= stop:
+            return []
+        return str(self.blob[self.offsets[start]:self.offsets[stop] - 1], "utf-8").split("\n")
+
+    def gather(self, positions: np.ndarray) -> List[str]:
+        """Words at arbitrary positions, copied out of the blob together and decoded in one go."""
+        if not len(positions):
+            return []
+        starts = self._np_offsets[positions].astype(np.int64)
+        sizes = self._np_offsets[positions + 1] - starts
+        ends = np.cumsum(sizes)
+        index = np.arange(ends[-1]) + np.repeat(starts - (ends - sizes), sizes)
+        return self._np_blob[index].tobytes()[:-1].decode("utf-8").split("\n")
+
+    def find(self, word: str) -> int:
+        """Position of word in the blob, or -1."""
+        data = word.encode("utf-8")
+        blob, offsets, table, mask = self.blob, self.offsets, self.table, self._mask
+        slot = word_hash(data) & mask
+        while True:
+            entry = table[slot]
+            if not entry:
+                return -1
+            position = entry - 1
+            if blob[offsets[position]:offsets[position + 1] - 1] == data:
+                return position
+            slot = (slot + 1) & mask
+
+    def anagrams(self, letters: str) -> List[str]:
+        """Words whose sorted letters are those of letters, alphabetically; a binary search of the signature hashes."""
+        key = signature(letters)
+        target = word_hash(key.encode("utf-8"))
+        hashes = self.signature_hashes
+        start, stop = bisect_left(hashes, target), bisect_right(hashes, target)
+        # Different signatures can share a hash, so each word is checked.
+        return [word for word in map(self.word, self.signature_positions[start:stop]) if signature(word) == key]
+
+    def __contains__(self, word: object) -> bool:
+        return isinstance(word, str) and self.find(word) >= 0
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.alphabetical)
+
+
+class PackedWords(SequenceABC):
+    """The words of one length: a contiguous, alphabetical run of a PackedWordlist, decoded on access."""
+
+    def __init__(self, packed: PackedWordlist, length: int, first: int, count: int):
+        self.packed = packed
+        self.length = length
+        self.first = first
+        self.count = count
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            start, stop, step = i.indices(self.count)
+            if step != 1:
+                return [self[j] for j in range(start, stop, step)]
+            return self.packed.words(self.first + start, self.first + max(start, stop))
+        if i < 0:
+            i += self.count
+        if not 0 <= i < self.count:
+            raise IndexError("word position out of range")
+        return self.packed.word(self.first + i)
+
+    def __iter__(self) -> Iterator[str]:
+        first, stop = self.first, self.first + self.count
+        for start in range(first, stop, ITER_CHUNK):
+            yield from self.packed.words(start, min(stop, start + ITER_CHUNK))
+
+    def byte_matrix(self) -> Optional[np.ndarray]:
+        """A (words x length) view of the run's bytes if every word in it is ASCII, else None."""
+        packed = self.packed
+        start, stop = packed.offsets[self.first], packed.offsets[self.first + self.count]
+        if stop - start != self.count * (self.length + 1):
+            return None
+        return packed._np_blob[start:stop].reshape(self.count, self.length + 1)[:, :self.length]
+
+    def find(self, word: str) -> int:
+        """Position of word in this run, or -1."""
+        position = self.packed.find(word)
+        return position - self.first if self.first <= position < self.first + self.count else -1
+
+    def __contains__(self, word: object) -> bool:
+        return isinstance(word, str) and self.find(word) >= 0
+
+
+class AlphabeticalWords(SequenceABC):
+    """Every word of a PackedWordlist in alphabetical order, decoded on access."""
+
+    def __init__(self, packed: PackedWordlist):
+        self.packed = packed
+
+    def __len__(self) -> int:
+        return len(self.packed)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return self.packed.gather(self.packed._np_order[i])
+        return self.packed.word(self.packed.order[i])
+
+    def __iter__(self) -> Iterator[str]:
+        order = self.packed._np_order
+        for start in range(0, len(order), ITER_CHUNK):
+            yield from self.packed.gather(order[start:start + ITER_CHUNK])
+
+    def __contains__(self, word: object) -> bool:
+        return word in self.packed
+
+
+def find(words: Sequence[str], word: str) -> int:
+    """Position of word in a sorted run of words, or -1; packed runs answer through their hash table."""
+    if isinstance(words, PackedWords):
+        return words.find(word)
+    i = bisect_left(words, word)
+    return i if i < len(words) and words[i] == word else -1
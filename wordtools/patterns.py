@@ -0,0 +1,184 @@
+import functools
+import re
+import string
+from typing import Callable, FrozenSet, List, Optional, Tuple
+
+VOWELS = set("aeiou")
+CONSONANTS = set(string.ascii_lowercase) - VOWELS
+
+_ASCII = [chr(i) for i in range(128)]
+
+
+def pattern_to_regex(pattern: str) -> str:
+    """Translate a word pattern (@ vowel, # consonant, . any letter, * any run) to an anchored regex."""
+    pattern = pattern.replace("#", f"[{''.join(sorted(CONSONANTS))}]")
+    pattern = pattern.replace("@", f"[{''.join(sorted(VOWELS))}]")
+
+    regex = ""
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == '.':
+            regex += '.'
+        elif char == '*':
+            regex += '.*'
+        elif char == '[':
+            j = pattern.find(']', i)
+            if j != -1:
+                regex += pattern[i:j+1]
+                i = j
+            else:
+                regex += re.escape(char)
+        elif char == '\\':
+            if i + 1 < len(pattern):
+                regex += re.escape(pattern[i+1])
+                i += 1
+            else:
+                regex += re.escape(char)
+        else:
+            regex += re.escape(char)
+        i += 1
+
+    return f"^{regex}$"
+
+
+def tokenize(pattern: str) -> Optional[List[str]]:
+    """Split a pattern into one token per letter position plus '*' tokens.
+
+    Returns None for patterns that only the regex translation handles
+    (escapes, unterminated or nested classes).
+    """
+    tokens = []
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == '\\':
+            return None
+        if char == '[':
+            j = pattern.find(']', i)
+            if j == -1 or any(c in "[@#" for c in pattern[i + 1:j]):
+                return None
+            tokens.append(pattern[i:j + 1])
+            i = j + 1
+            continue
+        tokens.append(char)
+        i += 1
+    return tokens
+
+
+def is_literal(token: str) -> bool:
+    """Whether a token stands for one fixed character."""
+    return len(token) == 1 and token not in ".*@#"
+
+
+def literal_fragments(tokens: List[str]) -> List[str]:
+    """Runs of consecutive literal tokens, joined; any other token ends a run."""
+    fragments = []
+    run = []
+    for token in tokens + ['*']:
+        if is_literal(token):
+            run.append(token)
+        elif run:
+            fragments.append("".join(run))
+            run = []
+    return fragments
+
+
+def _allowed_chars(token: str) -> Optional[FrozenSet[str]]:
+    """Letters a single-position token accepts, or None if it accepts anything."""
+    if token == '.':
+        return None
+    if token == '@':
+        return frozenset(VOWELS)
+    if token == '#':
+        return frozenset(CONSONANTS)
+    if token.startswith('['):
+        char_class = re.compile(token)
+        return frozenset(c for c in _ASCII if char_class.fullmatch(c))
+    return frozenset(token)
+
+
+class CompiledPattern:
+    """A word pattern compiled once into the cheapest predicate for its shape.
+
+    Shapes, fastest first: '*', a pure literal, a fixed-length run of
+    letters/classes, a run anchored at the start and/or end around a single
+    '*' block, and finally a precompiled regex for everything else.
+    """
+
+    def __init__(self, pattern: str):
+        self.pattern = pattern
+        self.regex = re.compile(pattern_to_regex(pattern))
+        self.shape, self.match = self._build()
+
+    def _build(self) -> Tuple[str, Callable[[str], bool]]:
+        pattern = self.pattern
+        if pattern == '*':
+            return "any", lambda word: True
+        if not pattern:
+            return "empty", lambda word: not word
+
+        tokens = tokenize(pattern)
+        if tokens is None or any(t.startswith('[^') or not t.isascii() for t in tokens):
+            return "regex", self._regex_match
+
+        if '*' not in tokens:
+            if all(len(t) == 1 and t not in ".@#" for t in tokens):
+                return "literal", pattern.__eq__
+            return "fixed", self._fixed(tokens)
+
+        first = tokens.index('*')
+        last = len(tokens) - 1 - tokens[::-1].index('*')
+        if any(t != '*' for t in tokens[first:last]):
+            return "regex", self._regex_match
+        return "anchored", self._anchored(tokens[:first], tokens[last + 1:])
+
+    def _regex_match(self, word: str) -> bool:
+        return self.regex.match(word) is not None
+
+    @staticmethod
+    def _checks(tokens: List[str], offset: int) -> List[Tuple[int, FrozenSet[str]]]:
+        checks = []
+        for i, token in enumerate(tokens):
+            allowed = _allowed_chars(token)
+            if allowed is not None:
+                checks.append((offset + i, allowed))
+        return checks
+
+    def _fixed(self, tokens: List[str]) -> Callable[[str], bool]:
+        length = len(tokens)
+        checks = self._checks(tokens, 0)
+
+        def match(word: str) -> bool:
+            if len(word) != length:
+                return False
+            for i, allowed in checks:
+                if word[i] not in allowed:
+                    return False
+            return True
+
+        return match
+
+    def _anchored(self, head: List[str], tail: List[str]) -> Callable[[str], bool]:
+        min_length = len(head) + len(tail)
+        if all(len(t) == 1 and t not in ".@#" for t in head + tail):
+            prefix, suffix = "".join(head), "".join(tail)
+            return lambda word: len(word) >= min_length and word.startswith(prefix) and word.endswith(suffix)
+
+        checks = self._checks(head, 0) + self._checks(tail, -len(tail))
+
+        def match(word: str) -> bool:
+            if len(word) < min_length:
+                return False
+            for i, allowed in checks:
+                if word[i] not in allowed:
+                    return False
+            return True
+
+        return match
+
+
+@functools.lru_cache(maxsize=1024)
+def compile_pattern(pattern: str) -> CompiledPattern:
+    """Compile a pattern once per process; raises re.error for patterns with invalid classes."""
+    return CompiledPattern(pattern)
@@ -0,0 +1,98 @@
+import os
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Costs are estimated in word tests: one predicate call, set probe or split
+# check against one word. A worker gets through roughly half a million to a
+# few million a second, depending on the engine.
+DEFAULT_MAX_QUERY_COST = int(os.environ.get("WORDTOOLS_MAX_QUERY_COST", "100000000"))
+# Plans costing more than this share of the limit still run, with a warning.
+WARN_COST_FRACTION = 0.1
+
+
+class QueryTooExpensive(ValueError):
+    """A query's estimated cost is above the configured limit."""
+
+
+@dataclass
+class PlanStep:
+    operation: str
+    detail: str
+    rows: Optional[int] = None  # rows the step produces; None when not estimated
+    cost: int = 0
+    exact: bool = False  # rows is a count rather than an upper bound or estimate
+
+
+@dataclass
+class QueryPlan:
+    """How an engine would run a query, with row and cost estimates taken from index statistics."""
+    engine: str
+    query: str
+    strategy: str = ""
+    steps: List[PlanStep] = field(default_factory=list)
+    estimated_results: Optional[int] = None
+    messages: List[Tuple[str, str]] = field(default_factory=list)
+
+    @property
+    def cost(self) -> int:
+        return sum(step.cost for step in self.steps)
+
+    def add(self, operation: str, detail: str, rows: Optional[int] = None, cost: int = 0, exact: bool = False) -> PlanStep:
+        step = PlanStep(operation, detail, rows, cost, exact)
+        self.steps.append(step)
+        return step
+
+    def as_dict(self) -> Dict[str, object]:
+        return {**asdict(self), "cost": self.cost}
+
+
+def count_splits(choices: Sequence[Sequence[int]], length: int) -> int:
+    """Number of ways to cut a word of this length into consecutive parts, part i taking one of choices[i] letters."""
+    ways = {0: 1}
+    for allowed in choices:
+        extended: Dict[int, int] = {}
+        for used, count in ways.items():
+            for size in allowed:
+                if used + size <= length:
+                    extended[used + size] = extended.get(used + size, 0) + count
+        ways = extended
+    return ways.get(length, 0)
+
+
+def check_cost(plan: QueryPlan, max_cost: Optional[int]) -> Optional[str]:
+    """Raise QueryTooExpensive when the plan costs more than max_cost; return a warning when it comes close."""
+    if not max_cost:
+        return None
+    if plan.cost > max_cost:
+        raise QueryTooExpensive(
+            f"Query refused: its estimated cost of {plan.cost:,} word tests is above the limit of {max_cost:,}. "
+            "Narrow the variable lengths or patterns, or raise the limit."
+        )
+    if plan.cost > max_cost * WARN_COST_FRACTION:
+        return f"This query is expensive: an estimated {plan.cost:,} word tests (the limit is {max_cost:,})."
+    return None
+
+
+def _number(value: Optional[int], exact: bool = True) -> str:
+    if value is None:
+        return "?"
+    return f"{value:,}" if exact else f"~{value:,}"
+
+
+def format_plan(plan: QueryPlan) -> str:
+    """EXPLAIN text for a plan: strategy, estimated totals and one line per step."""
+    lines = [
+        f"EXPLAIN ({plan.engine}) {plan.query}",
+        f"strategy:          {plan.strategy}",
+        f"estimated cost:    {plan.cost:,} word tests",
+        f"estimated results: {'unknown' if plan.estimated_results is None else f'{plan.estimated_results:,}'}",
+    ]
+    if plan.steps:
+        width = max(len(step.operation) for step in plan.steps)
+        lines.append("")
+        lines.append(f"  {'step':{width}}  {'rows':>12}  {'cost':>14}  detail")
+        for step in plan.steps:
+            lines.append(f"  {step.operation:{width}}  {_number(step.rows, step.exact):>12}  {step.cost:>14,}  {step.detail}")
+    for level, message in plan.messages:
+        lines.append(f"{level}: {message}")
+    return "\n".join(lines)
@@ -0,0 +1,73 @@
+import time
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+from typing import Dict, Iterable, Iterator, List, Optional
+
+
+class QueryProfile:
+    """Exclusive wall time per named stage, plus named counters, for one query.
+
+    Stages nest: time spent in an inner stage is not counted again in the
+    stage around it. A stage must not stay open across a generator yield;
+    use timed() to charge the work of producing each item instead.
+    """
+
+    def __init__(self):
+        self.stages: Dict[str, List[float]] = {}
+        self.counters: Dict[str, int] = defaultdict(int)
+        self._children: List[float] = []
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        self._children.append(0.0)
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            children = self._children.pop()
+            if self._children:
+                self._children[-1] += elapsed
+            entry = self.stages.setdefault(name, [0.0, 0])
+            entry[0] += elapsed - children
+            entry[1] += 1
+
+    def count(self, name: str, amount: int = 1) -> None:
+        self.counters[name] += amount
+
+    def timed(self, name: str, items: Iterable) -> Iterator:
+        """Re-yield items, charging the time taken to produce each one to stage name."""
+        iterator = iter(items)
+        while True:
+            with self.stage(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def as_dict(self) -> Dict[str, object]:
+        return {
+            "stages": [{"stage": name, "seconds": seconds, "calls": calls} for name, (seconds, calls) in self.stages.items()],
+            "counters": dict(self.counters),
+        }
+
+
+def stage(profile: Optional[QueryProfile], name: str):
+    """profile.stage(name), or a no-op when profiling is off."""
+    return profile.stage(name) if profile is not None else nullcontext()
+
+
+def profile_rows(profile: Dict[str, object], extra_stages: Dict[str, float] = None, total_seconds: Optional[float] = None) -> List[Dict[str, object]]:
+    """Table rows for a profile dict plus stages timed elsewhere; with total_seconds, adds shares and an "other" row for unattributed time."""
+    rows = [dict(row) for row in profile["stages"]]
+    for name, seconds in (extra_stages or {}).items():
+        rows.append({"stage": name, "seconds": seconds, "calls": None})
+    if total_seconds:
+        accounted = sum(row["seconds"] for row in rows)
+        rows.append({"stage": "other", "seconds": max(0.0, total_seconds - accounted), "calls": None})
+        for row in rows:
+            row["share"] = f"{row['seconds'] / total_seconds:.0%}"
+    for row in rows:
+        row["seconds"] = round(row["seconds"], 4)
+    return rows
@@ -0,0 +1,518 @@
+import heapq
+import re
+import time
+from collections import namedtuple
+
+from wordtools import wordmatrix
+from wordtools.cancellation import CancellationToken, QueryStopped
+from wordtools.planner import QueryPlan, check_cost, count_splits
+from wordtools.profiling import QueryProfile, stage
+
+# Candidate words joined between cancellation checks.
+CHECK_INTERVAL = 1000
+
+
+def _candidate_words(word_set, matrix, lengths, prefix):
+    """The words of the given lengths starting with prefix, in word_set's alphabetical order, and how many there are.
+
+    With a WordMatrix, only those lengths' buckets are walked, merged back
+    into alphabetical order. Without one, or when they hold most of the words
+    anyway and merging would cost more than it skips, every word is walked,
+    for the caller to filter.
+    """
+    if matrix is None:
+        return word_set, len(word_set)
+    runs = [matrix.prefixed(length, prefix) for length in sorted(set(lengths))]
+    count = sum(map(len, runs))
+    if count > len(word_set) // 2:
+        return word_set, len(word_set)
+    return heapq.merge(*runs), count
+
+
+def _class_table(bracket):
+    negated = bracket[1] == '!'
+    return wordmatrix.char_table(bracket[2:-1] if negated else bracket[1:-1], negated)
+
+
+def compile_wildcard(wild, length):
+    """Per-position word matrix constraints accepting the same segments of this length as iter_matches' wildcard test.
+
+    Returns None when the wildcard has to be tested word by word instead.
+    """
+    if length < 1 or not wordmatrix.encodable(wild):
+        return None
+    never = [wordmatrix.char_table("")] + [None] * (length - 1)
+    if wild == "*":
+        return [None] * length
+
+    if wild.startswith("[") and wild.endswith("*") and wild.count("[") == 1:
+        part = re.match(r'(\[!?[a-z]+\])\*', wild)
+        if part:
+            return [_class_table(part.group(1))] + [None] * (length - 1)
+
+    if len(wild) == length:
+        kinds = {"@": wordmatrix.VOWEL, "#": wordmatrix.CONSONANT, "*": None}
+        return [kinds[w] if w in kinds else ord(w) for w in wild]
+
+    if wild.startswith("[") and wild.endswith("]") and wild.count("[") == 1:
+        return [_class_table(wild)] * length
+
+    if wild.count("[") > 1:
+        parts = re.findall(r'\[!?[a-z]+\]', wild)
+        if len(parts) != length:
+            return never
+        return [_class_table(part) for part in parts]
+
+    return never
+
+
+ParsedQuery = namedtuple("ParsedQuery", [
+    "var_ranges", "wildcard_type", "prefix_map", "extra_chars_per_var",
+    "combo_prefix", "combo_final_order", "combo_extra_chars",
+])
+
+DEFINITION_RANGE = re.compile(r'^([A-Z])=\((\d+)-(\d+):(.+)\)$')
+DEFINITION_FIXED = re.compile(r'^([A-Z])=\((\d+):(.+)\)$')
+STEP = re.compile(r'^[a-z.]*[A-Z]+[.]*$')
+
+
+def canonical_query(query):
+    """Query text with whitespace and ignored parts dropped and definitions sorted by variable."""
+    definitions = []
+    steps = []
+    for part in query.strip().split(';'):
+        part = part.strip()
+        if DEFINITION_RANGE.match(part) or DEFINITION_FIXED.match(part):
+            definitions.append(part)
+        elif STEP.match(part):
+            steps.append(part)
+    definitions.sort(key=lambda part: part[0])
+    return ";".join(definitions + steps)
+
+
+def declared_variables(query):
+    """Variables in the order their definitions first appear, which is the order matches are shown in."""
+    variables = []
+    for part in query.strip().split(';'):
+        match = DEFINITION_RANGE.match(part.strip()) or DEFINITION_FIXED.match(part.strip())
+        if match and match.group(1) not in variables:
+            variables.append(match.group(1))
+    return variables
+
+
+def parse_query(query):
+    """Split a query into its variable definitions, prefix steps and final combination; raises ValueError for an unusable query."""
+    var_ranges = {}
+    prefix_map = {}
+    extra_chars_per_var = {}
+    wildcard_type = {}
+    steps = []
+
+    raw_parts = query.strip().split(';')
+    for part in raw_parts:
+        match_def_range = DEFINITION_RANGE.match(part.strip())
+        match_def_fixed = DEFINITION_FIXED.match(part.strip())
+        match_step = STEP.match(part.strip())
+
+        if match_def_range:
+            var, min_len, max_len, pattern = match_def_range.groups()
+            var_ranges[var] = list(range(int(min_len), int(max_len)+1))
+            wildcard_type[var] = pattern.strip() if pattern.strip() else '*'
+        elif match_def_fixed:
+            var, length, pattern = match_def_fixed.groups()
+            var_ranges[var] = [int(length)]
+            wildcard_type[var] = pattern.strip() if pattern.strip() else '*'
+        elif match_step:
+            steps.append(part.strip())
+
+    if not steps:
+        raise ValueError("No valid steps found.")
+
+    combo_step = steps[-1]
+    combo_match = re.match(r'^([a-z.]*)?([A-Z]+)(\.*)$', combo_step)
+    if not combo_match:
+        raise ValueError("Invalid final combination step.")
+
+    combo_prefix = combo_match.group(1) or ""
+    combo_final_order = list(combo_match.group(2))
+    combo_extra_chars = len(combo_match.group(3))
+    undeclared = sorted(set(combo_final_order) - set(var_ranges))
+    if undeclared:
+        raise ValueError(f"Undeclared variable(s) in the final step: {', '.join(undeclared)}")
+
+    for step in steps[:-1]:
+        match = re.match(r'^([a-z]*)([A-Z])([.]*)$', step)
+        if match:
+            pre, var, dots = match.groups()
+            prefix_map[var] = pre
+            extra_chars_per_var[var] = len(dots or "")
+
+    return ParsedQuery(var_ranges, wildcard_type, prefix_map, extra_chars_per_var, combo_prefix, combo_final_order, combo_extra_chars)
+
+
+def iter_matches(query, word_set, profile=None, matrix=None, token=None):
+    """Yield (word, {variable: full word}) for every match; raises ValueError for an unusable query.
+
+    With a WordMatrix over the same words, variable segments are found by
+    vectorized comparisons on its length buckets instead of word by word,
+    and only the buckets of lengths that can match are walked at all.
+    With a CancellationToken, raises QueryStopped once it fires, reporting
+    the share of candidate words joined so far as its progress.
+    """
+    def checkpoint(done, total):
+        if token is not None and done % CHECK_INTERVAL == 0:
+            token.report(done, total)
+            token.check()
+
+    def matches_wildcard(seg, wild):
+        vowels = set("aeiou")
+        if wild == "*":
+            return True
+
+        # [abc]* style: first char must match class
+        if wild.startswith("[") and wild.endswith("*") and wild.count("[") == 1:
+            part = re.match(r'(\[!?[a-z]+\])\*', wild)
+            if part and len(seg) >= 1:
+                bracket = part.group(1)
+                negated = bracket[1] == '!'
+                chars = set(bracket[2:-1]) if negated else set(bracket[1:-1])
+                return (seg[0] not in chars if negated else seg[0] in chars)
+
+        # Direct character-for-character match
+        if len(wild) == len(seg):
+            for c, w in zip(seg, wild):
+                if w == "@" and c not in vowels:
+                    return False
+                elif w == "#" and c in vowels:
+                    return False
+                elif w not in "@#*" and w != c:
+                    return False
+            return True
+
+        # Full segment set [abc] or [!abc]
+        if wild.startswith("[") and wild.endswith("]") and wild.count("[") == 1:
+            negated = wild[1] == '!'
+            char_set = set(wild[2:-1]) if negated else set(wild[1:-1])
+            return all((c not in char_set) if negated else (c in char_set) for c in seg)
+
+        # Compound brackets like [!bern][bern]
+        if wild.count("[") > 1:
+            parts = re.findall(r'\[!?[a-z]+\]', wild)
+            if len(parts) != len(seg):
+                return False
+            for c, part in zip(seg, parts):
+                negated = part[1] == '!'
+                char_set = set(part[2:-1]) if negated else set(part[1:-1])
+                if (negated and c in char_set) or (not negated and c not in char_set):
+                    return False
+            return True
+
+        return False
+
+    var_ranges, wildcard_type, prefix_map, extra_chars_per_var, combo_prefix, combo_final_order, combo_extra_chars = parse_query(query)
+    declared_vars = list(var_ranges.keys())
+
+    var_tail_map = {}
+    evaluated = 0
+    walked = 0
+    with stage(profile, "variable_maps"):
+        for var in declared_vars:
+            checkpoint(0, len(word_set))
+            lengths = var_ranges[var]
+            prefix = prefix_map.get(var, "")
+            extra = extra_chars_per_var.get(var, 0)
+            wild = wildcard_type.get(var, '*')
+            match_dict = {}
+            constraints = [compile_wildcard(wild, length) for length in lengths] if matrix is not None else [None]
+            if None not in constraints:
+                # Segments of different lengths never collide, so filling the map one
+                # length at a time keeps the word-order "last word wins" of the scan below.
+                for length, constraint in zip(lengths, constraints):
+                    words, scanned = matrix.select(len(prefix) + length + extra, prefix, constraint)
+                    evaluated += scanned
+                    walked += scanned
+                    for word in words:
+                        match_dict[word[len(prefix):len(prefix) + length]] = word
+                var_tail_map[var] = match_dict
+                continue
+            words, count = _candidate_words(word_set, matrix, [len(prefix) + length + extra for length in lengths], prefix)
+            walked += count
+            for i, word in enumerate(words):
+                if token is not None and i % CHECK_INTERVAL == 0:
+                    token.check()
+                if not word.startswith(prefix):
+                    continue
+                tail = word[len(prefix):]
+                for length in lengths:
+                    if len(tail) == length + extra:
+                        seg = tail[:length]
+                        evaluated += 1
+                        if matches_wildcard(seg, wild):
+                            match_dict[seg] = word
+            var_tail_map[var] = match_dict
+    if profile is not None:
+        profile.count("words_scanned", walked)
+        profile.count("predicate_evaluations", evaluated)
+        profile.count("variable_segments", sum(len(segments) for segments in var_tail_map.values()))
+
+    if combo_extra_chars > 0:
+        total_core_len = sum(min(var_ranges[v]) for v in combo_final_order)
+        full_len = len(combo_prefix) + total_core_len + combo_extra_chars
+
+        words, count = _candidate_words(word_set, matrix, [full_len], combo_prefix)
+        for i, word in enumerate(words):
+            checkpoint(i, count)
+            if len(word) != full_len or not word.startswith(combo_prefix):
+                continue
+            if profile is not None:
+                profile.count("candidates")
+
+            core = word[len(combo_prefix):-combo_extra_chars]
+            pos = 0
+            tail_lookup = {}
+            valid = True
+
+            for var in combo_final_order:
+                base = min(var_ranges[var])
+                seg = core[pos:pos+base]
+                pos += base
+                if var not in var_tail_map or seg not in var_tail_map[var]:
+                    valid = False
+                    break
+                tail_lookup[var] = seg
+
+            if not valid:
+                continue
+
+            final_words = []
+            for var in declared_vars:
+                seg = tail_lookup.get(var)
+                if not seg or seg not in var_tail_map[var]:
+                    valid = False
+                    break
+                full_candidate = prefix_map.get(var, "") + seg
+                full_word = var_tail_map[var][seg]
+                if not full_word.startswith(full_candidate):
+                    valid = False
+                    break
+                final_words.append(full_word)
+
+            if valid:
+                yield word, dict(zip(declared_vars, final_words))
+
+    else:
+        # Hash join: walk the candidate words once and split each at the allowed
+        # segment boundaries, probing the per-variable maps, instead of
+        # enumerating the product of every variable's segments.
+        seg_lengths = [sorted({len(seg) for seg in var_tail_map[v]}) for v in combo_final_order]
+        min_rest = [0] * (len(combo_final_order) + 1)
+        max_rest = [0] * (len(combo_final_order) + 1)
+        for k in range(len(combo_final_order) - 1, -1, -1):
+            lengths = seg_lengths[k] or [0]
+            min_rest[k] = min_rest[k + 1] + lengths[0]
+            max_rest[k] = max_rest[k + 1] + lengths[-1]
+
+        def split_core(core, k, pos, assigned):
+            if k == len(combo_final_order):
+                yield dict(assigned)
+                return
+            var = combo_final_order[k]
+            for length in seg_lengths[k]:
+                remaining = len(core) - pos - length
+                if remaining < min_rest[k + 1] or remaining > max_rest[k + 1]:
+                    continue
+                seg = core[pos:pos+length]
+                if seg not in var_tail_map[var] or assigned.get(var, seg) != seg:
+                    continue
+                fresh = var not in assigned
+                assigned[var] = seg
+                yield from split_core(core, k + 1, pos + length, assigned)
+                if fresh:
+                    del assigned[var]
+
+        if all(seg_lengths):
+            core_lengths = range(min_rest[0], max_rest[0] + 1)
+            words, count = _candidate_words(word_set, matrix, [len(combo_prefix) + core for core in core_lengths], combo_prefix)
+            for i, word in enumerate(words):
+                checkpoint(i, count)
+                core_len = len(word) - len(combo_prefix)
+                if core_len < min_rest[0] or core_len > max_rest[0] or not word.startswith(combo_prefix):
+                    continue
+                if profile is not None:
+                    profile.count("candidates")
+
+                for tail_lookup in split_core(word[len(combo_prefix):], 0, 0, {}):
+                    final_words = []
+                    valid = True
+                    for var in declared_vars:
+                        seg = tail_lookup.get(var)
+                        if not seg or seg not in var_tail_map[var]:
+                            valid = False
+                            break
+                        full_candidate = prefix_map.get(var, "") + seg
+                        full_word = var_tail_map[var][seg]
+                        if not full_word.startswith(full_candidate):
+                            valid = False
+                            break
+                        final_words.append(full_word)
+                    if valid:
+                        yield word, dict(zip(declared_vars, final_words))
+
+
+def collect_matches(matches, limit=None):
+    """Take matches up to limit; returns (matches, exhausted).
+
+    If the matches stop with QueryStopped, returns those taken so far as not exhausted.
+    """
+    collected = []
+    try:
+        for match in matches:
+            collected.append(match)
+            if limit and len(collected) >= limit:
+                return collected, False
+    except QueryStopped:
+        return collected, False
+    return collected, True
+
+
+def describe_partial(partial):
+    """Marker line for results cut short by a cancellation token, from its as_dict()."""
+    cause = "query timed out" if partial["reason"] == "timeout" else "query was cancelled"
+    if partial.get("progress") is not None:
+        return f"[PARTIAL RESULTS: {cause} after scanning ~{partial['progress']:.0%} of candidate words]"
+    return f"[PARTIAL RESULTS: {cause} before scanning candidate words]"
+
+
+def format_match(variables, match):
+    word, full_words = match
+    return " | ".join(full_words[var] for var in variables) + f" || {word}"
+
+
+def matches_footer(count, limit=10, partial=None):
+    """Lines that follow count formatted matches: the partial, no-match or limit marker."""
+    if partial:
+        return ["", describe_partial(partial)]
+    if not count:
+        return ["[NO MATCHES]"]
+    if limit and count >= limit:
+        return ["", f"[RESULT LIMIT OF {limit} REACHED]"]
+    return []
+
+
+def explain_query(index, query):
+    """Executor task: the plan iter_matches would follow for a query, with segment counts taken from the word matrix.
+
+    Raises ValueError for an unusable query, as iter_matches does.
+    """
+    parsed = parse_query(query)
+    plan = QueryPlan(engine="qat", query=query)
+    seg_lengths = {}
+    for var, lengths in parsed.var_ranges.items():
+        prefix = parsed.prefix_map.get(var, "")
+        extra = parsed.extra_chars_per_var.get(var, 0)
+        wild = parsed.wildcard_type.get(var, '*')
+        span = str(lengths[0]) if len(lengths) == 1 else f"{lengths[0]}-{lengths[-1]}"
+        detail = f"{span}-letter segments matching '{wild}'"
+        if prefix:
+            detail += f" after '{prefix}'"
+        if extra:
+            detail += f", {extra} letter(s) before the end"
+        constraints = [compile_wildcard(wild, length) for length in lengths]
+        if None not in constraints:
+            segments = set()
+            scanned = 0
+            for length, constraint in zip(lengths, constraints):
+                words, rows = index.matrix.select(len(prefix) + length + extra, prefix, constraint)
+                scanned += rows
+                segments.update(word[len(prefix):len(prefix) + length] for word in words)
+            seg_lengths[var] = sorted({len(seg) for seg in segments})
+            plan.add(f"domain {var}", detail + " (vectorized)", len(segments), scanned, exact=True)
+        else:
+            seg_lengths[var] = lengths
+            scanned = sum(index.matrix.count_prefixed(len(prefix) + length + extra, prefix) for length in set(lengths))
+            plan.add(f"domain {var}", detail + " (word by word)", None, scanned * max(1, len(lengths)))
+
+    order = parsed.combo_final_order
+    prefix = parsed.combo_prefix
+    missing = [var for var in order if not seg_lengths.get(var)]
+    if missing:
+        plan.strategy = "match each variable's segments; the final step cannot match"
+        plan.add("join", f"no segments for {', '.join(dict.fromkeys(missing))}", 0, 0, exact=True)
+        plan.estimated_results = 0
+        return plan
+
+    if parsed.combo_extra_chars:
+        full_len = len(prefix) + sum(min(parsed.var_ranges[var]) for var in order) + parsed.combo_extra_chars
+        candidates = index.matrix.count_prefixed(full_len, prefix)
+        plan.strategy = "match each variable's segments, then look up fixed slices of every candidate word"
+        scope = f" starting '{prefix}'" if prefix else ""
+        plan.add("scan", f"{full_len}-letter words{scope} among {len(index.wordlist):,}", candidates, candidates, exact=True)
+        plan.add("probe", f"{len(order)} slice lookup(s) per candidate", None, candidates * len(order))
+        return plan
+
+    choices = [seg_lengths[var] for var in order]
+    candidates = checks = widest = 0
+    for core in range(sum(min(c) for c in choices), sum(max(c) for c in choices) + 1):
+        words = index.matrix.count_prefixed(len(prefix) + core, prefix)
+        if not words:
+            continue
+        splits = count_splits(choices, core)
+        candidates += words
+        checks += words * max(1, splits)
+        widest = max(widest, splits)
+    plan.strategy = "match each variable's segments, then split candidate words at every allowed boundary (hash join)"
+    scope = f"starting '{prefix}' " if prefix else ""
+    plan.add("scan", f"words {scope}of a joinable length among {len(index.wordlist):,}", candidates, candidates, exact=True)
+    plan.add("split", f"{candidates:,} candidate words, up to {widest} split(s) each", None, checks)
+    return plan
+
+
+def fetch_matches(index, query, limit=None, profile=False, max_cost=None, timeout=None, best_first=False, deadline=None):
+    """Executor task: matches up to limit, whether the query is exhausted, a stage profile if asked, and partial.
+
+    Walks the sorted wordlist rather than the word set so that match positions
+    are the same in every process, whatever its hash seed. With max_cost, a
+    query whose plan costs more is refused with QueryTooExpensive. With
+    timeout, a query still running after that many seconds stops and returns
+    what it has found, with partial set to the token's as_dict(); otherwise
+    partial is None. With best_first, matches come highest word score first,
+    kept to the best limit in a bounded heap; partial best-first matches are
+    the best found so far, not a leading run of the full order. deadline is
+    a time.time() value shared by a batch: a query that starts late only
+    gets what is left of it, and stops at it just as at its timeout.
+    """
+    query_profile = QueryProfile() if profile else None
+    if deadline is not None:
+        # A token without a timeout never fires, so a deadline already past leaves a moment rather than none.
+        left = max(deadline - time.time(), 0.001)
+        timeout = min(timeout, left) if timeout else left
+    token = CancellationToken(timeout)
+    if max_cost:
+        with stage(query_profile, "estimate"):
+            check_cost(explain_query(index, query), max_cost)
+    matches = iter_matches(query, index.wordlist, query_profile, index.matrix, token)
+    if query_profile is not None:
+        matches = query_profile.timed("match", matches)
+    if best_first:
+        matches = index.scores.top(matches, limit)
+    collected, exhausted = collect_matches(matches, limit)
+    partial = token.as_dict() if token.reason else None
+    return collected, exhausted, query_profile.as_dict() if query_profile is not None else None, partial
+
+
+def stream_matches(index, query, limit=None, max_cost=None, timeout=None, best_first=False):
+    """Executor task: yield matches over the sorted wordlist as they are found, stopping after limit.
+
+    With timeout, raises QueryStopped after that many seconds; the matches
+    already yielded stand. With best_first, the best limit matches by score
+    are yielded, best first, once the search is over.
+    """
+    if max_cost:
+        check_cost(explain_query(index, query), max_cost)
+    matches = iter_matches(query, index.wordlist, matrix=index.matrix, token=CancellationToken(timeout))
+    if best_first:
+        matches = index.scores.top(matches, limit)
+    for position, match in enumerate(matches):
+        if limit and position >= limit:
+            return
+        yield match
@@ -0,0 +1,134 @@
+import os
+import sys
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterator, List, Optional, Tuple
+
+MAX_RESULT_CACHE_BYTES = int(os.environ.get("WORDTOOLS_RESULT_CACHE_MB", "64")) * 1024 * 1024
+
+
+def estimate_size(obj: Any) -> int:
+    """Approximate memory held by a result value made of tuples, lists, dicts and strings."""
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (list, tuple)):
+        size += sum(estimate_size(item) for item in obj)
+    elif isinstance(obj, dict):
+        size += sum(estimate_size(key) + estimate_size(value) for key, value in obj.items())
+    return size
+
+
+@dataclass
+class CachedResult:
+    """The leading results of one query, and whether they are all of them."""
+    items: List[Any]
+    complete: bool
+    result_type: Optional[str] = None
+    total: Optional[int] = None
+    estimated_total: Optional[int] = None
+    messages: List[Tuple[str, str]] = field(default_factory=list)
+    size: int = 0
+
+    def covers(self, limit: Optional[int]) -> bool:
+        return self.complete or (limit is not None and len(self.items) >= limit)
+
+    def head(self, limit: Optional[int]) -> Tuple[List[Any], bool]:
+        """Results up to limit, and whether more exist past them."""
+        if limit is None or len(self.items) <= limit:
+            return list(self.items), not self.complete
+        return self.items[:limit], True
+
+
+class ResultCache:
+    """LRU of query results bounded by their estimated size in bytes."""
+
+    def __init__(self, max_bytes: int = MAX_RESULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple[str, ...], CachedResult]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple[str, ...]) -> Optional[CachedResult]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: Tuple[str, ...], entry: CachedResult) -> None:
+        entry.size = estimate_size(entry.items) + estimate_size(entry.messages)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= old.size
+            if entry.size > self.max_bytes:
+                return
+            self._entries[key] = entry
+            self.size += entry.size
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= evicted.size
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def result_key(kind: str, digest: str, canonical: str, best_first: bool = False, count_total: bool = False) -> Tuple[str, str, str, str, str]:
+    # Counted runs are kept apart, so that a cached run without a total never answers a request for one.
+    return kind, digest, canonical, "score" if best_first else "list", "counted" if count_total else "uncounted"
+
+
+def cached_stream(key: Tuple[str, ...], limit: Optional[int], start: Callable[[], Iterator[Tuple[str, Any]]]) -> Iterator[Tuple[str, Any]]:
+    """Serve matcher stream events from the cache, or run the query afresh when the cache does not cover limit.
+
+    start() must return the query's event stream. Completed runs are stored
+    under key, and so are the results of runs that stopped early, as an
+    incomplete entry that answers smaller limits, unless their summary says
+    they are not cacheable. A run never continues from a cached entry: the
+    engines keep no state between runs, so a larger limit runs the query again.
+    """
+    cache = get_result_cache()
+    entry = cache.get(key)
+    if entry is not None and entry.covers(limit):
+        items, has_more = entry.head(limit)
+        yield "type", entry.result_type
+        yield "results", items
+        yield "done", {"status": "complete", "has_more": has_more, "total": entry.total, "estimated_total": entry.estimated_total,
+                       "messages": list(entry.messages), "partial": False, "cached": True}
+        return
+
+    items = []
+    result_type = None
+    for kind, payload in start():
+        if kind == "type":
+            result_type = payload
+        elif kind == "results":
+            items.extend(payload)
+        elif kind == "done" and payload["status"] in ("complete", "timeout", "cancelled") and payload.get("cacheable", True):
+            cache.put(key, CachedResult(
+                items=items,
+                complete=payload["status"] == "complete" and not payload["has_more"],
+                result_type=result_type,
+                total=payload["total"],
+                estimated_total=payload.get("estimated_total"),
+                messages=list(payload["messages"])
+            ))
+        yield kind, payload
+
+
+_cache: Optional[ResultCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_result_cache() -> ResultCache:
+    """Process-wide result cache shared by every session and page."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResultCache()
+        return _cache
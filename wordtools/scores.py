@@ -0,0 +1,93 @@
+import heapq
+import threading
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+
+from wordtools.cancellation import QueryStopped
+from wordtools.packed import find
+
+# Score given to words listed without one; Broda's lists score ordinary entries 50.
+DEFAULT_SCORE = 50
+
+
+class _Worst:
+    """Heap entry ordered so that the root of a heapq heap is the worst of the kept results."""
+
+    __slots__ = ("key", "item")
+
+    def __init__(self, key, item):
+        self.key = key
+        self.item = item
+
+    def __lt__(self, other: "_Worst") -> bool:
+        return self.key > other.key
+
+
+class ScoreIndex:
+    """Per-length score arrays parallel to a wordlist's length buckets, with lazily built best-first orders.
+
+    Best first means highest score first, then alphabetical.
+    """
+
+    def __init__(self, word_by_length: Dict[int, Sequence[str]], score_by_length: Optional[Dict[int, Sequence[int]]] = None):
+        self.word_by_length = word_by_length
+        self.score_by_length: Dict[int, Sequence[int]] = dict(score_by_length or {})
+        for length, words in word_by_length.items():
+            if length not in self.score_by_length:
+                self.score_by_length[length] = array("i", [DEFAULT_SCORE]) * len(words)
+        self._ranked: Dict[int, array] = {}
+        self._lock = threading.Lock()
+
+    def scores(self, length: int) -> Sequence[int]:
+        return self.score_by_length.get(length, ())
+
+    def score(self, word: str) -> int:
+        words = self.word_by_length.get(len(word))
+        if words:
+            i = find(words, word)
+            if i >= 0:
+                return self.score_by_length[len(word)][i]
+        return DEFAULT_SCORE
+
+    def ranked(self, length: int) -> array:
+        """Positions in the length bucket, best first."""
+        ranked = self._ranked.get(length)
+        if ranked is None:
+            with self._lock:
+                ranked = self._ranked.get(length)
+                if ranked is None:
+                    scores = self.scores(length)
+                    # The sort is stable, so equal scores keep the bucket's alphabetical order.
+                    ranked = array("I", sorted(range(len(scores)), key=scores.__getitem__, reverse=True))
+                    self._ranked[length] = ranked
+        return ranked
+
+    def build_all(self) -> None:
+        """Build every length's best-first order now rather than on first use."""
+        for length in self.word_by_length:
+            self.ranked(length)
+
+    def top(self, items: Iterable[Any], limit: Optional[int] = None) -> Iterator[Any]:
+        """Result items, whose first element is a word, best first; with limit, only the best limit of them.
+
+        Keeps a bounded heap rather than sorting every item; items with the
+        same word keep their arrival order. If the items stop with
+        QueryStopped, the best of those seen so far are yielded before it is
+        raised again.
+        """
+        heap: List[_Worst] = []
+        stopped = None
+        try:
+            for position, item in enumerate(items):
+                word = item[0]
+                entry = _Worst((-self.score(word), word, position), item)
+                if limit is None or len(heap) < limit:
+                    heapq.heappush(heap, entry)
+                elif entry.key < heap[0].key:
+                    heapq.heapreplace(heap, entry)
+        except QueryStopped as e:
+            stopped = e
+        for entry in sorted(heap, key=lambda entry: entry.key):
+            yield entry.item
+        if stopped is not None:
+            raise stopped
@@ -0,0 +1,159 @@
+import mmap
+import os
+import struct
+from array import array
+from typing import Dict, List, Optional, Sequence
+
+from wordtools.packed import PackedWordlist, signature, word_hash
+
+# Layout (little endian, every section 8-byte aligned so the file can be mmapped):
+#   header   MAGIC, version, bucket count, word count, hash slots, blob size, source sha256
+#   buckets  (word length, first word, word count) per length, ascending
+#   offsets  word_count + 1 uint32 byte offsets into the blob, length-major order
+#   order    word_count uint32 positions giving the alphabetical order
+#   scores   word_count int32 word scores, length-major order
+#   table    hash-slot uint32 entries, a power of two at least twice the word count: 1 + the
+#            position of a word, in the slot its word_hash picks or the next free one, else 0
+#   sigs     word_count uint32 word_hash values of the words' signatures (sorted letters), ascending
+#   sigpos   word_count uint32 positions of the words those signatures belong to, ascending within a hash
+#   blob     words in length-major, alphabetical order, each followed by "\n"
+# The sections are read in place as a PackedWordlist, so a loaded snapshot is the index's only copy of its words.
+MAGIC = b"WTIDX\x00\x00\x00"
+VERSION = 4
+HEADER = struct.Struct("<8sIIIIQ32s")
+BUCKET = struct.Struct("<III")
+
+SNAPSHOT_DIR = os.environ.get(
+    "WORDTOOLS_INDEX_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".index_cache"),
+)
+MAX_SNAPSHOTS = 8
+
+
+def _pad(size: int) -> int:
+    return (-size) % 8
+
+
+def snapshot_path(digest: str, directory: Optional[str] = None) -> str:
+    return os.path.join(directory or SNAPSHOT_DIR, f"{digest}.idx")
+
+
+def encode(digest: str, word_by_length: Dict[int, List[str]], wordlist: List[str], score_by_length: Dict[int, Sequence[int]]) -> bytes:
+    """Serialize the length buckets, alphabetical order, scores, membership table and anagram signatures of a wordlist."""
+    buckets = []
+    flat: List[str] = []
+    scores = array("i")
+    for length in sorted(word_by_length):
+        words = word_by_length[length]
+        if words:
+            buckets.append((length, len(flat), len(words)))
+            flat.extend(words)
+            scores.extend(score_by_length[length])
+
+    encoded = [word.encode("utf-8") for word in flat]
+    blob = b"".join(data + b"\n" for data in encoded)
+    offsets = array("I", [0])
+    pos = 0
+    for data in encoded:
+        pos += len(data) + 1
+        offsets.append(pos)
+
+    position = {word: i for i, word in enumerate(flat)}
+    order = array("I", (position[word] for word in wordlist))
+
+    slots = 1 << (2 * len(flat) - 1).bit_length()
+    mask = slots - 1
+    table = array("I", bytes(4 * slots))
+    for i, data in enumerate(encoded):
+        slot = word_hash(data) & mask
+        while table[slot]:
+            slot = (slot + 1) & mask
+        table[slot] = i + 1
+
+    signature_hashes = array("I", (word_hash(signature(word).encode("utf-8")) for word in flat))
+    # A stable sort, so the words sharing a hash stay in length-major, alphabetical order.
+    signature_positions = array("I", sorted(range(len(flat)), key=signature_hashes.__getitem__))
+    signature_hashes = array("I", (signature_hashes[i] for i in signature_positions))
+
+    parts = [HEADER.pack(MAGIC, VERSION, len(buckets), len(flat), slots, len(blob), bytes.fromhex(digest))]
+    parts.extend(BUCKET.pack(*bucket) for bucket in buckets)
+    size = HEADER.size + BUCKET.size * len(buckets)
+    parts.append(b"\x00" * _pad(size))
+    for section in (offsets.tobytes(), order.tobytes(), scores.tobytes(), table.tobytes(), signature_hashes.tobytes(), signature_positions.tobytes(), blob):
+        parts.append(section)
+        parts.append(b"\x00" * _pad(len(section)))
+    return b"".join(parts)
+
+
+def decode(buffer, digest: str) -> Optional[PackedWordlist]:
+    """A PackedWordlist reading the sections of a snapshot in place, or None if it is stale or damaged."""
+    if len(buffer) < HEADER.size:
+        return None
+    magic, version, bucket_count, word_count, slots, blob_size, source = HEADER.unpack_from(buffer, 0)
+    if magic != MAGIC or version != VERSION or source != bytes.fromhex(digest) or slots < 2 * word_count or slots & (slots - 1):
+        return None
+
+    pos = HEADER.size
+    buckets = [BUCKET.unpack_from(buffer, pos + i * BUCKET.size) for i in range(bucket_count)]
+    pos += BUCKET.size * bucket_count
+    sections = []
+    for size in (4 * (word_count + 1), 4 * word_count, 4 * word_count, 4 * slots, 4 * word_count, 4 * word_count, blob_size):
+        pos += _pad(pos)
+        sections.append((pos, pos + size))
+        pos += size
+    if pos > len(buffer) or struct.unpack_from("<I", buffer, sections[0][1] - 4)[0] != blob_size:
+        return None
+    if any(first + count > word_count for _, first, count in buckets):
+        return None
+
+    view = memoryview(buffer)
+    offsets, order, scores, table, signature_hashes, signature_positions, blob = (view[start:stop] for start, stop in sections)
+    return PackedWordlist(buffer, blob, offsets.cast("I"), order.cast("I"), scores.cast("i"), table.cast("I"),
+                          signature_hashes.cast("I"), signature_positions.cast("I"), buckets)
+
+
+def load(digest: str, directory: Optional[str] = None) -> Optional[PackedWordlist]:
+    """Map a snapshot into memory; the returned list reads it in place, so every process loading it shares one copy."""
+    path = snapshot_path(digest, directory)
+    try:
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    try:
+        packed = decode(mm, digest)
+    except (ValueError, struct.error):
+        packed = None
+    if packed is None:
+        mm.close()
+    return packed
+
+
+def save(digest: str, data, directory: Optional[str] = None) -> Optional[str]:
+    """Write an encoded snapshot atomically, pruning the oldest ones; returns the path or None on failure."""
+    directory = directory or SNAPSHOT_DIR
+    path = snapshot_path(digest, directory)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(directory, exist_ok=True)
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        _prune(directory)
+    except OSError:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        return None
+    return path
+
+
+def _prune(directory: str) -> None:
+    snapshots = [os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(".idx")]
+    snapshots.sort(key=os.path.getmtime, reverse=True)
+    for stale in snapshots[MAX_SNAPSHOTS:]:
+        try:
+            os.remove(stale)
+        except OSError:
+            pass
@@ -0,0 +1,160 @@
+import hashlib
+import io
+import os
+import threading
+from array import array
+from collections import OrderedDict, defaultdict
+from typing import BinaryIO, Container, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from wordtools import snapshot
+from wordtools.affixes import AffixIndex
+from wordtools.anagrams import AnagramIndex
+from wordtools.bitsets import PositionalIndex
+from wordtools.ingest import Progress, ingest, stream_digest
+from wordtools.packed import PackedWordlist
+from wordtools.scores import DEFAULT_SCORE, ScoreIndex
+from wordtools.wordmatrix import WordMatrix
+
+MAX_CACHED_INDEXES = 4
+
+
+def content_digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class WordlistIndex:
+    """Normalized words of one wordlist, stored once in packed form, plus the lookup structures built from them.
+
+    wordlist, word_by_length and words_set are views of the packed words
+    rather than copies of them.
+    """
+
+    def __init__(self, name: str, digest: str, words: PackedWordlist):
+        self.name = name
+        self.digest = digest
+        self.words = words
+        self.wordlist: Sequence[str] = words.alphabetical
+        self.word_by_length: Dict[int, Sequence[str]] = defaultdict(list, words.buckets)
+        self.words_set: Container[str] = words
+        self.scores = ScoreIndex(self.word_by_length, words.score_by_length)
+        self.positional = PositionalIndex(self.word_by_length)
+        self.anagrams = AnagramIndex(self.word_by_length, words)
+        self.affixes = AffixIndex(self.word_by_length)
+        self.matrix = WordMatrix(self.word_by_length)
+
+    @classmethod
+    def from_lists(cls, name: str, digest: str, wordlist: List[str], word_by_length: Dict[int, List[str]], score_by_length: Optional[Dict[int, Sequence[int]]] = None) -> "WordlistIndex":
+        """Pack the alphabetical list and length buckets ingest returns; words without scores get DEFAULT_SCORE."""
+        score_by_length = dict(score_by_length or {})
+        for length, words in word_by_length.items():
+            score_by_length.setdefault(length, array("i", [DEFAULT_SCORE]) * len(words))
+        return cls(name, digest, snapshot.decode(snapshot.encode(digest, word_by_length, wordlist, score_by_length), digest))
+
+    @classmethod
+    def from_words(cls, name: str, digest: str, words: Iterable[str]) -> "WordlistIndex":
+        """Index already normalized words, each with DEFAULT_SCORE."""
+        wordlist = sorted(set(words))
+        word_by_length: Dict[int, List[str]] = defaultdict(list)
+        for word in wordlist:
+            word_by_length[len(word)].append(word)
+        return cls.from_lists(name, digest, wordlist, word_by_length)
+
+    @classmethod
+    def from_snapshot(cls, name: str, digest: str) -> Optional["WordlistIndex"]:
+        """Load a previously saved snapshot of the list with this content digest, if one is valid."""
+        words = snapshot.load(digest)
+        if words is None:
+            return None
+        return cls(name, digest, words)
+
+    def build_all(self) -> None:
+        """Build every lookup structure that is otherwise built on first use, e.g. before forking processes that would each build their own."""
+        self.scores.build_all()
+        self.positional.build_all()
+        self.anagrams.build_all()
+        self.affixes.build_all()
+        self.matrix.build_all()
+
+    def save_snapshot(self) -> Optional[str]:
+        return snapshot.save(self.digest, self.words.buffer)
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+
+_indexes: "OrderedDict[str, WordlistIndex]" = OrderedDict()
+_build_locks: Dict[str, threading.Lock] = {}
+_path_digests: Dict[Tuple[str, int, int], str] = {}
+_lock = threading.Lock()
+
+
+def get_cached(digest: str) -> Optional[WordlistIndex]:
+    with _lock:
+        index = _indexes.get(digest)
+        if index is not None:
+            _indexes.move_to_end(digest)
+        return index
+
+
+def cached_digests() -> List[str]:
+    with _lock:
+        return list(_indexes)
+
+
+def remember(index: WordlistIndex) -> None:
+    with _lock:
+        _indexes[index.digest] = index
+        _indexes.move_to_end(index.digest)
+        while len(_indexes) > MAX_CACHED_INDEXES:
+            _indexes.popitem(last=False)
+
+
+def get_index(source: Union[bytes, BinaryIO], name: str, progress: Optional[Progress] = None) -> WordlistIndex:
+    """Return the process-wide index for a wordlist, parsing it only the first time its content is seen.
+
+    source is the list's raw bytes or a seekable binary stream of them, plain
+    or gzip-compressed; a stream is read in chunks rather than all at once.
+    progress is passed to ingest when the list has to be parsed.
+    """
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    digest = stream_digest(source)
+    index = get_cached(digest)
+    if index is not None:
+        return index
+
+    with _lock:
+        build_lock = _build_locks.setdefault(digest, threading.Lock())
+
+    with build_lock:
+        # Another session may have finished the same list while we waited.
+        index = get_cached(digest)
+        if index is None:
+            index = WordlistIndex.from_snapshot(name, digest)
+        if index is None:
+            wordlist, word_by_length, score_by_length = ingest(source, progress)
+            index = WordlistIndex.from_lists(name, digest, wordlist, word_by_length, score_by_length)
+            index.save_snapshot()
+        remember(index)
+
+    with _lock:
+        _build_locks.pop(digest, None)
+    return index
+
+
+def get_index_for_path(path: str, progress: Optional[Progress] = None) -> WordlistIndex:
+    """Like get_index, but skips re-reading files whose size and mtime are unchanged."""
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+    with _lock:
+        digest = _path_digests.get(key)
+    if digest is not None:
+        index = get_cached(digest)
+        if index is not None:
+            return index
+
+    with open(path, "rb") as f:
+        index = get_index(f, os.path.basename(path), progress)
+    with _lock:
+        _path_digests[key] = index.digest
+    return index
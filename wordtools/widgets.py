@@ -0,0 +1,32 @@
+"""Streamlit widgets shared by the pages."""
+import html
+
+import streamlit as st
+
+from wordtools.export import EXPORT_URL, PAGE_SIZES, ResultLines, page_count, save_export
+
+
+def show_result_pages(lines: ResultLines, key: str, file_name: str, export_id: str, label: str = "Results", height: int = 400) -> None:
+    """One page of stored output lines, with a download of all of them that is written to a file only when asked for.
+
+    export_id names the results the lines show, e.g. their job, so that a
+    file written for earlier results is not offered for later ones.
+    """
+    size_col, page_col, gzip_col, download_col = st.columns(4)
+    size = size_col.selectbox("Lines per page", PAGE_SIZES, key=f"{key}_page_size")
+    pages = page_count(len(lines), size)
+    if st.session_state.get(f"{key}_page", 1) > pages:
+        st.session_state[f"{key}_page"] = pages
+    page = page_col.number_input(f"Page (of {pages})", min_value=1, max_value=pages, step=1, key=f"{key}_page")
+    compress = gzip_col.checkbox("Compress download (gzip)", key=f"{key}_gzip")
+    suffix = ".gz" if compress else ""
+
+    # The file is streamed by the server from disk, so the export is never held in memory whole.
+    export = (export_id, len(lines), compress)
+    if st.session_state.get(f"{key}_export", (None,))[0] != export:
+        if download_col.button("Prepare download", key=f"{key}_prepare", help="Write all the results to a file to download"):
+            st.session_state[f"{key}_export"] = export, save_export(lines, ".txt" + suffix)
+    if st.session_state.get(f"{key}_export", (None,))[0] == export:
+        name = st.session_state[f"{key}_export"][1]
+        download_col.markdown(f'<a href="{EXPORT_URL}/{name}" download="{html.escape(file_name + suffix)}">⬇️ Download all</a>', unsafe_allow_html=True)
+    st.text_area(label, value="\n".join(lines.page(page, size)), height=height)
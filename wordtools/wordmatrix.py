@@ -0,0 +1,115 @@
+import threading
+from bisect import bisect_left
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from wordtools.packed import PackedWords
+from wordtools.patterns import VOWELS
+
+# Characters outside ASCII are stored as this byte. Words are alphabetic, so
+# it never stands for itself; constraints must not mention it (see encodable).
+PLACEHOLDER = ord("?")
+
+# Per-position constraints: None for any character, VOWEL or CONSONANT, a
+# byte that must appear there, or a 256-entry bool table of allowed bytes.
+VOWEL = "@"
+CONSONANT = "#"
+Constraint = Optional[Union[str, int, np.ndarray]]
+
+_VOWEL_TABLE = np.zeros(256, dtype=bool)
+_VOWEL_TABLE[[ord(c) for c in VOWELS]] = True
+
+
+def encodable(text: str) -> bool:
+    """Whether constraints built from text's characters can be checked against the byte matrix."""
+    return text.isascii() and chr(PLACEHOLDER) not in text
+
+
+def char_table(chars: str, negated: bool = False) -> np.ndarray:
+    """Byte table for a character class; a negated class also admits non-ASCII characters."""
+    table = np.zeros(256, dtype=bool)
+    table[list(chars.encode("ascii"))] = True
+    return ~table if negated else table
+
+
+def _prefix_run(words: Sequence[str], prefix: str) -> Tuple[int, int]:
+    """Row range of the words starting with prefix; buckets are alphabetical, so they are one run."""
+    if not prefix:
+        return 0, len(words)
+    return bisect_left(words, prefix), bisect_left(words, prefix + "\U0010ffff")
+
+
+class _Bucket:
+    """Contiguous (words x length) uint8 character matrix and vowel mask for one length bucket."""
+
+    def __init__(self, words: Sequence[str]):
+        self.words = words
+        # Packed ASCII words are read in place; anything else is copied out with placeholders.
+        chars = words.byte_matrix() if isinstance(words, PackedWords) else None
+        if chars is None:
+            data = "".join(words).encode("ascii", errors="replace")
+            chars = np.frombuffer(data, dtype=np.uint8).reshape(len(words), len(words[0]))
+        self.chars = chars
+        self.vowels = _VOWEL_TABLE[self.chars]
+
+
+class WordMatrix:
+    """Length buckets as fixed-width byte matrices, built on first use, for vectorized per-position tests."""
+
+    def __init__(self, word_by_length: Dict[int, Sequence[str]]):
+        self.word_by_length = word_by_length
+        self._buckets: Dict[int, _Bucket] = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, length: int) -> Optional[_Bucket]:
+        bucket = self._buckets.get(length)
+        if bucket is None:
+            words = self.word_by_length.get(length)
+            if not words:
+                return None
+            with self._lock:
+                bucket = self._buckets.get(length)
+                if bucket is None:
+                    bucket = _Bucket(words)
+                    self._buckets[length] = bucket
+        return bucket
+
+    def build_all(self) -> None:
+        """Build every length's matrix now rather than on first use."""
+        for length in self.word_by_length:
+            self._bucket(length)
+
+    def select(self, length: int, prefix: str, constraints: Sequence[Constraint]) -> Tuple[List[str], int]:
+        """Words of the given length that start with prefix and whose next characters meet constraints, in bucket order.
+
+        Also returns how many words had the prefix, i.e. how many rows were tested.
+        """
+        bucket = self._bucket(length)
+        if bucket is None or len(prefix) + len(constraints) > length:
+            return [], 0
+        lo, hi = _prefix_run(bucket.words, prefix)
+        chars = bucket.chars[lo:hi]
+        mask = np.ones(hi - lo, dtype=bool)
+        for column, constraint in enumerate(constraints, len(prefix)):
+            if constraint is None:
+                continue
+            if isinstance(constraint, str):
+                vowel = bucket.vowels[lo:hi, column]
+                mask &= vowel if constraint == VOWEL else ~vowel
+            elif isinstance(constraint, int):
+                mask &= chars[:, column] == constraint
+            else:
+                mask &= constraint[chars[:, column]]
+        return [bucket.words[lo + i] for i in np.flatnonzero(mask)], hi - lo
+
+    def prefixed(self, length: int, prefix: str) -> Sequence[str]:
+        """Words of the given length starting with prefix, alphabetically, without building the bucket's matrix."""
+        words = self.word_by_length.get(length, [])
+        lo, hi = _prefix_run(words, prefix)
+        return words if hi - lo == len(words) else words[lo:hi]
+
+    def count_prefixed(self, length: int, prefix: str) -> int:
+        """Number of words of the given length starting with prefix, without building the bucket's matrix."""
+        lo, hi = _prefix_run(self.word_by_length.get(length, []), prefix)
+        return hi - lo